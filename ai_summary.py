@@ -1,6 +1,7 @@
 from openai import OpenAI
 import logging
 from config import Config
+import metrics
 
 class AISummary:
     def __init__(self, api_key: str = None, base_url: str = None):
@@ -31,10 +32,12 @@ class AISummary:
             self.logger.warning("未配置OpenAI API Key，AI摘要功能将不可用")
             self.client = None
     
+    @metrics.timed('ai.generate')
     def generate_summary(self, content):
         """根据笔记内容生成小红书文案摘要"""
         if not self.client:
             self.logger.warning("未配置OpenAI API Key，跳过AI摘要生成")
+            metrics.current_span().outcome = 'fallback'
             return self._generate_fallback_summary("", content)
         
         try:
@@ -66,6 +69,7 @@ class AISummary:
                 temperature=0.7
             )
             
+            self._record_usage(response)
             result = response.choices[0].message.content.strip()
             self.logger.info("AI摘要生成成功")
             
@@ -74,7 +78,18 @@ class AISummary:
             
         except Exception as e:
             self.logger.error(f"AI摘要生成失败: {str(e)}")
+            metrics.current_span().outcome = 'fallback'
             return self._generate_fallback_summary("", content)
+
+    @staticmethod
+    def _record_usage(response):
+        """把接口返回的 token 用量计入当前 span"""
+        usage = getattr(response, 'usage', None)
+        record = metrics.current_span()
+        if usage is None or record is None:
+            return
+        record.count('prompt_tokens', getattr(usage, 'prompt_tokens', 0) or 0)
+        record.count('completion_tokens', getattr(usage, 'completion_tokens', 0) or 0)
     
     def _parse_ai_response(self, response):
         """解析AI返回的结果"""
@@ -192,6 +207,7 @@ class AISummary:
             'topics': topics
         }
     
+    @metrics.timed('ai.enhance')
     def enhance_content(self, original_content):
         """增强内容，添加更多吸引人的元素"""
         if not self.client:
@@ -224,6 +240,7 @@ class AISummary:
                 temperature=0.8
             )
             
+            self._record_usage(response)
             enhanced_content = response.choices[0].message.content.strip()
             self.logger.info("内容优化成功")
             return enhanced_content
@@ -1,8 +1,12 @@
 import os
 import time
 import streamlit as st
-from feishu_screenshot import FeishuScreenshot
 from ai_summary import AISummary
+from frame_export import MasterRendering, thumbnail_path, zip_frames
+from draft_ledger import DraftLedger
+from job_runner import BrowserPool, Job, JobRunner, ResultCache
+from run_artifacts import RetentionManager
+from config import Config
 
 st.set_page_config(page_title="飞书转图文助手", page_icon="📝", layout="centered")
 
@@ -24,58 +28,248 @@ with st.form("params_form"):
     st.markdown("---")
     output_dir = st.text_input("输出目录", value="output")
     screenshots_dir = st.text_input("截图目录", value="screenshots")
+    refresh = st.checkbox("忽略缓存，重新截图与生成", value=False, help="相同网址、宽高比与 AI 设置的结果默认会直接复用")
     run = st.form_submit_button("开始处理", type="primary")
 
+def process_job(job, pool):
+    """后台线程中执行：截图 → 拼接长图 →（可选）读取正文并调用 AI → 保存草稿
+
+    不能调用 st.* 接口，进度通过 job.update 写回，由页面轮询显示。
+    """
+    params = job.params
+    screenshots_dir = os.path.join(params["screenshots_dir"], job.id)
+    content_text = ""
+    timings = {}
+    shot = pool.acquire(aspect_ratio=params["ratio"])
+    try:
+        job.update("打开页面…")
+        started = time.time()
+        files = []
+        # 逐帧截图，每完成一帧即更新进度；取消后在下一帧之前停止
+        for frame in shot.iter_screenshots(params["note_url"], output_dir=screenshots_dir, cancel=job.cancel_event):
+            files.append(frame["path"])
+            job.update(f"正在截图，已完成 {len(files)} 张", len(files))
+        if job.cancel_event.is_set():
+            return None
+        title = shot.title
+        if shot.last_error or not files:
+            raise RuntimeError("截图失败，请检查链接或网络")
+        job.update(f"截图完成，共 {len(files)} 张。标题：{title}", len(files))
+        timings["capture"] = round(time.time() - started, 3)
+
+        # 拼接长图，之后切换宽高比只需离线重新分页
+        master_path = None
+        try:
+            master = shot.export_master()
+            master_path = master.path if master else None
+        except Exception as e:
+            job.update(f"长图拼接失败，仅提供原始截图: {e}")
+
+        # 读取正文（可选：用于 AI 生成文案），复用截图时打开的浏览器
+        if params["use_ai"]:
+            job.update("读取笔记正文…")
+            content_text = shot.get_note_content(close=False)
+    finally:
+        pool.release(shot)
+
+    # AI 生成文案
+    ai_result = None
+    ai_error = None
+    if params["use_ai"]:
+        job.update("正在调用 AI 生成文案…")
+        started = time.time()
+        try:
+            summarizer = AISummary(api_key=params["api_key"] or None, base_url=params["base_url"] or None)
+            ai_result = summarizer.generate_summary(content_text or "")
+        except Exception as e:
+            ai_error = str(e)
+        timings["generate"] = round(time.time() - started, 3)
+
+    draft_path = None
+    if ai_result:
+        # 保存草稿
+        os.makedirs(params["output_dir"], exist_ok=True)
+        draft_path = os.path.join(params["output_dir"], f"draft_{int(time.time())}_{job.id}.txt")
+        with open(draft_path, "w", encoding="utf-8") as f:
+            f.write(f"标题: {ai_result.get('title','')}\n\n")
+            f.write(f"内容:\n{ai_result.get('content','')}\n\n")
+            f.write(f"话题:\n{' '.join(ai_result.get('topics', []))}\n")
+            f.write(f"截图文件:\n" + "\n".join(files))
+        DraftLedger().append(
+            ai_result.get("title", ""), ai_result.get("content", ""), ai_result.get("topics", []), files,
+            source_url=params["note_url"], timings=timings, draft_file=draft_path, job_id=job.id
+        )
+
+    return {
+        "files": files,
+        "title": title,
+        "ratio": float(params["ratio"]),
+        "master_path": master_path,
+        "screenshots_dir": screenshots_dir,
+        "ai_result": ai_result,
+        "ai_error": ai_error,
+        "draft_path": draft_path,
+        "exports": {},
+    }
+
+
+@st.cache_resource
+def get_result_cache():
+    """所有会话共享的结果缓存"""
+    return ResultCache()
+
+
+@st.cache_resource
+def get_runner():
+    """所有会话共享的后台执行器与浏览器池（进程内只创建一次）"""
+    pool = BrowserPool()
+    cache = get_result_cache()
+
+    def handle(job):
+        # 与命令行共用保留策略：清理旧任务的截图与草稿，排队或执行中的任务与仍在缓存中的结果不受影响
+        RetentionManager(
+            screenshot_dir=job.params["screenshots_dir"], output_dir=job.params["output_dir"]
+        ).enforce(keep=runner.active_ids() | cache.referenced_names())
+        result = process_job(job, pool)
+        if result is None:
+            return None
+        result = dict(result, params=job.params)
+        if not result["ai_error"]:
+            cache.put(job.params["cache_key"], result)
+        return result
+
+    runner = JobRunner(handle)
+    return runner
+
+
+def submit_job(params, refresh=False):
+    """命中缓存时直接展示结果；相同参数的任务正在执行时复用该任务；否则提交新任务"""
+    params["cache_key"] = ResultCache.make_key(
+        params["note_url"], params["ratio"], params["use_ai"], params["api_key"], params["base_url"]
+    )
+    if refresh:
+        result_cache.invalidate(params["cache_key"])
+    else:
+        cached, age = result_cache.get(params["cache_key"])
+        if cached:
+            # 每个会话使用独立的导出记录，避免互相影响
+            st.session_state["result"] = dict(cached, exports=dict(cached["exports"]))
+            st.success(f"已复用 {int(age // 60)} 分钟前的处理结果（如需重新处理请点击“刷新结果”）")
+            return
+    job = runner.find_active(params["cache_key"]) or runner.submit(params)
+    if job is None:
+        st.error("当前排队任务已满，请稍后再试")
+    else:
+        st.session_state["job_id"] = job.id
+
+
+runner = get_runner()
+result_cache = get_result_cache()
+
 if run:
     if not note_url:
         st.error("请填写飞书笔记网址")
         st.stop()
 
-    os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(screenshots_dir, exist_ok=True)
+    submit_job({
+        "note_url": note_url,
+        "ratio": float(r),
+        "use_ai": use_ai,
+        "api_key": api_key,
+        "base_url": base_url,
+        "output_dir": output_dir,
+        "screenshots_dir": screenshots_dir,
+    }, refresh=refresh)
 
-    # 截图
-    with st.status("正在对飞书笔记截图…", expanded=True) as status:
-        try:
-            shot = FeishuScreenshot(aspect_ratio=r)
-            st.write("打开页面…")
-            files, title = shot.take_full_screenshot(note_url, output_dir=screenshots_dir)
-            if not files:
-                st.error("截图失败，请检查链接或网络")
-                st.stop()
-            st.write(f"截图完成，共 {len(files)} 张。标题：{title}")
-            status.update(label="截图完成", state="complete", expanded=False)
-        except Exception as e:
-            st.exception(e)
-            st.stop()
+# 任务进度：执行在后台线程中进行，页面只负责轮询显示
+job = runner.get(st.session_state.get("job_id"))
+polling = False
+if job and not job.finished:
+    polling = True
+    if job.status == Job.STATUS_QUEUED:
+        st.info(f"任务排队中，前面还有 {max(0, runner.position(job.id) - 1)} 个任务")
+    else:
+        with st.status(job.message, expanded=True):
+            st.write(f"已截取 {job.frames_done} 张")
+    if st.button("取消任务"):
+        job.cancel()
+elif job:
+    st.session_state.pop("job_id", None)
+    if job.status == Job.STATUS_DONE:
+        # 结果保存在会话中，调整导出比例等交互触发重跑时无需重新截图
+        st.session_state["result"] = job.result
+        if job.result["ai_error"]:
+            st.error(f"AI 生成失败: {job.result['ai_error']}")
+        if job.result["draft_path"]:
+            st.success(f"草稿已保存: {job.result['draft_path']}")
+        st.success("处理完成！")
+        st.info("小红书自动发布功能尚未实现，请将图片与文案手动发布。")
+    elif job.status == Job.STATUS_CANCELLED:
+        st.warning("任务已取消")
+    else:
+        st.error(f"处理失败: {job.error}")
 
-    # 读取正文（可选：用于 AI 生成文案）
-    content_text = ""
-    try:
-        shot2 = FeishuScreenshot(aspect_ratio=r)
-        if shot2.navigate_to_note(note_url):
-            content_text = shot2.get_note_content()
-    except Exception:
-        pass
 
+@st.cache_resource(max_entries=4)
+def load_master(path, mtime):
+    """缓存长图及其分页断点，mtime 变化时重新加载"""
+    return MasterRendering(path)
+
+
+result = st.session_state.get("result")
+if result and not all(os.path.exists(fp) for fp in result["files"]):
+    # 截图已按保留策略清理（其他会话持有的旧结果），不能再预览或导出
+    st.session_state.pop("result", None)
+    st.session_state.pop("full_frame", None)
+    st.warning("该结果的截图已被清理，请重新处理")
+    result = None
+if result:
     st.subheader("截图预览")
-    for fp in sorted(files):
-        st.image(fp, caption=os.path.basename(fp), use_column_width=True)
+    if st.button("刷新结果", help="忽略缓存，重新截图并生成文案"):
+        st.session_state.pop("result", None)
+        submit_job(dict(result["params"]), refresh=True)
+        st.rerun()
+    preview_files = result["files"]
+    if result["master_path"] and os.path.exists(result["master_path"]):
+        export_r = st.number_input(
+            "导出宽高比 r = 宽/高", min_value=0.2, max_value=5.0, value=result["ratio"], step=0.01,
+            help="基于已截取的长图离线重新分页，无需重新打开浏览器", key="export_ratio"
+        )
+        ratio_key = round(float(export_r), 4)
+        if not all(os.path.exists(fp) for fp in result["exports"].get(ratio_key, [])):
+            # 导出文件已被清理时重新分页
+            result["exports"].pop(ratio_key, None)
+        if ratio_key not in result["exports"]:
+            master = load_master(result["master_path"], os.path.getmtime(result["master_path"]))
+            result["exports"][ratio_key] = master.export(
+                ratio_key, os.path.join(result["screenshots_dir"], f"ratio_{ratio_key:.4f}")
+            )
+        preview_files = result["exports"][ratio_key]
+        st.caption(f"共 {len(preview_files)} 张（按段落间空白分页）")
 
-    # AI 生成文案
-    ai_result = None
-    if use_ai:
-        with st.status("正在调用 AI 生成文案…", expanded=True) as status:
-            try:
-                summarizer = AISummary(api_key=api_key or None, base_url=base_url or None)
-                ai_result = summarizer.generate_summary(content_text or "")
-                st.write("AI 生成完成")
-                status.update(label="AI 生成完成", state="complete", expanded=False)
-            except Exception as e:
-                st.exception(e)
-
-    st.subheader("结果导出")
+    # 只推送缩略图，原图在点击后才加载
+    full_frame = st.session_state.get("full_frame")
+    if full_frame in preview_files:
+        st.image(full_frame, caption=os.path.basename(full_frame), use_column_width=True)
+        if st.button("收起原图"):
+            st.session_state.pop("full_frame", None)
+            st.rerun()
+    columns = st.columns(Config.APP_GALLERY_COLUMNS)
+    for i, fp in enumerate(preview_files):
+        with columns[i % len(columns)]:
+            st.image(thumbnail_path(fp), caption=os.path.basename(fp), use_column_width=True)
+            if st.button("查看原图", key=f"full_{fp}"):
+                st.session_state["full_frame"] = fp
+                st.rerun()
+
+    archive = zip_frames(preview_files, os.path.join(os.path.dirname(preview_files[0]), "frames.zip")) if preview_files else None
+    if archive:
+        with open(archive, "rb") as f:
+            st.download_button("下载全部图片（zip）", f, file_name="frames.zip", mime="application/zip")
+
+    ai_result = result["ai_result"]
     if ai_result:
+        st.subheader("结果导出")
         st.markdown("**AI 标题**")
         st.write(ai_result.get("title", ""))
         st.markdown("**AI 内容**")
@@ -83,20 +277,12 @@ if run:
         st.markdown("**AI 话题**")
         st.write(" ".join(ai_result.get("topics", [])))
 
-        # 保存草稿
-        draft_path = os.path.join(output_dir, f"draft_{int(time.time())}.txt")
-        with open(draft_path, "w", encoding="utf-8") as f:
-            f.write(f"标题: {ai_result.get('title','')}\n\n")
-            f.write(f"内容:\n{ai_result.get('content','')}\n\n")
-            f.write(f"话题:\n{' '.join(ai_result.get('topics', []))}\n")
-            f.write(f"截图文件:\n" + "\n".join(files))
-        st.success(f"草稿已保存: {draft_path}")
-
-    st.success("处理完成！")
-    st.info("小红书自动发布功能尚未实现，请将图片与文案手动发布。")
-
 st.sidebar.title("关于")
 st.sidebar.info(
     "该工具用于将飞书笔记转为图片，并可选用 AI 生成小红书风格文案。\n"
     "当前版本未实现自动发布功能。"
-) 
\ No newline at end of file
+)
+
+if polling:
+    time.sleep(Config.APP_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线端到端截图基准
+功能：
+1. 在本地 HTTP 服务上生成类飞书文档：滚动容器、吸顶页眉、底部工具栏、懒加载图片，长度可配置
+2. 同一服务提供兼容 OpenAI 接口的模拟大模型（/v1/chat/completions），不消耗真实额度
+3. 用无头 Chrome 运行 FeishuScreenshot 截图、正文提取与 AISummary，统计帧率、每篇耗时与内存
+4. 与保存的基线比较，退化超出容差时返回非零退出码
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import random
+import tempfile
+import argparse
+import statistics
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from config import Config
+import metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 场景: (段落块数, 图片数)
+SCENARIOS = {
+    'short': (12, 2),
+    'medium': (60, 10),
+    'long': (200, 30),
+}
+
+WORDS = ('飞书', '笔记', '截图', '分页', '懒加载', '滚动', '容器', '图片', '表格', '段落', '效率', '工具', '小红书', '文案')
+
+
+def _png(width, height, rgb):
+    """生成纯色 PNG（不依赖 Pillow）"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+    row = b'\x00' + bytes(rgb) * width
+    raw = zlib.compress(row * height, 9)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', raw) + chunk(b'IEND', b'')
+
+
+def synthetic_document(doc_id, blocks, images, seed=0):
+    """生成类飞书文档的 HTML：吸顶页眉和标题位于滚动容器内，图片只有 data-src，进入视口后才加载"""
+    rng = random.Random(f"{seed}-{doc_id}-{blocks}-{images}")
+    image_at = set(rng.sample(range(blocks), min(images, blocks)))
+    parts = []
+    for i in range(blocks):
+        if i % 15 == 0:
+            parts.append(f'<h2>第 {i // 15 + 1} 节 {rng.choice(WORDS)}</h2>')
+        sentence = ''.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+        parts.append(f'<p>{i + 1}. {sentence}。</p>')
+        if i in image_at:
+            parts.append(
+                f'<img class="doc-image" data-src="/img/{doc_id}-{i}.png" loading="lazy" width="640" height="360" alt="">'
+            )
+    body = '\n'.join(parts)
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="utf-8"><title>基准文档 {doc_id}</title>
+<style>
+  body {{ margin: 0; font: 16px/1.7 sans-serif; }}
+  .wiki-content {{ height: calc(100vh - 48px); overflow-y: auto; }}
+  .doc-header {{ position: sticky; top: 0; height: 56px; background: #fff; border-bottom: 1px solid #ddd; z-index: 10; }}
+  .doc-body {{ max-width: 760px; margin: 0 auto; padding: 16px 24px; }}
+  .doc-image {{ display: block; background: #eee; margin: 12px 0; }}
+  .doc-toolbar {{ position: fixed; bottom: 0; left: 0; right: 0; height: 48px; background: #fafafa; border-top: 1px solid #ddd; }}
+</style></head>
+<body>
+<div class="wiki-content">
+  <div class="doc-header">目录 · 分享 · 评论</div>
+  <div class="doc-body">
+    <h1 class="wiki-title">基准文档 {doc_id}（{blocks} 段 / {images} 图）</h1>
+    {body}
+  </div>
+</div>
+<div class="doc-toolbar"></div>
+<script>
+  var io = new IntersectionObserver(function (entries) {{
+    entries.forEach(function (entry) {{
+      if (entry.isIntersecting && !entry.target.getAttribute('src')) {{
+        entry.target.setAttribute('src', entry.target.getAttribute('data-src'));
+      }}
+    }});
+  }}, {{ root: document.querySelector('.wiki-content'), rootMargin: '200px' }});
+  document.querySelectorAll('img[data-src]').forEach(function (img) {{ io.observe(img); }});
+</script>
+</body></html>"""
+
+
+def mock_completion(prompt, model='gpt-3.5-turbo'):
+    """兼容 OpenAI chat.completions 的固定格式回复"""
+    content = "标题：离线基准生成的标题\n内容：这是模拟大模型返回的文案，用于基准测试。\n话题：#效率工具 #飞书"
+    prompt_tokens = max(1, len(prompt) // 2)
+    return {
+        'id': f'chatcmpl-bench-{int(time.time() * 1000)}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 2,
+                  'total_tokens': prompt_tokens + len(content) // 2},
+    }
+
+
+class BenchmarkServer:
+    """本地基准服务：/doc/<id>?blocks=&images= 文档，/img/<name>.png 图片，/v1/chat/completions 模拟大模型"""
+
+    def __init__(self, image_delay_ms=0, llm_latency_ms=0, seed=0):
+        self.image_delay = image_delay_ms / 1000.0
+        self.llm_latency = llm_latency_ms / 1000.0
+        self.seed = seed
+        self.requests = 0
+        self._image = _png(640, 360, (180, 200, 230))
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, content_type, data):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.startswith('/doc/'):
+                    html = synthetic_document(
+                        url.path[len('/doc/'):],
+                        int(query.get('blocks', ['60'])[0]),
+                        int(query.get('images', ['10'])[0]),
+                        server.seed,
+                    )
+                    self._send(200, 'text/html; charset=utf-8', html.encode('utf-8'))
+                elif url.path.startswith('/img/'):
+                    if server.image_delay:
+                        time.sleep(server.image_delay)
+                    self._send(200, 'image/png', server._image)
+                else:
+                    self._send(404, 'text/plain', b'not found')
+
+            def do_POST(self):
+                server.requests += 1
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send(404, 'text/plain', b'not found')
+                    return
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    payload = {}
+                prompt = ''.join(m.get('content', '') for m in payload.get('messages', []))
+                if server.llm_latency:
+                    time.sleep(server.llm_latency)
+                data = json.dumps(mock_completion(prompt, payload.get('model', 'gpt-3.5-turbo'))).encode('utf-8')
+                self._send(200, 'application/json', data)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def doc_url(self, doc_id, blocks, images):
+        return f"{self.base_url}/doc/{doc_id}?blocks={blocks}&images={images}"
+
+
+def _peak_rss_mb():
+    """本进程峰值常驻内存（MB）；Linux 单位为 KB，macOS 为字节"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _page_heap_mb(driver):
+    """页面 JS 堆占用（MB），通过 CDP Performance.getMetrics 读取"""
+    try:
+        driver.execute_cdp_cmd('Performance.enable', {})
+        values = {m['name']: m['value'] for m in driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']}
+        return values.get('JSHeapUsedSize', 0) / 1024 / 1024
+    except Exception:
+        return None
+
+
+def run_scenario(server, name, blocks, images, notes, aspect_ratio, use_ai, output_root):
+    """在同一个浏览器中依次截图 notes 篇文档，返回该场景的统计结果"""
+    from feishu_screenshot import FeishuScreenshot
+    from ai_summary import AISummary
+
+    shot = FeishuScreenshot(aspect_ratio=aspect_ratio, headless=True)
+    # 每篇都从网络加载，结果不受共享磁盘缓存状态影响
+    shot.config.SHARED_BROWSER_CACHE = False
+    ai = AISummary(api_key='benchmark', base_url=f"{server.base_url}/v1") if use_ai else None
+    per_note, frame_counts, heaps = [], [], []
+    try:
+        launch_started = time.perf_counter()
+        shot.setup_driver()
+        launch = time.perf_counter() - launch_started
+        for i in range(notes):
+            url = server.doc_url(f"{name}-{i}", blocks, images)
+            started = time.perf_counter()
+            frames = list(shot.iter_screenshots(url, output_dir=os.path.join(output_root, name, str(i))))
+            if shot.last_error or not frames:
+                raise RuntimeError(f"{url} 截图失败: {shot.last_error}")
+            content = shot.get_note_content(close=False)
+            if ai:
+                ai.generate_summary(content)
+            per_note.append(time.perf_counter() - started)
+            frame_counts.append(len(frames))
+            heaps.append(_page_heap_mb(shot.driver))
+    finally:
+        if shot.driver:
+            shot.driver.quit()
+            shot.driver = None
+
+    capture = metrics.summarize().get('capture', {})
+    heaps = [h for h in heaps if h is not None]
+    return {
+        'blocks': blocks,
+        'images': images,
+        'notes': notes,
+        'launch_s': round(launch, 3),
+        'sec_per_note': round(statistics.median(per_note), 3),
+        'frames_per_note': round(statistics.mean(frame_counts), 1),
+        # 只按截图本身的耗时计算帧率（不含正文提取与 AI）
+        'fps': round(sum(frame_counts) / capture['total'], 3) if capture.get('total') else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1) if resource else None,
+        'page_heap_mb': round(max(heaps), 1) if heaps else None,
+        'spans': {k: round(v['total'], 3) for k, v in metrics.summarize().items()},
+    }
+
+
+# 指标名: 越大越好（True）/ 越小越好（False）
+COMPARED = {'fps': True, 'sec_per_note': False, 'peak_rss_mb': False, 'page_heap_mb': False}
+
+
+def compare(results, baseline, tolerance):
+    """与基线逐项比较，返回退化说明列表；基线中没有记录的场景也计入，避免未经比较就通过"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            regressions.append(f"{name}: 基线中没有该场景，使用 --update-baseline 记录")
+            continue
+        for key, higher_is_better in COMPARED.items():
+            current, expected = result.get(key), base.get(key)
+            if not current or not expected:
+                continue
+            worse = current < expected / (1 + tolerance) if higher_is_better else current > expected * (1 + tolerance)
+            if worse:
+                regressions.append(f"{name}.{key}: {current} （基线 {expected}，容差 {tolerance:.0%}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线端到端截图基准（本地合成文档 + 模拟大模型）')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='要运行的场景，可重复（默认全部）')
+    parser.add_argument('--blocks', type=int, help='自定义场景的段落块数（与 --images 一起使用）')
+    parser.add_argument('--images', type=int, default=0, help='自定义场景的图片数')
+    parser.add_argument('--notes', type=int, default=3, help='每个场景截图的文档篇数')
+    parser.add_argument('--ratio', type=float, default=0.75, help='截图宽高比 r = 宽/高')
+    parser.add_argument('--image-delay-ms', type=int, default=50, help='模拟图片加载延迟（毫秒）')
+    parser.add_argument('--llm-latency-ms', type=int, default=0, help='模拟大模型响应延迟（毫秒）')
+    parser.add_argument('--no-ai', action='store_true', help='不调用模拟大模型')
+    parser.add_argument('--baseline', default=Config.BENCHMARK_BASELINE_FILE, help='基线文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果保存为基线（没有基线时必须指定，否则返回非零退出码）')
+    parser.add_argument('--tolerance', type=float, default=Config.BENCHMARK_TOLERANCE, help='允许的相对退化比例')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    scenarios = {name: SCENARIOS[name] for name in (args.scenario or SCENARIOS)}
+    if args.blocks:
+        scenarios = {f"custom-{args.blocks}-{args.images}": (args.blocks, args.images)}
+
+    results = {}
+    # 截图写入临时目录，结束后删除
+    with BenchmarkServer(args.image_delay_ms, args.llm_latency_ms) as server, tempfile.TemporaryDirectory() as output_root:
+        for name, (blocks, images) in scenarios.items():
+            metrics.reset()
+            print(f"▶ {name}: {blocks} 段 / {images} 图 × {args.notes} 篇")
+            results[name] = run_scenario(server, name, blocks, images, args.notes, args.ratio, not args.no_ai, output_root)
+
+    print(f"\n{'场景':<16} {'秒/篇':>8} {'帧/篇':>7} {'帧率':>7} {'启动(s)':>8} {'峰值RSS(MB)':>12} {'页面堆(MB)':>11}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['sec_per_note']:>8.2f} {r['frames_per_note']:>7.1f} {r['fps'] or 0:>7.2f} "
+              f"{r['launch_s']:>8.2f} {r['peak_rss_mb'] or 0:>12.1f} {r['page_heap_mb'] or 0:>11.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update({name: {k: r[k] for k in COMPARED if k in r} for name, r in results.items()})
+        tmp_path = args.baseline + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.baseline)
+        print(f"\n✅ 基线已保存到 {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        # 基线与机器相关，不随代码提交；没有基线时无法判断退化，不能视为通过
+        print(f"\n❌ 未找到基线 {args.baseline}，请先在本机使用 --update-baseline 记录基线")
+        sys.exit(1)
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\n❌ 相比基线出现退化:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\n✅ 未发现相比基线的退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLI 启动耗时基准
+功能：
+1. 用 `python -X importtime` 统计导入 main.py 的耗时，列出最慢的模块
+2. 检查 selenium、openai 等重依赖没有在启动时被导入
+3. 多次运行 `main.py --help` 取中位数，超出预算时返回非零退出码
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from config import Config
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 只应在具体阶段才导入的重依赖
+HEAVY_MODULES = ('selenium', 'webdriver_manager', 'openai', 'PIL', 'streamlit', 'dotenv', 'sqlite3')
+
+
+def import_profile(module='main'):
+    """返回 [(累计耗时us, 自身耗时us, 模块名)]，按 -X importtime 的输出解析"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def time_command(args, runs):
+    """多次运行命令，返回每次的墙钟耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='main.py 启动耗时基准')
+    parser.add_argument('--budget-ms', type=float, default=Config.STARTUP_BUDGET_MS, help='`main.py --help` 中位耗时预算（毫秒）')
+    parser.add_argument('--runs', type=int, default=5, help='重复运行次数')
+    parser.add_argument('--top', type=int, default=15, help='列出累计耗时最长的模块数')
+    args = parser.parse_args()
+
+    rows = import_profile()
+    total_us = sum(self_us for _, self_us, _ in rows)
+    print(f"import main: 共导入 {len(rows)} 个模块，自身耗时合计 {total_us / 1000:.1f} ms")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}  {name}")
+
+    imported = {name.split('.')[0] for _, _, name in rows}
+    leaked = sorted(imported.intersection(HEAVY_MODULES))
+
+    timings = time_command(['main.py', '--help'], args.runs)
+    median = statistics.median(timings)
+    print(f"\nmain.py --help: 中位 {median:.0f} ms（{args.runs} 次，最快 {min(timings):.0f} ms），预算 {args.budget_ms:.0f} ms")
+
+    ok = True
+    if leaked:
+        print(f"❌ 启动时导入了重依赖: {', '.join(leaked)}")
+        ok = False
+    if median > args.budget_ms:
+        print("❌ 启动耗时超出预算")
+        ok = False
+    if ok:
+        print("✅ 启动耗时在预算内")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import logging
+import tempfile
+from config import Config
+from process_utils import file_lock, pid_alive
+
+class BrowserCache:
+    """多个 Chrome 实例共享的持久化磁盘缓存
+
+    通过 --disk-cache-dir 指定缓存目录，与 Cookie 等用户数据（仍是每次新建的临时配置目录）相互隔离，
+    批量处理时后续笔记可直接复用飞书的 JS/CSS 包。Chrome 的缓存后端不支持多进程同时写入，
+    因此目录下划分若干槽位（slot-N），每个浏览器独占一个槽位，用锁文件记录占用进程。
+    检查、接管失效锁与创建锁在 slots.lock 的排他锁内完成，两个进程不会同时接管同一个槽位。
+    """
+
+    STATS_FILE = 'stats.json'
+
+    def __init__(self, cache_dir=None, size_mb=None, slots=None):
+        self.config = Config()
+        self.cache_dir = cache_dir or self.config.BROWSER_CACHE_DIR
+        self.size_mb = size_mb or self.config.BROWSER_CACHE_SIZE_MB
+        self.slots = slots or self.config.BROWSER_CACHE_SLOTS
+        self.logger = logging.getLogger(__name__)
+
+    def _lock_path(self, slot):
+        return os.path.join(self.cache_dir, f'slot-{slot}.lock')
+
+    def _lock_owner(self, slot):
+        try:
+            with open(self._lock_path(slot), 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def acquire(self):
+        """占用一个空闲槽位，返回 (槽位号, 缓存目录)；全部被占用时返回 (None, None)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with file_lock(os.path.join(self.cache_dir, 'slots.lock')):
+            for slot in range(self.slots):
+                lock_path = self._lock_path(slot)
+                owner = self._lock_owner(slot)
+                if owner and not pid_alive(owner):
+                    # 上一个浏览器已退出（或进程崩溃），锁已失效
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        pass
+                try:
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    continue
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(str(os.getpid()))
+                path = os.path.join(self.cache_dir, f'slot-{slot}')
+                os.makedirs(path, exist_ok=True)
+                return slot, path
+        self.logger.warning("共享浏览器缓存的槽位已全部占用，本次使用临时缓存")
+        return None, None
+
+    def bind(self, slot, pid):
+        """把槽位锁交给浏览器驱动进程：该进程退出后锁自动失效"""
+        if slot is None or not pid:
+            return
+        try:
+            with open(self._lock_path(slot), 'w', encoding='utf-8') as f:
+                f.write(str(pid))
+        except OSError as e:
+            self.logger.warning(f"更新缓存槽位锁失败: {str(e)}")
+
+    def release(self, slot):
+        if slot is None:
+            return
+        try:
+            os.remove(self._lock_path(slot))
+        except OSError:
+            pass
+
+    def chrome_arguments(self, path):
+        """启动参数：缓存目录与大小上限（由 Chrome 自行按 LRU 淘汰）"""
+        return [
+            f'--disk-cache-dir={os.path.abspath(path)}',
+            f'--disk-cache-size={int(self.size_mb * 1024 * 1024)}',
+        ]
+
+    def disk_usage(self):
+        """缓存目录当前占用的字节数"""
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def load_stats(self):
+        path = os.path.join(self.cache_dir, self.STATS_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'pages': 0, 'requests': 0, 'cache_hits': 0, 'bytes': 0}
+
+    def record(self, requests, cache_hits, received_bytes):
+        """累计一次页面加载的缓存命中情况，返回累计统计；多个浏览器同时记录时在锁内读-改-写"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, self.STATS_FILE)
+        with file_lock(path + '.lock'):
+            stats = self.load_stats()
+            stats['pages'] += 1
+            stats['requests'] += int(requests)
+            stats['cache_hits'] += int(cache_hits)
+            stats['bytes'] += int(received_bytes)
+            stats['updated_at'] = time.time()
+            try:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, prefix=self.STATS_FILE,
+                                                 suffix='.tmp', delete=False) as f:
+                    json.dump(stats, f, ensure_ascii=False, indent=2)
+                os.replace(f.name, path)
+            except OSError as e:
+                self.logger.warning(f"保存缓存统计失败: {str(e)}")
+        return stats
+
+    @staticmethod
+    def hit_rate(stats):
+        return stats['cache_hits'] / stats['requests'] if stats.get('requests') else 0.0
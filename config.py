@@ -1,33 +1,161 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+_env_loaded = False
+
+
+def load_env():
+    """首次读取环境变量配置时才加载 .env，避免 `--help` 等短命令也要导入 dotenv"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+class EnvSetting:
+    """从环境变量读取的配置项，读取时才求值；实例上赋值会覆盖该项"""
+
+    def __init__(self, name, default=''):
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, owner):
+        load_env()
+        return os.getenv(self.name, self.default)
+
 
 class Config:
     # 飞书相关配置
-    FEISHU_EMAIL = os.getenv('FEISHU_EMAIL', '')
-    FEISHU_PASSWORD = os.getenv('FEISHU_PASSWORD', '')
+    FEISHU_EMAIL = EnvSetting('FEISHU_EMAIL', '')
+    FEISHU_PASSWORD = EnvSetting('FEISHU_PASSWORD', '')
     
     # 小红书相关配置
-    XIAOHONGSHU_USERNAME = os.getenv('XIAOHONGSHU_USERNAME', '')
-    XIAOHONGSHU_PASSWORD = os.getenv('XIAOHONGSHU_PASSWORD', '')
+    XIAOHONGSHU_USERNAME = EnvSetting('XIAOHONGSHU_USERNAME', '')
+    XIAOHONGSHU_PASSWORD = EnvSetting('XIAOHONGSHU_PASSWORD', '')
     
     # 大模型API配置
-    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
-    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+    OPENAI_API_KEY = EnvSetting('OPENAI_API_KEY', '')
+    OPENAI_BASE_URL = EnvSetting('OPENAI_BASE_URL', 'https://api.openai.com/v1')
     
     # 截图配置
     SCREENSHOT_WIDTH = 1080  # 截图宽度
     SCREENSHOT_HEIGHT = 1920  # 截图高度（小红书推荐比例）
-    SCROLL_OVERLAP = 0.2  # 滚动重叠比例
+    VIEWPORT_WIDTH = None  # 按宽高比截图时的视口宽度（CSS像素），None 表示沿用浏览器默认宽度
+    DEVICE_SCALE_FACTOR = 1.0  # 设备像素比，>1 时输出更高分辨率的截图
+    SCROLL_OVERLAP = 0.05  # 滚动重叠比例（相对无遮挡内容高度）
+    SCROLL_MIN_OVERLAP = 40  # 最小滚动重叠（像素）
+    HIDE_FIXED_OVERLAYS = True  # 截图时隐藏遮挡正文的固定/吸顶浮层（页眉、工具栏等）
+    PAGINATION_MODE = 'blocks'  # 'blocks' 按段落/图片/表格边界分页；'scroll' 按固定步长重叠滚动
+    PAGINATION_MIN_FILL = 0.3  # 按块分页时每页至少填充的比例，低于该比例才切断块
+    SAVE_SNAPSHOT = False  # 截图时同时保存页面 MHTML 快照，供离线重新渲染
+    
+    # 长图导出配置（一次截图，离线切出任意宽高比）
+    EXPORT_BACKGROUND = '#ffffff'  # 分页末尾补齐用的背景色
+    EXPORT_BLANK_TOLERANCE = 8  # 灰度极差不超过该值的整行视为空白，可在此分页
+    EXPORT_MIN_PAGE_FILL = 0.6  # 每页至少填充的比例，低于该比例时直接在页高处切分
+    THUMBNAIL_WIDTH = 240  # 预览缩略图宽度（像素）
+    THUMBNAIL_QUALITY = 80  # 缩略图 JPEG 质量
     
     # 浏览器配置
     BROWSER_HEADLESS = False  # 是否无头模式
     BROWSER_TIMEOUT = 30  # 浏览器超时时间
+    CHROMEDRIVER_PATH = EnvSetting('CHROMEDRIVER_PATH', '')  # 显式指定 ChromeDriver 路径，优先于自动解析
+    CHROMEDRIVER_CACHE_FILE = os.path.join('cache', 'chromedriver.json')  # 已解析的驱动路径及对应 Chrome 版本
+    PRIME_TIMEOUT = 20  # 懒加载预热的最长时间（秒）
+    PRIME_QUIET_MS = 500  # 资源请求持续无新增多久视为加载完成（毫秒）
+    NETWORK_IDLE_QUIET_MS = 500  # 导航后无网络活动多久视为空闲（毫秒）
+    NETWORK_IDLE_TIMEOUT = 10  # 等待网络空闲的最长时间（秒）
+    SCROLL_NETWORK_QUIET_MS = 150  # 每帧滚动后的网络空闲判定（毫秒）
+    SCROLL_NETWORK_TIMEOUT = 3  # 每帧滚动后等待网络空闲的最长时间（秒）
+    NETWORK_LONG_REQUEST_SECONDS = 10  # 超过该时长仍未结束的请求（长轮询等）不再阻塞空闲判断
+    SHARED_BROWSER_CACHE = True  # 所有截图浏览器共享持久化磁盘缓存（不含 Cookie），复用飞书的 JS/CSS
+    BROWSER_CACHE_DIR = os.path.join('cache', 'chrome')  # 共享缓存目录
+    BROWSER_CACHE_SIZE_MB = 512  # 每个缓存槽位的大小上限（MB）
+    BROWSER_CACHE_SLOTS = 4  # 可同时使用共享缓存的浏览器数量
+
+    # 请求屏蔽配置（CDP Network.setBlockedURLs，通配符 * 匹配任意字符）
+    TRACKER_URL_PATTERNS = [
+        '*google-analytics.com*',
+        '*googletagmanager.com*',
+        '*doubleclick.net*',
+        '*mcs.zijieapi.com*',
+        '*mon.zijieapi.com*',
+        '*/monitor_browser/collect/*',
+        '*/slardar/*',
+        '*sentry.io*',
+    ]
+    BLOCK_PROFILES = {
+        # 只提取正文：图片、音视频、字体与追踪脚本都不需要
+        'text': TRACKER_URL_PATTERNS + [
+            '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*', '*.bmp*',
+            '*.mp4*', '*.webm*', '*.mp3*', '*.m4a*',
+            '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+            '*/space/api/box/stream/download/*',
+        ],
+        # 截图：保留页面外观所需的全部资源，只屏蔽追踪
+        'capture': TRACKER_URL_PATTERNS,
+    }
+    CAPTURE_BLOCK_PROFILE = 'capture'  # 截图时使用的屏蔽方案，None 表示不屏蔽
+    TEXT_BLOCK_PROFILE = 'text'  # 仅提取正文时使用的屏蔽方案，None 表示不屏蔽
+    
+    # 小红书上传配置
+    UPLOAD_TIMEOUT = 120  # 图片上传完成的最长等待时间（秒）
+    UPLOAD_POLL_INTERVAL = 0.3  # 上传状态轮询间隔（秒）
+    PUBLISH_RESULT_TIMEOUT = 30  # 点击发布后等待页面跳转或成功提示的最长时间（秒）
     
     # 文件路径配置
     SCREENSHOT_DIR = 'screenshots'
     OUTPUT_DIR = 'output'
+    CHECKPOINT_DIR = os.path.join(OUTPUT_DIR, 'checkpoints')  # 每个笔记的阶段检查点
+    DRAFT_LEDGER = os.path.join(OUTPUT_DIR, 'drafts.jsonl')  # 结构化草稿台账（每行一条 JSON 记录）
+    RUNS_DIR = 'runs'  # 每次运行的产物目录（截图、草稿、日志与 manifest.json）
+    LOG_DIR = 'logs'  # 旧版本的日志目录，仅按保留时间清理
+    RUN_MAX_AGE_DAYS = 14  # 运行目录、截图、草稿与检查点的最长保留天数
+    RUN_DISK_QUOTA_MB = 2048  # 运行目录、截图目录与草稿的总磁盘配额（MB），超出时从最旧的开始清理
+    
+    # 批量处理配置
+    BATCH_INTERVAL = 30  # 相邻两个笔记开始截图的最小间隔（秒）
+    PIPELINE_QUEUE_SIZE = 2  # 流水线阶段间队列容量（截图后的条目持有浏览器，不宜过大）
+    PIPELINE_WORKERS = {  # 流水线各阶段线程数
+        'capture': 1,
+        'extract': 1,
+        'generate': 2,
+        'draft': 1,
+    }
+    
+    # 发布队列配置
+    PUBLISH_QUEUE_DB = os.path.join(OUTPUT_DIR, 'publish_queue.db')  # 发布队列数据库
+    PUBLISH_POSTS_PER_HOUR = 4  # 每小时最多发布篇数
+    PUBLISH_MAX_ATTEMPTS = 3  # 单个任务最大尝试次数
+    PUBLISH_RETRY_BASE_DELAY = 300  # 失败重试的基础退避时间（秒），按次数翻倍
+    PUBLISH_RETRY_MAX_DELAY = 3600  # 退避时间上限（秒）
+    PUBLISH_STALE_SECONDS = 1800  # 领取进程仍在运行但执行超过该时长时视为卡死，重新排队
+    PUBLISH_POLL_INTERVAL = 10  # 队列轮询间隔（秒）
+    
+    # Web 界面（app.py）后台任务配置
+    APP_WORKERS = 2  # 同时执行的任务数
+    APP_BROWSER_POOL_SIZE = 2  # 所有会话共享的截图浏览器数量
+    APP_QUEUE_SIZE = 8  # 排队任务上限，满时拒绝新任务
+    APP_KEEP_JOBS = 50  # 保留状态的已完成任务数
+    APP_POLL_INTERVAL = 1.0  # 界面刷新任务进度的间隔（秒）
+    APP_RESULT_TTL = 3600  # 相同笔记、宽高比与 AI 设置的结果缓存时长（秒）
+    APP_GALLERY_COLUMNS = 3  # 预览区每行缩略图数量
+    
+    # 启动性能配置
+    STARTUP_BUDGET_MS = 400  # benchmark_startup.py 中 `main.py --help` 的中位耗时预算（毫秒）
+
+    # 截图基准配置（benchmark_capture.py）
+    BENCHMARK_BASELINE_FILE = 'benchmark_baseline.json'  # 基线文件（帧率、每篇耗时、内存）
+    BENCHMARK_TOLERANCE = 0.25  # 相对基线允许的退化比例，超出时基准返回非零退出码
+    
+    # 性能分析配置（main.py --profile）
+    PROFILE_TOP_N = 25  # 报告中列出的热点函数 / trace 事件数
+    PROFILE_TRACE_CATEGORIES = 'devtools.timeline,blink.user_timing,loading,v8.execute,disabled-by-default-devtools.timeline'  # 截图阶段 Chrome trace 的类别
+    
+    # 埋点指标配置
+    METRICS_FILE = 'metrics.json'  # 每次运行在运行目录下导出的耗时/计数文件名
+    METRICS_PROMETHEUS_FILE = EnvSetting('METRICS_PROMETHEUS_FILE', '')  # 额外导出 Prometheus 文本格式的路径，留空不导出
+    METRICS_MAX_SPANS = 20000  # 进程内保留的最近 span 记录数，常驻进程（Web 界面）中更早的记录被丢弃
     
     # 小红书文案配置
     MAX_TITLE_LENGTH = 50  # 标题最大长度
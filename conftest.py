@@ -0,0 +1,17 @@
+import pytest
+
+# 手动测试脚本，需要真实的小红书账号与浏览器
+collect_ignore = ['test_xiaohongshu_poster.py']
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """模拟时钟：time.sleep 只推进时间并记账"""
+    from fake_webdriver import FakeClock
+    return FakeClock().install(monkeypatch)
+
+
+@pytest.fixture
+def driver(clock):
+    from fake_webdriver import FakeWebDriver
+    return FakeWebDriver(clock)
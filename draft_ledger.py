@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+from process_utils import file_lock
+
+class DraftLedger:
+    """JSONL 草稿台账：每个笔记一条 JSON 记录，追加写入，并维护按来源URL/日期查找的索引
+
+    索引文件记录每条记录在台账中的字节偏移，以及已建立索引的文件长度；
+    台账被其他进程追加后，下次读取时只需从该长度继续扫描。
+    命令行、流水线草稿阶段与 Web 界面可能同时写入，追加与索引更新都在锁文件（<台账>.lock）的排他锁内进行。
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.config = Config()
+        self.path = path or self.config.DRAFT_LEDGER
+        self.index_path = os.path.splitext(self.path)[0] + '.index.json'
+        self.logger = logging.getLogger(__name__)
+
+    @contextmanager
+    def _locked(self):
+        """进程内线程锁 + 锁文件上的跨进程排他锁"""
+        with self._lock, file_lock(self.path + '.lock'):
+            yield
+
+    @staticmethod
+    def frame_info(path):
+        """帧文件的路径、大小与 sha1"""
+        info = {'path': os.path.abspath(path), 'sha1': None, 'size': 0}
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            info['sha1'] = hashlib.sha1(data).hexdigest()
+            info['size'] = len(data)
+        except OSError:
+            pass
+        return info
+
+    def append(self, title, content, topics, image_files, source_url='', timings=None, draft_file='', **extra):
+        """追加一条草稿记录，返回记录（含 id）"""
+        now = time.time()
+        record = {
+            'id': uuid.uuid4().hex[:12],
+            'created_at': now,
+            'date': datetime.fromtimestamp(now).strftime('%Y-%m-%d'),
+            'source_url': source_url or '',
+            'title': title,
+            'content': content,
+            'topics': list(topics or []),
+            'frames': [self.frame_info(path) for path in image_files or []],
+            'timings': timings or {},
+            'draft_file': os.path.abspath(draft_file) if draft_file else '',
+        }
+        record.update(extra)
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._locked():
+            with open(self.path, 'ab') as f:
+                f.write(line)
+            self._load_index()
+        return record
+
+    def _load_index(self):
+        """读取索引并补齐台账中尚未索引的部分"""
+        index = {'size': 0, 'by_url': {}, 'by_date': {}, 'by_id': {}}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            pass
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < index['size']:
+            # 台账被截断或替换，重新建立索引
+            index = {'size': 0, 'by_url': {}, 'by_date': {}, 'by_id': {}}
+        if size == index['size']:
+            return index
+
+        with open(self.path, 'rb') as f:
+            f.seek(index['size'])
+            offset = index['size']
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 其他进程写入到一半，下次再索引
+                    break
+                try:
+                    record = json.loads(line)
+                    index['by_url'].setdefault(record.get('source_url', ''), []).append(offset)
+                    index['by_date'].setdefault(record.get('date', ''), []).append(offset)
+                    index['by_id'][record['id']] = offset
+                except (ValueError, KeyError):
+                    self.logger.warning(f"跳过损坏的草稿记录（偏移 {offset}）")
+                offset += len(line)
+            index['size'] = offset
+
+        # 每次写入使用独立的临时文件，再原子替换索引
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(self.index_path) or '.',
+                                         prefix=os.path.basename(self.index_path), suffix='.tmp', delete=False) as f:
+            json.dump(index, f, ensure_ascii=False)
+        try:
+            os.replace(f.name, self.index_path)
+        except OSError:
+            os.remove(f.name)
+            raise
+        return index
+
+    def _read_at(self, offsets):
+        records = []
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def _lookup(self, key, value):
+        if not os.path.exists(self.path):
+            return []
+        with self._locked():
+            index = self._load_index()
+        return self._read_at(index[key].get(value, []))
+
+    def find_by_url(self, source_url):
+        """某个笔记的全部草稿，按写入顺序"""
+        return self._lookup('by_url', source_url)
+
+    def find_by_date(self, date):
+        """某天（YYYY-MM-DD）写入的全部草稿"""
+        return self._lookup('by_date', date)
+
+    def get(self, record_id):
+        if not os.path.exists(self.path):
+            return None
+        with self._locked():
+            index = self._load_index()
+        offset = index['by_id'].get(record_id)
+        return self._read_at([offset])[0] if offset is not None else None
+
+    def latest(self, source_url):
+        """某个笔记最近一次的草稿"""
+        records = self.find_by_url(source_url)
+        return records[-1] if records else None
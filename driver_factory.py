@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import subprocess
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 同一进程内只解析一次 chromedriver 路径
+_resolved = {}
+_resolve_lock = threading.Lock()
+
+CHROME_CANDIDATES = [
+    'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    '/Applications/Chromium.app/Contents/MacOS/Chromium',
+]
+
+
+def _major(version):
+    return version.split('.')[0] if version else None
+
+
+def _binary_version(path):
+    """执行 `<binary> --version`，返回形如 120.0.6099.109 的版本号"""
+    try:
+        output = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=10).stdout
+    except Exception:
+        return None
+    match = re.search(r'(\d+\.\d+\.\d+\.\d+)', output or '')
+    return match.group(1) if match else None
+
+
+def detect_chrome_version():
+    """检测本机 Chrome 版本（不访问网络），检测不到时返回 None"""
+    if os.name == 'nt':
+        try:
+            import winreg
+            for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(root, r'Software\Google\Chrome\BLBeacon') as key:
+                        return winreg.QueryValueEx(key, 'version')[0]
+                except OSError:
+                    continue
+        except ImportError:
+            pass
+        return None
+    for candidate in CHROME_CANDIDATES:
+        path = candidate if os.path.isabs(candidate) else shutil.which(candidate)
+        if path and os.path.exists(path):
+            version = _binary_version(path)
+            if version:
+                return version
+    return None
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file, chrome_version, driver_path, source):
+    os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+    tmp_path = cache_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'chrome_version': chrome_version,
+            'driver_path': os.path.abspath(driver_path),
+            'source': source,
+            'resolved_at': time.time(),
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_file)
+
+
+def resolve_chromedriver(refresh=False):
+    """解析 chromedriver 路径，按离线优先的顺序查找：
+
+    1. Config.CHROMEDRIVER_PATH 显式指定；
+    2. 磁盘缓存中的路径（文件存在且记录的 Chrome 主版本与本机一致）；
+    3. PATH 中主版本匹配的 chromedriver；
+    4. webdriver-manager 下载（需要网络），结果写入缓存。
+
+    全部失败时返回 None，由 Selenium 自行查找驱动。
+    """
+    config = Config()
+    if config.CHROMEDRIVER_PATH:
+        return config.CHROMEDRIVER_PATH
+
+    with _resolve_lock:
+        if not refresh and 'path' in _resolved:
+            return _resolved['path']
+
+        cache_file = config.CHROMEDRIVER_CACHE_FILE
+        chrome_version = detect_chrome_version()
+        chrome_major = _major(chrome_version)
+        path = None
+
+        cached = {} if refresh else _load_cache(cache_file)
+        cached_path = cached.get('driver_path')
+        if cached_path and os.path.exists(cached_path) and (
+                chrome_major is None or _major(cached.get('chrome_version')) == chrome_major):
+            path = cached_path
+            logger.info(f"使用缓存的 ChromeDriver: {path}")
+
+        if path is None:
+            system_path = shutil.which('chromedriver')
+            if system_path and (chrome_major is None or _major(_binary_version(system_path)) == chrome_major):
+                path = system_path
+                logger.info(f"使用系统 PATH 中的 ChromeDriver: {path}")
+                _save_cache(cache_file, chrome_version, path, 'path')
+
+        if path is None:
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+                path = ChromeDriverManager().install()
+                logger.info(f"已通过 webdriver-manager 获取 ChromeDriver: {path}")
+                _save_cache(cache_file, chrome_version, path, 'webdriver-manager')
+            except Exception as e:
+                logger.error(f"ChromeDriver 解析失败，交由 Selenium 自行查找: {str(e)}")
+
+        _resolved['path'] = path
+        return path
+
+
+def chrome_options(headless=False):
+    """两个浏览器类共用的基础启动参数"""
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    return options
+
+
+@contextmanager
+def implicit_wait_disabled(driver, restore):
+    """暂时关闭隐式等待：逐个尝试多个选择器时，每个不存在的选择器都会白等一个隐式等待时长"""
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(restore)
+
+
+def _count_calls(driver):
+    """统计 JS 与 CDP 往返次数（metrics 计数 js_calls / cdp_calls）"""
+    for method, counter in (('execute_script', 'js_calls'), ('execute_async_script', 'js_calls'),
+                            ('execute_cdp_cmd', 'cdp_calls')):
+        original = getattr(driver, method)
+
+        def counted(*args, _original=original, _counter=counter, **kwargs):
+            metrics.count(_counter)
+            return _original(*args, **kwargs)
+
+        setattr(driver, method, counted)
+    return driver
+
+
+def create_chrome_driver(options):
+    """用缓存的 chromedriver 启动 Chrome；缓存的驱动无法启动时刷新一次再重试"""
+    with metrics.span('browser.launch'):
+        path = resolve_chromedriver()
+        if path:
+            try:
+                return _count_calls(webdriver.Chrome(service=Service(path), options=options))
+            except Exception as e:
+                logger.warning(f"使用 {path} 启动 Chrome 失败，重新解析 ChromeDriver: {str(e)}")
+                refreshed = resolve_chromedriver(refresh=True)
+                if refreshed and refreshed != path:
+                    return _count_calls(webdriver.Chrome(service=Service(refreshed), options=options))
+        # 最后交给 Selenium Manager / 系统 PATH
+        return _count_calls(webdriver.Chrome(options=options))
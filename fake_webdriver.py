@@ -0,0 +1,251 @@
+"""离线测试用的假 WebDriver
+
+按定位器登记元素（可设置出现时间、可见性、点击/输入回调），按脚本片段登记 execute_script 的返回值，
+每个 WebDriver 命令都计为一次往返。配合 FakeClock 替换 time.sleep / time.time / time.monotonic：
+休眠只推进模拟时间并记账，隐式等待按 chromedriver 的行为把时钟推进到元素出现或超时为止。
+"""
+
+import time
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+
+class FakeClock:
+    """模拟时钟：sleeps 记录每次主动休眠，now 为自开始以来的模拟秒数（含隐式等待）"""
+
+    def __init__(self, start=1700000000.0):
+        self.start = start
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += max(0.0, seconds)
+
+    def advance(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def time(self):
+        return self.start + self.now
+
+    def monotonic(self):
+        return self.now
+
+    @property
+    def slept(self):
+        return sum(self.sleeps)
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(time, 'sleep', self.sleep)
+        monkeypatch.setattr(time, 'time', self.time)
+        monkeypatch.setattr(time, 'monotonic', self.monotonic)
+        return self
+
+
+class FakeElement:
+    def __init__(self, text='', tag='div', attributes=None, displayed=True, enabled=True,
+                 appears_at=0.0, on_click=None, on_keys=None):
+        self.driver = None
+        self._text = text
+        self.tag_name = tag
+        self.attributes = dict(attributes or {})
+        self.displayed = displayed
+        self.enabled = enabled
+        self.appears_at = appears_at  # 模拟时间到达该值后才出现在页面上
+        self.on_click = on_click
+        self.on_keys = on_keys
+        self.clicks = 0
+        self.keys = []
+
+    def _command(self, name):
+        if self.driver:
+            self.driver._command(name)
+
+    @property
+    def text(self):
+        self._command('getElementText')
+        return self._text
+
+    def is_displayed(self):
+        self._command('isElementDisplayed')
+        return self.displayed
+
+    def is_enabled(self):
+        self._command('isElementEnabled')
+        return self.enabled
+
+    def get_attribute(self, name):
+        self._command('getElementAttribute')
+        return self.attributes.get(name)
+
+    def click(self):
+        self._command('clickElement')
+        self.clicks += 1
+        if self.on_click:
+            self.on_click(self)
+
+    def send_keys(self, *values):
+        self._command('sendKeysToElement')
+        value = ''.join(values)
+        self.keys.append(value)
+        if self.on_keys:
+            self.on_keys(self, value)
+
+    def clear(self):
+        self._command('clearElement')
+        self.keys = []
+
+
+class FakeWebDriver:
+    """按登记的元素与脚本应答的 WebDriver；commands 记录全部命令，round_trips 为往返次数"""
+
+    def __init__(self, clock=None, window_size=(1280, 800)):
+        self.clock = clock or FakeClock()
+        self.commands = []
+        self.implicit_wait = 0
+        self.implicit_waited = 0.0  # 因隐式等待而推进的模拟秒数
+        self.window_size = {'width': window_size[0], 'height': window_size[1]}
+        self.log_available = True
+        self.performance_log = []
+        self.screenshots = []
+        self.quit_called = False
+        self._url = 'about:blank'
+        self._title = ''
+        self._elements = {}
+        self._scripts = []
+        self._async_scripts = []
+        self._cdp = {}
+
+    # ---- 登记页面内容 ----
+
+    def add(self, by, selector, element=None, **kwargs):
+        """在定位器 (by, selector) 下登记一个元素并返回它"""
+        element = element or FakeElement(**kwargs)
+        element.driver = self
+        self._elements.setdefault((by, selector), []).append(element)
+        return element
+
+    def on_script(self, marker, result):
+        """脚本包含 marker 时返回 result；result 可调用时以脚本参数调用"""
+        self._scripts.append((marker, result))
+
+    def on_async_script(self, marker, result):
+        self._async_scripts.append((marker, result))
+
+    def on_cdp(self, cmd, result):
+        self._cdp[cmd] = result
+
+    def set_page(self, url=None, title=None):
+        if url is not None:
+            self._url = url
+        if title is not None:
+            self._title = title
+
+    # ---- 往返统计 ----
+
+    def _command(self, name):
+        self.commands.append(name)
+
+    @property
+    def round_trips(self):
+        return len(self.commands)
+
+    def mark(self):
+        return len(self.commands)
+
+    def since(self, mark):
+        return len(self.commands) - mark
+
+    # ---- WebDriver 接口 ----
+
+    @property
+    def current_url(self):
+        self._command('getCurrentUrl')
+        return self._url
+
+    @property
+    def title(self):
+        self._command('getTitle')
+        return self._title
+
+    def get(self, url):
+        self._command('get')
+        self._url = url
+
+    def implicitly_wait(self, seconds):
+        self._command('setTimeouts')
+        self.implicit_wait = seconds
+
+    def set_script_timeout(self, seconds):
+        self._command('setTimeouts')
+
+    def get_window_size(self):
+        self._command('getWindowRect')
+        return dict(self.window_size)
+
+    def set_window_size(self, width, height):
+        self._command('setWindowRect')
+        self.window_size = {'width': width, 'height': height}
+
+    def _present(self, by, selector):
+        return [e for e in self._elements.get((by, selector), []) if e.appears_at <= self.clock.now]
+
+    def _implicit_wait_for(self, by, selector):
+        """模拟 chromedriver 的隐式等待：推进时钟直到元素出现或等待超时"""
+        if not self.implicit_wait:
+            return []
+        deadline = self.clock.now + self.implicit_wait
+        pending = [e.appears_at for e in self._elements.get((by, selector), []) if e.appears_at <= deadline]
+        target = min(pending) if pending else deadline
+        self.implicit_waited += target - self.clock.now
+        self.clock.advance(target - self.clock.now)
+        return self._present(by, selector)
+
+    def find_element(self, by, value=None):
+        self._command('findElement')
+        found = self._present(by, value) or self._implicit_wait_for(by, value)
+        if not found:
+            raise NoSuchElementException(f"{by}={value}")
+        return found[0]
+
+    def find_elements(self, by, value=None):
+        self._command('findElements')
+        return self._present(by, value) or self._implicit_wait_for(by, value)
+
+    @staticmethod
+    def _dispatch(handlers, script, args):
+        for marker, result in handlers:
+            if marker in script:
+                return result(*args) if callable(result) else result
+        return None
+
+    def execute_script(self, script, *args):
+        self._command('executeScript')
+        return self._dispatch(self._scripts, script, args)
+
+    def execute_async_script(self, script, *args):
+        self._command('executeAsyncScript')
+        return self._dispatch(self._async_scripts, script, args)
+
+    def execute_cdp_cmd(self, cmd, params):
+        self._command('executeCdpCommand')
+        result = self._cdp.get(cmd, {})
+        return result(params) if callable(result) else result
+
+    def get_log(self, log_type):
+        self._command('getLog')
+        if not self.log_available:
+            raise WebDriverException('performance log is not enabled')
+        entries, self.performance_log = self.performance_log, []
+        return entries
+
+    def save_screenshot(self, path):
+        """写入视口大小的纯白 PNG（需要 Pillow）"""
+        self._command('takeScreenshot')
+        from PIL import Image
+        Image.new('RGB', (self.window_size['width'], self.window_size['height']), 'white').save(path)
+        self.screenshots.append(path)
+        return True
+
+    def quit(self):
+        self._command('quit')
+        self.quit_called = True
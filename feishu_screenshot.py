@@ -1,20 +1,61 @@
 import os
+import json
 import time
-from selenium import webdriver
+import hashlib
+import pathlib
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 import logging
 from config import Config
+import metrics
+from network_monitor import NetworkActivityTracker
+from browser_cache import BrowserCache
+from run_artifacts import new_run_id
+from driver_factory import chrome_options as base_chrome_options, create_chrome_driver, implicit_wait_disabled
+from frame_export import MasterRendering, plan_pages, block_break_points, mask_outside_rows
 
 class FeishuScreenshot:
-    def __init__(self, aspect_ratio: float = None, screenshot_width: int = None, screenshot_height: int = None):
+    # 飞书正文可能的滚动容器（按优先级）
+    SCROLL_CONTAINER_SELECTORS = [
+        'div[class*="content"]',
+        'div[class*="wiki"]',
+        'div[class*="document"]',
+        'div[class*="note"]',
+        'div[class*="editor"]',
+        'main',
+        'article',
+        'div[style*="overflow"]',
+        'div[style*="scroll"]'
+    ]
+
+    # 分页时不应被切断的块级元素
+    BLOCK_SELECTORS = [
+        '[data-block-id]',
+        'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+        'li', 'pre', 'blockquote', 'table', 'figure', 'img'
+    ]
+
+    def __init__(self, aspect_ratio: float = None, screenshot_width: int = None, screenshot_height: int = None,
+                 device_scale_factor: float = None, viewport_width: int = None, headless: bool = None):
         self.driver = None
+        self.frames = []  # 最近一次截图每帧的几何信息
+        self.title = None  # 最近一次截图的笔记标题
+        self.last_error = None  # 最近一次截图的错误信息
+        self.cancelled = False  # 最近一次截图是否被取消
+        self.snapshot_path = None  # 最近一次保存的 MHTML 快照
+        self._primed = False  # 当前页面是否已完成懒加载预热
+        self.network = None  # NetworkActivityTracker，setup_driver 后可用
+        self.cache = None  # 共享磁盘缓存（SHARED_BROWSER_CACHE 开启时）
+        self._cache_slot = None
+        self.trace_categories = None  # 非空时录制 Chrome trace（见 save_trace）
         self.config = Config()
+        if viewport_width:
+            self.config.VIEWPORT_WIDTH = int(viewport_width)
+        if headless is not None:
+            self.config.BROWSER_HEADLESS = bool(headless)
         self.aspect_ratio = float(aspect_ratio) if aspect_ratio else None  # r = 宽/高
+        self.device_scale_factor = float(device_scale_factor or self.config.DEVICE_SCALE_FACTOR)
         # 保持向后兼容：若传入明确宽高则沿用
         if screenshot_width:
             self.config.SCREENSHOT_WIDTH = int(screenshot_width)
@@ -29,52 +70,181 @@ class FeishuScreenshot:
         )
         self.logger = logging.getLogger(__name__)
         
-    def setup_driver(self):
-        """设置Chrome浏览器驱动"""
-        chrome_options = Options()
-        if self.config.BROWSER_HEADLESS:
-            chrome_options.add_argument('--headless')
-        
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
+    def setup_driver(self, block_profile=None):
+        """设置Chrome浏览器驱动
+
+        block_profile 为 Config.BLOCK_PROFILES 中的方案名，缺省时使用截图方案 CAPTURE_BLOCK_PROFILE。
+        """
+        block_profile = self.config.CAPTURE_BLOCK_PROFILE if block_profile is None else block_profile
+        chrome_options = base_chrome_options(self.config.BROWSER_HEADLESS)
+        # 开启性能日志，用于基于 CDP Network 事件的网络空闲检测
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        if self.trace_categories:
+            # chromedriver 按这些类别录制 trace，事件以 Tracing.dataCollected 出现在性能日志中
+            chrome_options.add_experimental_option('perfLoggingPrefs', {
+                'enableNetwork': True, 'enablePage': False, 'traceCategories': self.trace_categories,
+            })
+        if block_profile == self.config.TEXT_BLOCK_PROFILE:
+            # 正文模式下连无扩展名的图片地址也不加载
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        if self.config.SHARED_BROWSER_CACHE:
+            self.cache = BrowserCache()
+            self._cache_slot, cache_path = self.cache.acquire()
+            if cache_path:
+                for argument in self.cache.chrome_arguments(cache_path):
+                    chrome_options.add_argument(argument)
         
         # 仅当显式给出宽高时才固定窗口尺寸；否则采用浏览器默认宽度
         if hasattr(self, 'config') and self.config.SCREENSHOT_WIDTH and self.config.SCREENSHOT_HEIGHT and not self.aspect_ratio:
             chrome_options.add_argument(f'--window-size={self.config.SCREENSHOT_WIDTH},{self.config.SCREENSHOT_HEIGHT}')
         
         try:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e:
-            self.logger.error(f"ChromeDriver初始化失败: {str(e)}")
-            # 尝试使用系统PATH中的ChromeDriver
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = create_chrome_driver(chrome_options)
+        except Exception:
+            if self.cache:
+                self.cache.release(self._cache_slot)
+            raise
+        if self.cache and self._cache_slot is not None:
+            # 锁文件记录 chromedriver 进程，浏览器退出后槽位即可被复用
+            self.cache.bind(self._cache_slot, getattr(getattr(self.driver.service, 'process', None), 'pid', None))
         self.driver.implicitly_wait(self.config.BROWSER_TIMEOUT)
+        self.network = NetworkActivityTracker(self.driver, self.config.NETWORK_LONG_REQUEST_SECONDS)
+        if self.trace_categories:
+            self.network.start_trace()
+        self.apply_block_profile(block_profile)
         
-        # 按照宽高比设置窗口高度（宽保持为默认浏览器宽度）
+        self.apply_viewport()
+
+    def save_trace(self, output_path):
+        """停止录制并把 trace 写为 Chrome trace 格式（可用 Perfetto 或 chrome://tracing 打开），返回事件数"""
+        if not self.network or self.network.trace_events is None:
+            return 0
+        try:
+            events = self.network.stop_trace()
+            tmp_path = output_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'metadata': {'categories': self.trace_categories}}, f)
+            os.replace(tmp_path, output_path)
+            self.logger.info(f"Chrome trace 已保存: {output_path}（{len(events)} 个事件）")
+            return len(events)
+        except Exception as e:
+            self.logger.error(f"保存 Chrome trace 失败: {str(e)}")
+            return 0
+
+    def apply_block_profile(self, profile):
+        """通过 CDP Network.setBlockedURLs 屏蔽与正文无关的请求；profile 为空时取消屏蔽"""
+        patterns = self.config.BLOCK_PROFILES.get(profile, []) if profile else []
+        if profile and profile not in self.config.BLOCK_PROFILES:
+            self.logger.warning(f"未知的请求屏蔽方案: {profile}，不屏蔽任何请求")
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+            if patterns:
+                self.logger.info(f"已启用请求屏蔽方案 {profile}（{len(patterns)} 条规则）")
+            return True
+        except Exception as e:
+            self.logger.warning(f"设置请求屏蔽失败: {str(e)}")
+            return False
+
+    def record_cache_stats(self):
+        """把当前页面的缓存命中情况累计到共享缓存统计，返回累计结果"""
+        if not (self.cache and self._cache_slot is not None and self.network and self.network.available):
+            return None
+        stats = self.network_stats()
+        total = self.cache.record(stats['requests'], stats['cache_hits'], stats['bytes'])
+        self.logger.info(
+            f"缓存命中 {stats['cache_hits']}/{stats['requests']}，"
+            f"累计命中率 {BrowserCache.hit_rate(total):.0%}（{total['pages']} 次页面加载）"
+        )
+        return total
+
+    def warm_cache(self, urls):
+        """预热共享缓存：为每个缓存槽位各打开一个无头浏览器加载给定页面，返回累计统计"""
+        if not self.config.SHARED_BROWSER_CACHE:
+            self.logger.warning("未开启 SHARED_BROWSER_CACHE，无需预热")
+            return None
+        shots = []
+        total = None
+        try:
+            for _ in range(self.config.BROWSER_CACHE_SLOTS):
+                # 同时保持各浏览器打开，使每个槽位都被占用并预热
+                shot = FeishuScreenshot(headless=True)
+                shot.setup_driver()
+                shots.append(shot)
+                if shot._cache_slot is None:
+                    break
+                for url in urls:
+                    if shot.navigate_to_note(url):
+                        shot.prime_lazy_content()
+                        total = shot.record_cache_stats() or total
+            return total
+        except Exception as e:
+            self.logger.error(f"预热缓存失败: {str(e)}")
+            return total
+        finally:
+            for shot in shots:
+                if shot.driver:
+                    shot.driver.quit()
+                    shot.driver = None
+
+    def network_stats(self):
+        """当前页面的请求统计：发出、完成、失败、被屏蔽的请求数与接收字节数"""
+        if not self.network:
+            return {}
+        self.network.poll()
+        return {
+            'requests': self.network.request_count,
+            'finished': self.network.finished_count,
+            'failed': self.network.failed_count,
+            'blocked': self.network.blocked_count,
+            'bytes': self.network.bytes_received,
+            'cache_hits': self.network.cache_hits,
+        }
+
+    def apply_viewport(self):
+        """通过 CDP 精确设定视口尺寸（CSS 像素）与设备像素比，不受浏览器边框影响"""
         try:
             if self.aspect_ratio:
-                # 宽采用当前窗口的可见宽度
-                width = int(self.driver.execute_script("return window.innerWidth;") or 0)
+                # 宽采用配置宽度，未配置时取当前窗口的可见宽度
+                width = int(self.config.VIEWPORT_WIDTH or self.driver.execute_script("return window.innerWidth;") or 0)
                 if width <= 0:
                     width = int(self.driver.get_window_size().get('width', 1080))
                 # r = 宽/高 => 高 = 宽 / r
-                target_height = max(360, int(width / self.aspect_ratio))
-                self.driver.set_window_size(width, target_height)
-                # 同步更新配置，供下游日志/计算参考
-                self.config.SCREENSHOT_WIDTH = width
-                self.config.SCREENSHOT_HEIGHT = target_height
-        except Exception:
-            pass
+                height = int(round(width / self.aspect_ratio))
+            elif self.config.SCREENSHOT_WIDTH and self.config.SCREENSHOT_HEIGHT:
+                width, height = int(self.config.SCREENSHOT_WIDTH), int(self.config.SCREENSHOT_HEIGHT)
+                if self.config.VIEWPORT_WIDTH:
+                    # 指定了视口宽度但没有宽高比：保持截图尺寸的比例
+                    width, height = int(self.config.VIEWPORT_WIDTH), int(round(self.config.VIEWPORT_WIDTH * height / width))
+            else:
+                return
+        except Exception as e:
+            self.logger.warning(f"计算视口尺寸失败: {str(e)}")
+            return
+
+        try:
+            self.driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                'width': width,
+                'height': height,
+                'deviceScaleFactor': self.device_scale_factor,
+                'mobile': False,
+            })
+            self.logger.info(f"视口已设置为 {width}x{height}（CSS像素），设备像素比 {self.device_scale_factor:g}")
+        except Exception as e:
+            # 非 Chromium 内核或 CDP 不可用时退回调整窗口大小（包含浏览器边框，比例会有偏差）
+            self.logger.warning(f"CDP 视口设置失败，改用调整窗口大小: {str(e)}")
+            try:
+                self.driver.set_window_size(width, max(360, height))
+            except Exception:
+                return
 
     
     def navigate_to_note(self, note_url):
         """导航到指定的飞书笔记（优化等待策略，启动更快）"""
         try:
+            self._primed = False
+            if self.network:
+                self.network.reset()
             self.driver.get(note_url)
             self.logger.info(f"正在打开笔记: {note_url}")
             
@@ -113,8 +283,11 @@ class FeishuScreenshot:
                 # 恢复隐式等待
                 self.driver.implicitly_wait(_original_implicit)
             
-            # 给予极短时间让首屏内容稳定
-            time.sleep(1)
+            # 等待飞书通过 XHR 拉取并渲染正文，直到网络空闲；性能日志不可用时退回固定等待
+            if not (self.network and self.network.available):
+                time.sleep(1)
+            else:
+                self.wait_for_network_idle()
             return True
         
         except Exception as e:
@@ -136,20 +309,21 @@ class FeishuScreenshot:
                 (By.XPATH, "//title")
             ]
             
-            for selector_type, selector in title_selectors:
-                try:
-                    title_element = self.driver.find_element(selector_type, selector)
-                    title = title_element.text.strip()
-                    if title:
-                        # 清理不可见字符
-                        import re
-                        title = re.sub(r'[\u200B-\u200D\uFEFF]', '', title)  # 移除零宽字符
-                        title = re.sub(r'\s+', ' ', title)  # 合并多个空格
-                        title = title.strip()
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                for selector_type, selector in title_selectors:
+                    try:
+                        title_element = self.driver.find_element(selector_type, selector)
+                        title = title_element.text.strip()
                         if title:
-                            return title
-                except:
-                    continue
+                            # 清理不可见字符
+                            import re
+                            title = re.sub(r'[\u200B-\u200D\uFEFF]', '', title)  # 移除零宽字符
+                            title = re.sub(r'\s+', ' ', title)  # 合并多个空格
+                            title = title.strip()
+                            if title:
+                                return title
+                    except:
+                        continue
             
             # 如果都没找到，尝试从页面标题获取
             try:
@@ -169,8 +343,9 @@ class FeishuScreenshot:
         except:
             return "飞书笔记"
     
-    def get_note_content(self):
-        """获取笔记内容"""
+    @metrics.timed('extract.content')
+    def get_note_content(self, close=True):
+        """获取笔记内容；close=False 时保留浏览器供后续复用"""
         try:
             # 确保页面已加载
             try:
@@ -180,52 +355,9 @@ class FeishuScreenshot:
             except Exception:
                 pass
 
-            # 尝试找到主要滚动容器，并滚动至底部以触发懒加载
-            find_container_js = """
-            const selectors = [
-                'div[class*="content"]','div[class*="wiki"]','div[class*="document"]',
-                'div[class*="editor"]','div[class*="note"]','main','article','div[role="main"]'
-            ];
-            for (const s of selectors) {
-                const el = document.querySelector(s);
-                if (el) return s;
-            }
-            return null;
-            """
-            container_selector = self.driver.execute_script(find_container_js)
-
-            def scroll_to_bottom():
-                try:
-                    if container_selector:
-                        # 容器滚动
-                        view = int(self.driver.execute_script("return document.querySelector(arguments[0]).clientHeight;", container_selector) or 0)
-                        total = int(self.driver.execute_script("return document.querySelector(arguments[0]).scrollHeight;", container_selector) or 0)
-                        pos = int(self.driver.execute_script("return document.querySelector(arguments[0]).scrollTop;", container_selector) or 0)
-                        step = max(200, view - 150) if view else 400
-                        loops = 0
-                        while pos + view + 5 < total and loops < 50:
-                            self.driver.execute_script("document.querySelector(arguments[0]).scrollTop = arguments[1];", container_selector, pos + step)
-                            time.sleep(0.25)
-                            pos = int(self.driver.execute_script("return document.querySelector(arguments[0]).scrollTop;", container_selector) or 0)
-                            total = int(self.driver.execute_script("return document.querySelector(arguments[0]).scrollHeight;", container_selector) or 0)
-                            loops += 1
-                    else:
-                        # 页面滚动
-                        view = int(self.driver.execute_script("return window.innerHeight;") or 0)
-                        total = int(self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);") or 0)
-                        pos = int(self.driver.execute_script("return window.pageYOffset;") or 0)
-                        step = max(200, view - 150) if view else 400
-                        loops = 0
-                        while pos + view + 5 < total and loops < 50:
-                            self.driver.execute_script("window.scrollTo(0, arguments[0]);", pos + step)
-                            time.sleep(0.25)
-                            pos = int(self.driver.execute_script("return window.pageYOffset;") or 0)
-                            total = int(self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);") or 0)
-                            loops += 1
-                except Exception:
-                    pass
-
-            scroll_to_bottom()
+            # 预先触发懒加载，确保正文完整（截图时已预热过则跳过）
+            if not self._primed:
+                self.prime_lazy_content()
 
             # 首选：从主要内容容器中读取 innerText（更完整，保留换行）
             content_selectors = [
@@ -250,24 +382,30 @@ class FeishuScreenshot:
 
             import re
             content_chunks = []
-            for selector_type, selector in content_selectors:
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                # 只等待一次任一容器出现，之后逐个选择器直接查找，不存在的选择器不再各等 2 秒
                 try:
-                    el = WebDriverWait(self.driver, 2).until(
-                        EC.presence_of_element_located((selector_type, selector))
+                    WebDriverWait(self.driver, 2).until(
+                        EC.any_of(*[EC.presence_of_element_located(loc) for loc in content_selectors])
                     )
-                    inner_text = ""
+                except Exception:
+                    pass
+                for selector_type, selector in content_selectors:
                     try:
-                        inner_text = (self.driver.execute_script("return arguments[0].innerText;", el) or "").strip()
-                    except Exception:
+                        el = self.driver.find_element(selector_type, selector)
                         inner_text = ""
-                    text = inner_text or (el.text or "").strip()
-                    if text:
-                        # 规范化换行与空白
-                        text = re.sub(r"[\u200B-\u200D\uFEFF]", "", text)
-                        text = re.sub(r"\s+\n", "\n", text)
-                        content_chunks.append(text)
-                except Exception:
-                    continue
+                        try:
+                            inner_text = (self.driver.execute_script("return arguments[0].innerText;", el) or "").strip()
+                        except Exception:
+                            inner_text = ""
+                        text = inner_text or (el.text or "").strip()
+                        if text:
+                            # 规范化换行与空白
+                            text = re.sub(r"[\u200B-\u200D\uFEFF]", "", text)
+                            text = re.sub(r"\s+\n", "\n", text)
+                            content_chunks.append(text)
+                    except Exception:
+                        continue
 
             if content_chunks:
                 merged = "\n".join(content_chunks).strip()
@@ -306,32 +444,61 @@ class FeishuScreenshot:
             self.logger.error(f"获取笔记内容时发生错误: {str(e)}")
             return ""
         finally:
-            if self.driver:
+            if close and self.driver:
                 self.driver.quit()
+                self.driver = None
     
-    def take_full_screenshot(self, note_url, output_dir=None):
-        """对飞书笔记进行完整截图"""
+    def take_full_screenshot(self, note_url, output_dir=None, snapshot_path=None):
+        """对飞书笔记进行完整截图，返回 (截图文件列表, 标题)；需要逐帧处理时使用 iter_screenshots"""
+        files = [frame['path'] for frame in self.iter_screenshots(note_url, output_dir, snapshot_path)]
+        if self.last_error or not files:
+            return None, None
+        return files, self.title
+
+    def iter_screenshots(self, note_url, output_dir=None, snapshot_path=None, cancel=None, with_bytes=False):
+        """逐帧截图的生成器：每截完一帧立即产出 {index, path, offset, height, sha1, ...}
+
+        offset/height 为该帧有效内容在整篇中的位置与高度（CSS像素）；with_bytes=True 时附带 PNG 数据。
+        cancel 为 threading.Event 或返回布尔值的函数，置位后在下一帧之前停止；关闭生成器同样会停止截图。
+        给出 snapshot_path（或开启 SAVE_SNAPSHOT）时同时保存 MHTML 快照。出错时记录到 self.last_error。
+        """
         if output_dir is None:
-            output_dir = self.config.SCREENSHOT_DIR
+            # 每次截图使用独立子目录，避免并发运行互相覆盖 screenshot_000.png
+            output_dir = os.path.join(self.config.SCREENSHOT_DIR, new_run_id())
 
         os.makedirs(output_dir, exist_ok=True)
+        self.frames = []
+        self.snapshot_path = None
+        self.title = None
+        self.last_error = None
+        self.cancelled = False
+        if snapshot_path is None and self.config.SAVE_SNAPSHOT:
+            snapshot_path = os.path.join(output_dir, 'snapshot.mhtml')
 
+        # 生成器会在 yield 处挂起，整体 span 不压入线程的 span 栈，内部各步骤显式指定父 span
+        self._capture_span = metrics.start_span('capture', detached=True, url=note_url)
         try:
-            # 设置浏览器驱动
-            self.setup_driver()
+            # 设置浏览器驱动（已有可用浏览器时直接复用）
+            if self.driver:
+                self.apply_viewport()
+            else:
+                self.setup_driver()
 
             # 直接导航到笔记页面
             self.logger.info("导航到笔记页面...")
-            if not self.navigate_to_note(note_url):
-                return None, None
+            with metrics.span('capture.navigate', parent=self._capture_span):
+                opened = self.navigate_to_note(note_url)
+            if not opened:
+                self.last_error = "打开笔记失败"
+                return
 
             # 获取笔记信息
             title = self.get_note_title()
+            self.title = title
             self.logger.info(f"笔记标题: {title}")
 
             # 确保从顶部开始
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(2)
 
             # 获取页面信息
             viewport_height = self.driver.execute_script("return window.innerHeight;")
@@ -340,85 +507,80 @@ class FeishuScreenshot:
             # 先滚动到底部，然后获取实际高度
             self.logger.info("检测页面实际高度...")
             
-            # 滚动到底部触发内容加载
-            self.driver.execute_script("window.scrollTo(0, 999999);")
-            time.sleep(3)
+            # 预先触发全部懒加载内容，之后逐帧截图无需再等待加载
+            with metrics.span('capture.prime', parent=self._capture_span):
+                self.prime_lazy_content()
 
             # 尝试获取主要内容区域的高度
-            total_height = self.driver.execute_script("""
-                // 尝试多种方法获取页面高度
-                var height = 0;
+            with metrics.span('capture.height_probe', parent=self._capture_span):
+                total_height = self.driver.execute_script("""
+                    // 尝试多种方法获取页面高度
+                    var height = 0;
                 
-                // 方法1: 获取文档高度
-                height = Math.max(height, document.documentElement.scrollHeight);
-                height = Math.max(height, document.body.scrollHeight);
+                    // 方法1: 获取文档高度
+                    height = Math.max(height, document.documentElement.scrollHeight);
+                    height = Math.max(height, document.body.scrollHeight);
                 
-                // 方法2: 获取内容元素高度
-                var contentElements = document.querySelectorAll('div[class*="content"], div[class*="wiki"], div[class*="document"], main, article, div[class*="note"], div[class*="editor"]');
-                for (var i = 0; i < contentElements.length; i++) {
-                    var elementHeight = contentElements[i].scrollHeight || contentElements[i].offsetHeight;
-                    if (elementHeight > height) {
-                        height = elementHeight;
+                    // 方法2: 获取内容元素高度
+                    var contentElements = document.querySelectorAll('div[class*="content"], div[class*="wiki"], div[class*="document"], main, article, div[class*="note"], div[class*="editor"]');
+                    for (var i = 0; i < contentElements.length; i++) {
+                        var elementHeight = contentElements[i].scrollHeight || contentElements[i].offsetHeight;
+                        if (elementHeight > height) {
+                            height = elementHeight;
+                        }
                     }
-                }
                 
-                // 方法3: 获取所有可见元素的最大底部位置
-                var allElements = document.querySelectorAll('*');
-                for (var i = 0; i < allElements.length; i++) {
-                    var rect = allElements[i].getBoundingClientRect();
-                    var bottom = rect.bottom + window.pageYOffset;
-                    if (bottom > height) {
-                        height = bottom;
+                    // 方法3: 获取所有可见元素的最大底部位置
+                    var allElements = document.querySelectorAll('*');
+                    for (var i = 0; i < allElements.length; i++) {
+                        var rect = allElements[i].getBoundingClientRect();
+                        var bottom = rect.bottom + window.pageYOffset;
+                        if (bottom > height) {
+                            height = bottom;
+                        }
                     }
-                }
                 
-                return height;
-            """)
+                    return height;
+                """)
             self.logger.info(f"通过多种方法检测到高度: {total_height}")
 
             
             self.logger.info(f"页面总高度: {total_height}, 视口高度: {viewport_height}")
             
+            # 懒加载内容已触发，此时保存快照最完整
+            if snapshot_path:
+                self.save_snapshot(snapshot_path)
+            
             # 如果页面内容确实很短，只截一张图
             if total_height <= viewport_height:
                 self.logger.info("页面内容较短，只截取一张图片")
                 screenshot_path = os.path.join(output_dir, f"screenshot_000.png")
-                self.driver.save_screenshot(screenshot_path)
-                screenshot_files = [screenshot_path]
+                with metrics.span('capture.frame', parent=self._capture_span):
+                    self.driver.save_screenshot(screenshot_path)
+                self._record_frame(screenshot_path, 0, {'content_top': 0, 'view_top': 0, 'view_bottom': viewport_height})
+                yield self._frame_output(with_bytes)
                 self.logger.info("截图完成，共 1 张")
-                return screenshot_files, title
+                return
 
             # 滚动截图
             screenshot_files = []
             current_position = 0
-            overlap = 200  # 截图重叠部分
-            scroll_step = viewport_height - overlap
             
             screenshot_count = 0
             max_screenshots = 50  # 防止无限循环
             
-            # 尝试找到正确的滚动容器
+            # 尝试找到正确的滚动容器（找到后打上标记，后续滚动直接按标记定位）
             scroll_container = self.driver.execute_script("""
                 // 查找飞书的主要滚动容器
-                var selectors = [
-                    'div[class*="content"]',
-                    'div[class*="wiki"]', 
-                    'div[class*="document"]',
-                    'div[class*="note"]',
-                    'div[class*="editor"]',
-                    'main',
-                    'article',
-                    'div[style*="overflow"]',
-                    'div[style*="scroll"]'
-                ];
+                var selectors = arguments[0];
                 
                 for (var i = 0; i < selectors.length; i++) {
                     var elements = document.querySelectorAll(selectors[i]);
                     for (var j = 0; j < elements.length; j++) {
                         var element = elements[j];
                         if (element.scrollHeight > element.clientHeight && element.scrollHeight > 1000) {
+                            element.setAttribute('data-fs-scroll-container', '1');
                             return {
-                                element: element,
                                 selector: selectors[i],
                                 scrollHeight: element.scrollHeight,
                                 clientHeight: element.clientHeight
@@ -427,7 +589,7 @@ class FeishuScreenshot:
                     }
                 }
                 return null;
-            """)
+            """, self.SCROLL_CONTAINER_SELECTORS)
             
             if scroll_container:
                 self.logger.info(f"找到滚动容器: {scroll_container['selector']}")
@@ -436,54 +598,56 @@ class FeishuScreenshot:
                 total_height = scroll_container['scrollHeight']
             else:
                 self.logger.warning("未找到专门的滚动容器，使用文档高度")
+            
+            # 测量固定/吸顶浮层，可隐藏的直接隐藏，其余从可视区域中扣除
+            visible_area = self._measure_visible_area()
+            if visible_area['overlays'] and self.config.HIDE_FIXED_OVERLAYS:
+                self._set_overlays_hidden(True)
+                visible_area = self._measure_visible_area()
+            unobstructed_height = max(1, visible_area['view_bottom'] - visible_area['view_top'])
+            overlap = max(self.config.SCROLL_MIN_OVERLAP, int(unobstructed_height * self.config.SCROLL_OVERLAP))
+            scroll_step = max(1, unobstructed_height - overlap)
+            self.logger.info(f"无遮挡内容高度: {unobstructed_height}px, 重叠: {overlap}px, 滚动步长: {scroll_step}px")
 
-            while current_position < total_height and screenshot_count < max_screenshots:
+            # 按块级元素几何预先规划分页：每页尽量填满且不切断段落/图片/表格，无需重叠
+            page_plan = None
+            if self.config.PAGINATION_MODE == 'blocks':
+                page_plan = self._plan_block_pages(total_height, unobstructed_height)
+            # 内容坐标 y 出现在无遮挡区域顶部时对应的滚动位置偏移
+            view_offset = visible_area['view_top'] - visible_area['content_top']
+
+            while screenshot_count < max_screenshots:
+                if self._cancel_requested(cancel):
+                    self.cancelled = True
+                    self.logger.info(f"截图已取消，已完成 {len(screenshot_files)} 张")
+                    break
+                if page_plan is not None:
+                    if screenshot_count >= len(page_plan):
+                        break
+                    page_start, page_end = page_plan[screenshot_count]
+                    current_position = max(0, int(page_start - view_offset))
+                elif current_position >= total_height:
+                    break
                 # 根据是否找到滚动容器选择滚动方法
                 if scroll_container:
                     # 使用找到的滚动容器
-                    self.driver.execute_script("""
-                        var selectors = arguments[0];
-                        var targetPosition = arguments[1];
-                        
-                        for (var i = 0; i < selectors.length; i++) {
-                            var elements = document.querySelectorAll(selectors[i]);
-                            for (var j = 0; j < elements.length; j++) {
-                                var element = elements[j];
-                                if (element.scrollHeight > element.clientHeight && element.scrollHeight > 1000) {
-                                    element.scrollTop = targetPosition;
-                                    return element.scrollTop;
-                                }
-                            }
-                        }
-                        return -1;
-                    """, ['div[class*="content"]', 'div[class*="wiki"]', 'div[class*="document"]', 'div[class*="note"]', 'div[class*="editor"]', 'main', 'article'], current_position)
-                    time.sleep(2)
+                    self._scroll_container_to(current_position)
                 else:
                     # 使用传统的页面滚动方法
                     self.driver.execute_script(f"window.scrollTo(0, {current_position});")
-                    time.sleep(1)
                     
                     # 如果window滚动失败，尝试其他方法
                     current_scroll = self.driver.execute_script("return window.pageYOffset;")
                     if abs(current_scroll - current_position) > 50:
                         self.driver.execute_script(f"document.body.scrollTop = {current_position};")
-                        time.sleep(1)
                     
                     current_scroll = self.driver.execute_script("return window.pageYOffset;")
                     if abs(current_scroll - current_position) > 50:
                         self.driver.execute_script(f"document.documentElement.scrollTop = {current_position};")
-                        time.sleep(1)
                 
-                # 等待页面稳定和内容加载
-                time.sleep(2)
-                
-                # 等待页面完全加载
-                try:
-                    WebDriverWait(self.driver, 10).until(
-                        lambda driver: driver.execute_script("return document.readyState") == "complete"
-                    )
-                except:
-                    pass
+                # 懒加载内容已预先加载，只需等待滚动后的绘制完成；滚动若触发了新请求则等其结束
+                self._wait_for_paint()
+                self.wait_for_network_idle(quiet_ms=self.config.SCROLL_NETWORK_QUIET_MS, timeout=self.config.SCROLL_NETWORK_TIMEOUT)
                 
                 # 再次检查页面高度，因为可能有新内容加载
                 current_total_height = self.driver.execute_script("""
@@ -513,28 +677,28 @@ class FeishuScreenshot:
                 
                 # 截图
                 screenshot_path = os.path.join(output_dir, f"screenshot_{screenshot_count:03d}.png")
-                self.driver.save_screenshot(screenshot_path)
+                with metrics.span('capture.frame', parent=self._capture_span):
+                    self.driver.save_screenshot(screenshot_path)
                 screenshot_files.append(screenshot_path)
                 
                 # 获取当前滚动位置进行验证
                 if scroll_container:
                     # 检查容器滚动位置
-                    current_scroll_position = self.driver.execute_script("""
-                        var selectors = arguments[0];
-                        for (var i = 0; i < selectors.length; i++) {
-                            var elements = document.querySelectorAll(selectors[i]);
-                            for (var j = 0; j < elements.length; j++) {
-                                var element = elements[j];
-                                if (element.scrollHeight > element.clientHeight && element.scrollHeight > 1000) {
-                                    return element.scrollTop;
-                                }
-                            }
-                        }
-                        return 0;
-                    """, ['div[class*="content"]', 'div[class*="wiki"]', 'div[class*="document"]', 'div[class*="note"]', 'div[class*="editor"]', 'main', 'article'])
+                    current_scroll_position = self._scroll_container_to(None)
                 else:
                     # 检查页面滚动位置
                     current_scroll_position = self.driver.execute_script("return window.pageYOffset;")
+                if page_plan is not None:
+                    # 只保留本页内容，遮住上一页残留和被截断的下一块
+                    page_area = self._page_area(page_plan[screenshot_count], current_scroll_position, visible_area)
+                    with metrics.span('capture.mask', parent=self._capture_span):
+                        mask_outside_rows(screenshot_path, page_area['view_top'], page_area['view_bottom'],
+                                          visible_area['view_top'], visible_area['view_bottom'], self.device_scale_factor)
+                    self._record_frame(screenshot_path, current_scroll_position, page_area)
+                else:
+                    self._record_frame(screenshot_path, current_scroll_position, visible_area)
+                # 立即交给调用方，调用方可在后续帧截取期间开始处理
+                yield self._frame_output(with_bytes)
                 
                 # 获取详细的滚动信息用于调试
                 scroll_info = self.driver.execute_script("""
@@ -566,8 +730,8 @@ class FeishuScreenshot:
                     for i, container in enumerate(scroll_info['containers']):
                         self.logger.info(f"容器 {i+1}: {container['className']} - scrollTop: {container['scrollTop']}, scrollHeight: {container['scrollHeight']}")
                 
-                # 如果滚动位置没有变化，可能是页面结构问题
-                if screenshot_count > 0 and abs(current_scroll_position - current_position) > 50:
+                # 如果滚动位置没有变化，可能是页面结构问题（按块分页时末页滚动到底被夹紧属正常）
+                if page_plan is None and screenshot_count > 0 and abs(current_scroll_position - current_position) > 50:
                     self.logger.warning(f"滚动位置不匹配！目标: {current_position}, 实际: {current_scroll_position}")
                     
                     # 尝试强制滚动
@@ -575,19 +739,7 @@ class FeishuScreenshot:
                         self.logger.info("尝试强制滚动...")
                         if scroll_container:
                             # 强制滚动容器
-                            self.driver.execute_script("""
-                                var selectors = arguments[0];
-                                var targetPosition = arguments[1];
-                                for (var i = 0; i < selectors.length; i++) {
-                                    var elements = document.querySelectorAll(selectors[i]);
-                                    for (var j = 0; j < elements.length; j++) {
-                                        var element = elements[j];
-                                        if (element.scrollHeight > element.clientHeight && element.scrollHeight > 1000) {
-                                            element.scrollTop = targetPosition;
-                                        }
-                                    }
-                                }
-                            """, ['div[class*="content"]', 'div[class*="wiki"]', 'div[class*="document"]', 'div[class*="note"]', 'div[class*="editor"]', 'main', 'article'], current_position)
+                            self._scroll_container_to(current_position)
                         else:
                             # 强制滚动页面
                             self.driver.execute_script("""
@@ -595,15 +747,359 @@ class FeishuScreenshot:
                                 document.body.scrollTop = arguments[0];
                                 document.documentElement.scrollTop = arguments[0];
                             """, current_position)
-                        time.sleep(3)
+                        self._wait_for_paint()
+                        self.wait_for_network_idle(quiet_ms=self.config.SCROLL_NETWORK_QUIET_MS, timeout=self.config.SCROLL_NETWORK_TIMEOUT)
+
+                if page_plan is not None:
+                    screenshot_count += 1
+                    continue
+
+                # 当前帧已覆盖到内容底部时结束，避免末尾出现被夹住的重复帧
+                visible_bottom = current_scroll_position + visible_area['view_bottom'] - visible_area['content_top']
+                if visible_bottom >= total_height - 1:
+                    break
 
                 # 移动到下一个位置
                 current_position += scroll_step
                 screenshot_count += 1
 
             self.logger.info(f"截图完成，共 {len(screenshot_files)} 张")
-            return screenshot_files, title
+            stats = self.network_stats()
+            if stats:
+                self.logger.info(f"网络请求 {stats['requests']} 个（屏蔽 {stats['blocked']} 个），接收 {stats['bytes'] / 1024:.0f} KB")
+                self.record_cache_stats()
 
         except Exception as e:
             self.logger.error(f"截图过程中出错: {str(e)}")
-            return None, None
\ No newline at end of file
+            self.last_error = str(e)
+            self._capture_span.error = str(e)
+        finally:
+            # 正常结束、取消或生成器被提前关闭时都恢复浮层
+            if self.driver:
+                self._set_overlays_hidden(False)
+            stats = self.network_stats()
+            if stats:
+                self._capture_span.count('network_bytes', stats['bytes'])
+                self._capture_span.count('requests', stats['requests'])
+            self._capture_span.finish('cancelled' if self.cancelled else 'error' if self.last_error else 'ok')
+
+    def save_snapshot(self, output_path):
+        """通过 Page.captureSnapshot 保存当前页面的 MHTML 快照（含样式、图片等资源）"""
+        try:
+            snapshot = self.driver.execute_cdp_cmd('Page.captureSnapshot', {'format': 'mhtml'})
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            # MHTML 使用 CRLF 换行，按原样写入
+            with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(snapshot['data'])
+            self.snapshot_path = output_path
+            self.logger.info(f"页面快照已保存: {output_path}（{len(snapshot['data']) // 1024} KB）")
+            return output_path
+        except Exception as e:
+            self.logger.warning(f"保存页面快照失败: {str(e)}")
+            return None
+
+    def render_snapshot(self, snapshot_path, output_dir=None):
+        """在浏览器中加载本地 MHTML 快照重新截图，不依赖网络与飞书登录
+
+        宽度、宽高比、设备像素比沿用当前实例的设置，可用于以新参数重新渲染同一篇笔记。
+        """
+        if not os.path.exists(snapshot_path):
+            self.logger.error(f"快照文件不存在: {snapshot_path}")
+            return None, None
+        snapshot_url = pathlib.Path(os.path.abspath(snapshot_path)).as_uri()
+        self.logger.info(f"从快照重新渲染: {snapshot_path}")
+        return self.take_full_screenshot(snapshot_url, output_dir=output_dir, snapshot_path=False)
+
+    def _measure_blocks(self):
+        """一次性读取正文块级元素（段落、标题、列表项、图片、表格等）的上下边界（内容坐标）"""
+        return self.driver.execute_script("""
+            var container = document.querySelector('[data-fs-scroll-container]');
+            var root = container || document.body;
+            var originTop, scrollTop;
+            if (container) {
+                originTop = container.getBoundingClientRect().top;
+                scrollTop = container.scrollTop;
+            } else {
+                originTop = 0;
+                scrollTop = window.pageYOffset;
+            }
+            var nodes = root.querySelectorAll(arguments[0]);
+            var blocks = [];
+            for (var i = 0; i < nodes.length; i++) {
+                var r = nodes[i].getBoundingClientRect();
+                if (r.height <= 0 || r.width <= 0) continue;
+                blocks.push([r.top - originTop + scrollTop, r.bottom - originTop + scrollTop]);
+            }
+            return blocks;
+        """, ','.join(self.BLOCK_SELECTORS)) or []
+
+    def _plan_block_pages(self, total_height, page_height):
+        """根据块级元素几何规划分页，返回 [(起始, 结束)]（内容坐标）；无法测量时返回 None"""
+        try:
+            blocks = self._measure_blocks()
+        except Exception as e:
+            self.logger.warning(f"读取块级元素失败，改用固定步长滚动: {str(e)}")
+            return None
+        if not blocks:
+            self.logger.warning("未找到块级元素，改用固定步长滚动")
+            return None
+        breaks = block_break_points(blocks, page_height)
+        pages = plan_pages(total_height, page_height, breaks, min_fill=self.config.PAGINATION_MIN_FILL)
+        self.logger.info(f"按 {len(blocks)} 个块级元素规划分页: {len(pages)} 页")
+        return pages
+
+    def _page_area(self, page, scroll_top, visible_area):
+        """把分页 [起始, 结束) 换算为当前帧中的窗口行范围（受滚动到底部时的位置夹紧影响）"""
+        page_start, page_end = page
+        top = visible_area['content_top'] + page_start - scroll_top
+        bottom = visible_area['content_top'] + page_end - scroll_top
+        return {
+            'content_top': visible_area['content_top'],
+            'view_top': max(visible_area['view_top'], top),
+            'view_bottom': min(visible_area['view_bottom'], bottom),
+        }
+
+    def prime_lazy_content(self, timeout=None):
+        """预先触发飞书的懒加载内容，直到页面不再发起新请求
+
+        1. 把 loading=lazy 改为 eager，并把 data-src/data-srcset 写回 src/srcset；
+        2. 在滚动容器（或页面）内按整屏高速滚动到底，让 IntersectionObserver 回调逐屏触发，再回到顶部；
+        3. 等待网络空闲（性能日志可用时基于 CDP 事件，否则等待图片加载完成且资源数不再增加）。
+        """
+        timeout = timeout or self.config.PRIME_TIMEOUT
+        started = time.time()
+        deadline = started + timeout
+        tracked = bool(self.network and self.network.available)
+        try:
+            self.driver.set_script_timeout(timeout + 5)
+            result = self.driver.execute_async_script("""
+                var done = arguments[arguments.length - 1];
+                var selectors = arguments[0], quietMs = arguments[1], timeoutMs = arguments[2], waitInPage = arguments[3];
+                var start = Date.now();
+                if (performance.setResourceTimingBufferSize) performance.setResourceTimingBufferSize(100000);
+
+                var lazy = document.querySelectorAll('[loading="lazy"]');
+                for (var i = 0; i < lazy.length; i++) lazy[i].setAttribute('loading', 'eager');
+                var deferred = document.querySelectorAll('img[data-src], img[data-original], img[data-srcset], source[data-srcset]');
+                for (var i = 0; i < deferred.length; i++) {
+                    var el = deferred[i];
+                    var src = el.getAttribute('data-src') || el.getAttribute('data-original');
+                    if (src && !el.getAttribute('src')) el.setAttribute('src', src);
+                    var srcset = el.getAttribute('data-srcset');
+                    if (srcset && !el.getAttribute('srcset')) el.setAttribute('srcset', srcset);
+                }
+
+                var container = document.querySelector('[data-fs-scroll-container]');
+                for (var i = 0; !container && i < selectors.length; i++) {
+                    var elements = document.querySelectorAll(selectors[i]);
+                    for (var j = 0; j < elements.length; j++) {
+                        if (elements[j].scrollHeight > elements[j].clientHeight && elements[j].scrollHeight > 1000) {
+                            container = elements[j];
+                            container.setAttribute('data-fs-scroll-container', '1');
+                            break;
+                        }
+                    }
+                }
+                function getTop() { return container ? container.scrollTop : window.pageYOffset; }
+                function setTop(y) { if (container) container.scrollTop = y; else window.scrollTo(0, y); }
+                function viewHeight() { return container ? container.clientHeight : window.innerHeight; }
+                function totalHeight() {
+                    return container ? container.scrollHeight : Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);
+                }
+
+                var steps = 0;
+                function scrollStep() {
+                    var pos = getTop();
+                    var atEnd = pos + viewHeight() >= totalHeight() - 2;
+                    if (!atEnd) {
+                        setTop(pos + viewHeight());
+                        atEnd = getTop() === pos;
+                    }
+                    if (atEnd || steps >= 500 || Date.now() - start > timeoutMs / 2) {
+                        setTop(0);
+                        if (waitInPage) {
+                            setTimeout(waitIdle, 0);
+                        } else {
+                            done({steps: steps, pending: 0, resources: 0, timed_out: false, elapsed: Date.now() - start});
+                        }
+                        return;
+                    }
+                    steps++;
+                    // 两个动画帧，保证 IntersectionObserver 回调在下一次滚动前执行
+                    requestAnimationFrame(function() { requestAnimationFrame(scrollStep); });
+                }
+
+                var lastCount = -1, lastChange = Date.now();
+                function pendingImages() {
+                    var imgs = document.images, pending = 0;
+                    for (var i = 0; i < imgs.length; i++) {
+                        if (imgs[i].getAttribute('src') && !imgs[i].complete) pending++;
+                    }
+                    return pending;
+                }
+                function waitIdle() {
+                    var count = performance.getEntriesByType('resource').length;
+                    if (count !== lastCount) { lastCount = count; lastChange = Date.now(); }
+                    var pending = pendingImages();
+                    var idle = pending === 0 && Date.now() - lastChange >= quietMs;
+                    if (idle || Date.now() - start > timeoutMs) {
+                        done({steps: steps, pending: pending, resources: count, timed_out: !idle, elapsed: Date.now() - start});
+                        return;
+                    }
+                    setTimeout(waitIdle, 100);
+                }
+                scrollStep();
+            """, self.SCROLL_CONTAINER_SELECTORS, self.config.PRIME_QUIET_MS, int(timeout * 1000), not tracked)
+            if tracked:
+                # 由 CDP 网络事件判断加载完成，比页面内的资源计数更准确
+                remaining = max(1.0, deadline - time.time())
+                result['timed_out'] = not self.network.wait_for_network_idle(self.config.PRIME_QUIET_MS, remaining)
+                result['resources'] = self.network.request_count
+                result['elapsed'] = int((time.time() - started) * 1000)
+            self._primed = not result['timed_out']
+            self.logger.info(f"懒加载预热完成: 滚动 {result['steps']} 屏，资源 {result['resources']} 个，耗时 {result['elapsed']}ms")
+            if result['timed_out']:
+                self.logger.warning("懒加载预热超时，页面仍有未完成的请求")
+            return result
+        except Exception as e:
+            self.logger.warning(f"懒加载预热失败: {str(e)}")
+            return None
+
+    def wait_for_network_idle(self, quiet_ms=None, timeout=None):
+        """等待页面网络空闲（quiet_ms 内无请求进行且无新活动）；性能日志不可用时返回 False"""
+        if not self.network:
+            return False
+        quiet_ms = self.config.NETWORK_IDLE_QUIET_MS if quiet_ms is None else quiet_ms
+        timeout = self.config.NETWORK_IDLE_TIMEOUT if timeout is None else timeout
+        return self.network.wait_for_network_idle(quiet_ms, timeout)
+
+    def _wait_for_paint(self):
+        """等待滚动后的下一次绘制（两个动画帧；后台标签页动画帧被节流时 100ms 兜底）"""
+        try:
+            self.driver.execute_async_script("""
+                var done = arguments[arguments.length - 1];
+                var finished = false;
+                function finish() { if (!finished) { finished = true; done(true); } }
+                setTimeout(finish, 100);
+                requestAnimationFrame(function() { requestAnimationFrame(finish); });
+            """)
+        except Exception:
+            time.sleep(0.1)
+
+    @staticmethod
+    def _cancel_requested(cancel):
+        if cancel is None:
+            return False
+        return cancel.is_set() if hasattr(cancel, 'is_set') else bool(cancel())
+
+    def _frame_output(self, with_bytes=False):
+        """把最近记录的一帧整理为生成器的输出"""
+        frame = self.frames[-1]
+        with open(frame['path'], 'rb') as f:
+            data = f.read()
+        output = dict(frame)
+        output.update({
+            'index': len(self.frames) - 1,
+            'offset': frame['scroll_top'] + frame['view_top'] - frame['content_top'],
+            'height': frame['view_bottom'] - frame['view_top'],
+            'sha1': hashlib.sha1(data).hexdigest(),
+            'title': self.title,
+        })
+        if with_bytes:
+            output['bytes'] = data
+        self._capture_span.count('frames')
+        self._capture_span.count('bytes', len(data))
+        return output
+
+    def _record_frame(self, path, scroll_top, visible_area):
+        """记录帧的几何信息（CSS像素），供离线拼接长图与重新分页使用"""
+        self.frames.append({
+            'path': path,
+            'scroll_top': scroll_top,
+            'content_top': visible_area['content_top'],
+            'view_top': visible_area['view_top'],
+            'view_bottom': visible_area['view_bottom'],
+            'scale': self.device_scale_factor,
+        })
+
+    def export_master(self, output_path=None):
+        """把本次截图的所有帧拼接为整篇长图，返回 MasterRendering"""
+        if not self.frames:
+            return None
+        if output_path is None:
+            output_path = os.path.join(os.path.dirname(self.frames[0]['path']), 'master.png')
+        return MasterRendering.from_frames(self.frames, output_path)
+
+    def _scroll_container_to(self, position):
+        """滚动已标记的滚动容器；position 为 None 时只读取当前位置。返回实际 scrollTop，未找到容器返回 -1"""
+        return self.driver.execute_script("""
+            var element = document.querySelector('[data-fs-scroll-container]');
+            if (!element) return -1;
+            if (arguments[0] !== null) element.scrollTop = arguments[0];
+            return element.scrollTop;
+        """, position)
+
+    def _measure_visible_area(self):
+        """测量滚动区域中未被固定/吸顶浮层遮挡的部分（窗口坐标）
+
+        返回 content_top（滚动内容 scrollTop 对应的窗口 y）、view_top/view_bottom
+        （无遮挡区域上下边界）以及遮挡浮层数量；浮层会被打上 data-fs-overlay 标记。
+        """
+        area = self.driver.execute_script("""
+            var container = document.querySelector('[data-fs-scroll-container]');
+            var viewportHeight = window.innerHeight;
+            var top = 0, bottom = viewportHeight, contentTop = 0;
+            var left = 0, right = window.innerWidth;
+            if (container) {
+                var rect = container.getBoundingClientRect();
+                contentTop = rect.top;
+                top = Math.max(0, rect.top);
+                bottom = Math.min(viewportHeight, rect.bottom);
+                left = Math.max(0, rect.left);
+                right = Math.min(window.innerWidth, rect.right);
+            }
+            var width = right - left;
+            var overlays = 0;
+            var nodes = document.body.getElementsByTagName('*');
+            for (var i = 0; i < nodes.length; i++) {
+                var el = nodes[i];
+                var style = window.getComputedStyle(el);
+                if (style.position !== 'fixed' && style.position !== 'sticky') continue;
+                if (style.display === 'none' || style.visibility === 'hidden') continue;
+                var r = el.getBoundingClientRect();
+                // 只关心横跨内容区域的条状浮层（页眉、工具栏、底栏）
+                if (r.height <= 0 || r.height > viewportHeight * 0.4) continue;
+                if (r.right <= left || r.left >= right || Math.min(r.right, right) - Math.max(r.left, left) < width * 0.5) continue;
+                if (r.bottom <= top || r.top >= bottom) continue;
+                if (r.top <= top + 5) {
+                    top = Math.max(top, r.bottom);
+                } else if (r.bottom >= bottom - 5) {
+                    bottom = Math.min(bottom, r.top);
+                } else {
+                    continue;
+                }
+                el.setAttribute('data-fs-overlay', '1');
+                overlays++;
+            }
+            return {content_top: contentTop, view_top: top, view_bottom: bottom, viewport_height: viewportHeight, overlays: overlays};
+        """)
+        self.logger.info(f"可视区域: {area['view_top']:.0f}-{area['view_bottom']:.0f}px，遮挡浮层 {area['overlays']} 个")
+        return area
+
+    def _set_overlays_hidden(self, hidden):
+        """隐藏或恢复已标记的固定/吸顶浮层"""
+        try:
+            self.driver.execute_script("""
+                var nodes = document.querySelectorAll('[data-fs-overlay]');
+                for (var i = 0; i < nodes.length; i++) {
+                    if (arguments[0]) {
+                        nodes[i].setAttribute('data-fs-overlay-visibility', nodes[i].style.visibility || '');
+                        nodes[i].style.visibility = 'hidden';
+                    } else if (nodes[i].hasAttribute('data-fs-overlay-visibility')) {
+                        nodes[i].style.visibility = nodes[i].getAttribute('data-fs-overlay-visibility');
+                        nodes[i].removeAttribute('data-fs-overlay-visibility');
+                    }
+                }
+            """, hidden)
+        except Exception as e:
+            self.logger.debug(f"切换浮层可见性失败: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,185 @@
+import os
+import bisect
+import zipfile
+import logging
+from PIL import Image
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def plan_pages(total_height, page_height, break_rows, min_fill=None):
+    """在允许的断点处分页，返回 [(起始行, 结束行)]
+
+    每页尽量填满 page_height：优先选择不超过页高、且不低于 min_fill 比例的最后一个断点；
+    找不到合适断点时才在页高处硬切。break_rows 需升序排列。
+    """
+    min_fill = Config.EXPORT_MIN_PAGE_FILL if min_fill is None else min_fill
+    page_height = max(1, int(page_height))
+    pages = []
+    start = 0
+    while start < total_height:
+        limit = start + page_height
+        if limit >= total_height:
+            pages.append((start, total_height))
+            break
+        lower = start + int(page_height * min_fill)
+        index = bisect.bisect_right(break_rows, limit) - 1
+        end = break_rows[index] if index >= 0 and break_rows[index] > lower else limit
+        pages.append((start, end))
+        start = end
+    return pages
+
+
+def block_break_points(blocks, max_block_height):
+    """由块级元素的 [上边界, 下边界] 计算允许分页的位置（升序）
+
+    块的上下边界都是候选断点，但落在某个不高于 max_block_height 的块内部的候选会被排除；
+    比一页还高的块无论如何都要切分，不参与排除。
+    """
+    intervals = sorted((top, bottom) for top, bottom in blocks if 0 < bottom - top <= max_block_height)
+    merged = []
+    for top, bottom in intervals:
+        # 仅在真正重叠（而非首尾相接）时合并，相邻段落之间的边界仍可分页
+        if merged and top < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], bottom)
+        else:
+            merged.append([top, bottom])
+    starts = [top for top, _ in merged]
+
+    points = set()
+    for top, bottom in blocks:
+        for y in (top, bottom):
+            index = bisect.bisect_right(starts, y) - 1
+            if index >= 0 and merged[index][0] < y < merged[index][1]:
+                continue
+            points.add(int(round(y)))
+    return sorted(points)
+
+
+def mask_outside_rows(path, keep_top, keep_bottom, area_top, area_bottom, scale=1.0):
+    """把截图中 [area_top, area_bottom) 区域内、[keep_top, keep_bottom) 以外的行涂成背景色（CSS像素坐标）"""
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+    to_px = lambda y: max(0, min(img.height, int(round(y * scale))))
+    for top, bottom in ((area_top, keep_top), (keep_bottom, area_bottom)):
+        top, bottom = to_px(top), to_px(bottom)
+        if bottom > top:
+            img.paste(Config.EXPORT_BACKGROUND, (0, top, img.width, bottom))
+    img.save(path)
+
+
+def thumbnail_path(path, width=None):
+    """生成缩略图并缓存在原图同目录的 thumbs/ 下，原图更新后重新生成"""
+    width = width or Config.THUMBNAIL_WIDTH
+    thumb_dir = os.path.join(os.path.dirname(path), 'thumbs')
+    thumb = os.path.join(thumb_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{width}.jpg")
+    if os.path.exists(thumb) and os.path.getmtime(thumb) >= os.path.getmtime(path):
+        return thumb
+    os.makedirs(thumb_dir, exist_ok=True)
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        img.thumbnail((width, max(1, int(img.height * width / img.width))))
+        img.save(thumb, 'JPEG', quality=Config.THUMBNAIL_QUALITY)
+    return thumb
+
+
+def zip_frames(paths, output_path):
+    """把帧打包为 zip（PNG 已压缩，直接存储），文件已是最新时直接复用"""
+    if os.path.exists(output_path) and all(os.path.getmtime(output_path) >= os.path.getmtime(p) for p in paths):
+        return output_path
+    tmp_path = output_path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for path in paths:
+            archive.write(path, os.path.basename(path))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class MasterRendering:
+    """由一次截图拼接出的整篇长图，可离线切出任意宽高比的分页"""
+
+    def __init__(self, path):
+        self.config = Config()
+        self.path = path
+        self.image = Image.open(path).convert('RGB')
+        self._break_rows = None
+
+    @classmethod
+    def from_frames(cls, frames, output_path):
+        """按帧记录的滚动偏移拼接长图：每帧只取未被遮挡的区域，重叠部分由后一帧覆盖"""
+        placements = []
+        width = 0
+        height = 0
+        for frame in frames:
+            scale = frame.get('scale', 1.0)
+            with Image.open(frame['path']) as img:
+                img = img.convert('RGB')
+                top = max(0, int(round(frame['view_top'] * scale)))
+                bottom = min(img.height, int(round(frame['view_bottom'] * scale)))
+                if bottom <= top:
+                    continue
+                region = img.crop((0, top, img.width, bottom))
+            y = int(round((frame['scroll_top'] + frame['view_top'] - frame['content_top']) * scale))
+            placements.append((region, max(0, y)))
+            width = max(width, region.width)
+            height = max(height, max(0, y) + region.height)
+
+        master = Image.new('RGB', (width, height), Config.EXPORT_BACKGROUND)
+        for region, y in placements:
+            master.paste(region, (0, y))
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        master.save(output_path)
+        logger.info(f"长图已拼接: {output_path}（{width}x{height}，{len(placements)} 帧）")
+        return cls(output_path)
+
+    @property
+    def width(self):
+        return self.image.width
+
+    @property
+    def height(self):
+        return self.image.height
+
+    def break_rows(self):
+        """找出可以安全分页的行：整行颜色近乎一致（段落之间的空白）"""
+        if self._break_rows is None:
+            gray = self.image.convert('L')
+            data = gray.tobytes()
+            width = gray.width
+            tolerance = self.config.EXPORT_BLANK_TOLERANCE
+            rows = []
+            for y in range(gray.height):
+                row = data[y * width:(y + 1) * width]
+                if max(row) - min(row) <= tolerance:
+                    rows.append(y)
+            self._break_rows = rows
+        return self._break_rows
+
+    def plan_pages(self, page_height):
+        return plan_pages(self.height, page_height, self.break_rows())
+
+    def export(self, aspect_ratio, output_dir):
+        """按宽高比 r = 宽/高 切分长图，不足一页的部分用背景色补齐，返回文件列表"""
+        page_height = int(round(self.width / float(aspect_ratio)))
+        os.makedirs(output_dir, exist_ok=True)
+        # 清理上一次导出的分页，避免页数变少时残留旧文件
+        for name in os.listdir(output_dir):
+            if name.startswith('slice_') and name.endswith('.png'):
+                os.remove(os.path.join(output_dir, name))
+        files = []
+        for i, (start, end) in enumerate(self.plan_pages(page_height)):
+            page = Image.new('RGB', (self.width, page_height), self.config.EXPORT_BACKGROUND)
+            page.paste(self.image.crop((0, start, self.width, end)), (0, 0))
+            path = os.path.join(output_dir, f"slice_{i:03d}.png")
+            page.save(path)
+            files.append(path)
+        logger.info(f"按宽高比 {float(aspect_ratio):.4g} 导出 {len(files)} 张: {output_dir}")
+        return files
+
+    def export_many(self, aspect_ratios, output_dir):
+        """一次导出多种宽高比，返回 {宽高比: 文件列表}"""
+        return {
+            ratio: self.export(ratio, os.path.join(output_dir, f"ratio_{float(ratio):.4f}"))
+            for ratio in aspect_ratios
+        }
@@ -0,0 +1,230 @@
+import os
+import time
+import queue
+import uuid
+import hashlib
+import logging
+import threading
+from config import Config
+
+class Job:
+    """后台任务的状态，供界面轮询"""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.status = self.STATUS_QUEUED
+        self.message = "排队中"
+        self.frames_done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED, self.STATUS_CANCELLED)
+
+    def cancel(self):
+        """请求取消：排队中的任务不再执行，执行中的任务由 handler 检查 cancel_event 后尽快结束"""
+        self.cancel_event.set()
+
+    def update(self, message=None, frames_done=None):
+        if message is not None:
+            self.message = message
+        if frames_done is not None:
+            self.frames_done = frames_done
+
+
+class BrowserPool:
+    """在多个任务之间复用的截图浏览器，同时打开的浏览器不超过 size 个"""
+
+    def __init__(self, size=None, headless=None):
+        self.config = Config()
+        self.size = size or self.config.APP_BROWSER_POOL_SIZE
+        self.headless = headless
+        self._slots = threading.Semaphore(self.size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def acquire(self, aspect_ratio=None):
+        """取出一个空闲的 FeishuScreenshot（没有则新建），池满时阻塞等待"""
+        from feishu_screenshot import FeishuScreenshot
+        self._slots.acquire()
+        with self._lock:
+            shot = self._idle.pop() if self._idle else None
+        if shot is None:
+            shot = FeishuScreenshot(aspect_ratio=aspect_ratio, headless=self.headless)
+        else:
+            shot.aspect_ratio = float(aspect_ratio) if aspect_ratio else None
+            if shot.driver:
+                shot.apply_viewport()
+        return shot
+
+    def release(self, shot):
+        """归还浏览器；浏览器已失效则直接关闭，下次重新启动"""
+        try:
+            if shot.driver:
+                shot.driver.current_url  # 探测会话是否仍然可用
+        except Exception:
+            self._quit(shot)
+        with self._lock:
+            self._idle.append(shot)
+        self._slots.release()
+
+    def _quit(self, shot):
+        try:
+            shot.driver.quit()
+        except Exception:
+            pass
+        shot.driver = None
+
+    def close(self):
+        with self._lock:
+            for shot in self._idle:
+                if shot.driver:
+                    self._quit(shot)
+            self._idle = []
+
+
+class ResultCache:
+    """按参数键缓存已完成任务的结果，超过 ttl 秒或结果文件已被删除时失效"""
+
+    def __init__(self, ttl=None):
+        self.config = Config()
+        self.ttl = self.config.APP_RESULT_TTL if ttl is None else ttl
+        self._entries = {}  # key -> (保存时间, 结果)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(note_url, ratio, use_ai, api_key='', base_url=''):
+        """由笔记地址、宽高比与 AI 设置生成缓存键；API Key 只保留摘要"""
+        key_digest = hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()[:8] if use_ai else ''
+        ai_part = f"{bool(use_ai)}|{base_url or ''}|{key_digest}"
+        return f"{note_url.strip()}|{round(float(ratio), 4)}|{ai_part}"
+
+    def get(self, key):
+        """返回 (结果, 缓存时长秒)，未命中返回 (None, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None, None
+        saved_at, result = entry
+        age = time.time() - saved_at
+        if age > self.ttl or not all(os.path.exists(path) for path in result.get('files', [])):
+            self.invalidate(key)
+            return None, None
+        return result, age
+
+    def referenced_names(self):
+        """未过期缓存结果的截图目录名与草稿文件名，清理旧产物时需保留"""
+        now = time.time()
+        with self._lock:
+            results = [result for saved_at, result in self._entries.values() if now - saved_at <= self.ttl]
+        names = set()
+        for result in results:
+            for path in (result.get('screenshots_dir'), result.get('draft_path')):
+                if path:
+                    names.add(os.path.basename(os.path.normpath(path)))
+        return names
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class JobRunner:
+    """有界队列 + 固定数量工作线程的后台任务执行器
+
+    handler(job) 在工作线程中执行，返回值写入 job.result；异常记录到 job.error。
+    队列已满时 submit 返回 None，由调用方提示稍后再试。
+    """
+
+    def __init__(self, handler, workers=None, queue_size=None):
+        self.config = Config()
+        self.handler = handler
+        self.workers = workers or self.config.APP_WORKERS
+        self.queue = queue.Queue(maxsize=queue_size or self.config.APP_QUEUE_SIZE)
+        self.jobs = {}
+        self._pending = []  # 排队中的任务ID，按提交顺序
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-runner-{i}", daemon=True).start()
+
+    def submit(self, params):
+        job = Job(params)
+        with self._lock:
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                return None
+            self.jobs[job.id] = job
+            self._pending.append(job.id)
+        self.logger.info(f"任务已提交: {job.id}")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def find_active(self, cache_key):
+        """查找参数键相同、仍在排队或执行中的任务，重复提交时直接复用"""
+        with self._lock:
+            for job in self.jobs.values():
+                if not job.finished and not job.cancel_event.is_set() and job.params.get('cache_key') == cache_key:
+                    return job
+        return None
+
+    def active_ids(self):
+        """仍在排队或执行中的任务ID"""
+        with self._lock:
+            return {job.id for job in self.jobs.values() if not job.finished}
+
+    def position(self, job_id):
+        """排队位置（1 表示下一个执行），已开始或不存在时返回 0"""
+        with self._lock:
+            return self._pending.index(job_id) + 1 if job_id in self._pending else 0
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            with self._lock:
+                if job.id in self._pending:
+                    self._pending.remove(job.id)
+            if job.cancel_event.is_set():
+                job.status = Job.STATUS_CANCELLED
+                job.finished_at = time.time()
+                continue
+            job.status = Job.STATUS_RUNNING
+            job.started_at = time.time()
+            job.update("开始处理")
+            try:
+                job.result = self.handler(job)
+                job.status = Job.STATUS_CANCELLED if job.cancel_event.is_set() else Job.STATUS_DONE
+            except Exception as e:
+                self.logger.error(f"任务 {job.id} 失败: {str(e)}")
+                job.error = str(e)
+                job.status = Job.STATUS_FAILED
+            finally:
+                job.finished_at = time.time()
+                self._prune()
+
+    def _prune(self):
+        """只保留最近完成的任务，避免长期运行时状态无限增长"""
+        with self._lock:
+            finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at)
+            for job in finished[:-self.config.APP_KEEP_JOBS]:
+                self.jobs.pop(job.id, None)
@@ -10,25 +10,33 @@
 
 import os
 import sys
+import time
 import argparse
 import logging
+import threading
+import contextlib
 from datetime import datetime
-from feishu_screenshot import FeishuScreenshot
-from ai_summary import AISummary
-from xiaohongshu_poster import XiaohongshuPoster
+# selenium、openai 等重依赖在用到的阶段才导入，`--help` 和发布进程等短命令启动更快
+from pipeline_checkpoint import NoteCheckpoint
+from pipeline import StagedPipeline
+from run_artifacts import RunArtifacts, RetentionManager
 from config import Config
+import metrics
 
 class FeishuToXiaohongshu:
-    def __init__(self):
+    def __init__(self, kind='run'):
         self.config = Config()
+        self.save_snapshot = self.config.SAVE_SNAPSHOT
+        self.prometheus_file = None
+        self.profiler = None  # --profile 时为 StageProfiler
+        # 每次运行的截图、草稿与日志都写入独立目录，并发运行互不覆盖
+        self.run = RunArtifacts(kind)
         self.setup_logging()
+        RetentionManager().enforce(keep={self.run.run_id})
         
     def setup_logging(self):
         """设置日志"""
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        
-        log_file = os.path.join(log_dir, f"feishu_to_xiaohongshu_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        log_file = self.run.log_file
         
         logging.basicConfig(
             level=logging.INFO,
@@ -59,143 +67,424 @@ class FeishuToXiaohongshu:
             
         return True
     
-    def process_note(self, note_url, auto_publish=False, use_ai=True):
-        """处理单个飞书笔记"""
+    def process_note(self, note_url, auto_publish=False, use_ai=True, resume=False):
+        """处理单个飞书笔记；resume=True 时跳过检查点中已完成的阶段"""
+        job = self._new_job(note_url, auto_publish, use_ai, resume)
+        self.last_stages_run = job['stages_run']
         try:
             self.logger.info(f"开始处理飞书笔记: {note_url}")
             
-            # 1. 截图飞书笔记
-            self.logger.info("步骤1: 开始截图飞书笔记...")
-            feishu_screenshot = FeishuScreenshot()
-            screenshot_files, title = feishu_screenshot.take_full_screenshot(note_url)
-            
-            if not screenshot_files:
-                self.logger.error("截图失败")
-                return False
-            
-            self.logger.info(f"截图完成，共 {len(screenshot_files)} 张图片")
-            
-
-            
-            # 2. 生成小红书文案
-            self.logger.info("步骤2: 生成小红书文案...")
-            ai_summary = AISummary()
-            
-            if use_ai and self.config.OPENAI_API_KEY:
-                # 获取笔记内容用于AI生成
-                content = feishu_screenshot.get_note_content()
-                self.logger.info(f'笔记长度：{len(content)}， 内容: {content}')
-                summary_result = ai_summary.generate_summary(content)
-                
-                post_title = summary_result['title']
-                post_content = summary_result['content']
-                post_topics = summary_result['topics']
-                
-                # 可选：进一步优化内容
-                post_content = ai_summary.enhance_content(post_content)
-                
-            else:
-                # 使用简单处理
-                post_title = title[:self.config.MAX_TITLE_LENGTH] if len(title) > self.config.MAX_TITLE_LENGTH else title
-                post_content = "分享一篇有用的飞书笔记内容"
-                post_topics = ["#飞书笔记", "#知识分享", "#学习笔记"]
-            
-            self.logger.info(f"文案生成完成")
-            self.logger.info(f"标题: {post_title}")
-            self.logger.info(f"话题: {', '.join(post_topics)}")
-            
-            # 3. 保存草稿
-            draft_file = os.path.join(self.config.OUTPUT_DIR, f"draft_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
-            poster = XiaohongshuPoster()
-            poster.save_post_draft(screenshot_files, post_title, post_content, post_topics, draft_file)
-            
-            # 5. 发布到小红书（可选）
-            if auto_publish:
-                self.logger.info("步骤4: 发布到小红书...")
-                success = poster.create_post(screenshot_files, post_title, post_content, post_topics)
-                
-                if success:
-                    self.logger.info("发布成功！")
-                else:
-                    self.logger.error("发布失败")
+            for name in job['stages']:
+                if not self._run_stage(job, name):
                     return False
-            else:
-                self.logger.info("跳过自动发布，草稿已保存")
             
+            if not auto_publish:
+                self.logger.info("跳过自动发布，草稿已保存")
             self.logger.info("处理完成！")
             return True
             
         except Exception as e:
             self.logger.error(f"处理过程中出错: {str(e)}")
             return False
+        finally:
+            self._close_job(job)
+    
+    def _new_job(self, note_url, auto_publish, use_ai, resume):
+        """创建单个笔记的处理上下文"""
+        checkpoint = NoteCheckpoint(note_url)
+        if not resume:
+            checkpoint.reset()
+        stages = ['capture', 'extract', 'generate', 'draft']
+        if auto_publish:
+            stages.append('publish')
+        return {
+            'ctx': {'note_url': note_url, 'use_ai': use_ai, 'feishu_screenshot': None},
+            'checkpoint': checkpoint,
+            'stages': stages,
+            # 一旦某个阶段重新执行，其后的阶段输入已变化，必须全部重跑
+            'reusing': resume,
+            'stages_run': [],
+        }
+    
+    def _run_stage(self, job, name):
+        """执行或从检查点恢复一个阶段，失败时返回 False"""
+        ctx, checkpoint = job['ctx'], job['checkpoint']
+        if job['reusing'] and checkpoint.is_done(name) and self._checkpoint_usable(name, checkpoint.get(name), ctx):
+            ctx.update(checkpoint.get(name))
+            self.logger.info(f"阶段 {name} 已完成，从检查点恢复")
+            return True
+        job['reusing'] = False
+        profile = self.profiler.profile(name, checkpoint.key) if self.profiler else contextlib.nullcontext()
+        with metrics.span(f'stage.{name}', note=ctx['note_url']) as record, profile:
+            try:
+                data = getattr(self, f'_stage_{name}')(ctx)
+            except Exception as e:
+                record.outcome, record.error = 'error', str(e)
+                checkpoint.fail(name, e)
+                self.logger.error(f"阶段 {name} 失败: {str(e)}")
+                return False
+        ctx.setdefault('timings', {})[name] = round(record.duration, 3)
+        ctx.update(data)
+        checkpoint.complete(name, data)
+        job['stages_run'].append(name)
+        return True
+    
+    def _close_job(self, job):
+        """释放笔记处理过程中仍在占用的浏览器"""
+        feishu_screenshot = job['ctx'].get('feishu_screenshot')
+        if feishu_screenshot and feishu_screenshot.driver:
+            feishu_screenshot.driver.quit()
+            feishu_screenshot.driver = None
+    
+    def _checkpoint_usable(self, name, data, ctx):
+        """检查已完成阶段的输出在本次运行中是否仍然可用"""
+        if name == 'capture':
+            files = data.get('screenshot_files') or []
+            return bool(files) and all(os.path.exists(fp) for fp in files)
+        if name == 'extract':
+            return data.get('content') is not None or not self._ai_enabled(ctx)
+        if name == 'generate':
+            return data.get('ai_used') == self._ai_enabled(ctx)
+        if name == 'draft':
+            return os.path.exists(data.get('draft_file', ''))
+        return True
+    
+    def _ai_enabled(self, ctx):
+        return bool(ctx['use_ai'] and self.config.OPENAI_API_KEY)
+    
+    def _stage_capture(self, ctx):
+        """阶段1: 截图飞书笔记"""
+        from feishu_screenshot import FeishuScreenshot
+        self.logger.info("步骤1: 开始截图飞书笔记...")
+        feishu_screenshot = FeishuScreenshot()
+        ctx['feishu_screenshot'] = feishu_screenshot
+        note_key = NoteCheckpoint(ctx['note_url']).key
+        output_dir = self.run.note_dir(note_key)
+        snapshot_path = os.path.join(output_dir, 'snapshot.mhtml') if self.save_snapshot else None
+        if self.profiler:
+            feishu_screenshot.trace_categories = self.config.PROFILE_TRACE_CATEGORIES
+        screenshot_files, title = feishu_screenshot.take_full_screenshot(
+            ctx['note_url'], output_dir=output_dir, snapshot_path=snapshot_path
+        )
+        if self.profiler:
+            # 只录制截图阶段，正文提取复用浏览器时不再收集
+            feishu_screenshot.save_trace(self.profiler.trace_path(note_key))
+        
+        if not screenshot_files:
+            raise RuntimeError("截图失败")
+        
+        self.logger.info(f"截图完成，共 {len(screenshot_files)} 张图片")
+        self.run.record_note(ctx['note_url'], title=title, screenshot_files=screenshot_files, dir=output_dir)
+        return {'screenshot_files': screenshot_files, 'title': title, 'snapshot_path': feishu_screenshot.snapshot_path}
+    
+    def _stage_extract(self, ctx):
+        """阶段2: 提取笔记正文（仅在使用AI时需要）"""
+        if not self._ai_enabled(ctx):
+            return {'content': None}
+        
+        feishu_screenshot = ctx.get('feishu_screenshot')
+        if not feishu_screenshot or not feishu_screenshot.driver:
+            # 截图阶段来自检查点，需要重新打开页面
+            from feishu_screenshot import FeishuScreenshot
+            feishu_screenshot = FeishuScreenshot()
+            ctx['feishu_screenshot'] = feishu_screenshot
+            feishu_screenshot.setup_driver(block_profile=self.config.TEXT_BLOCK_PROFILE)
+            if not feishu_screenshot.navigate_to_note(ctx['note_url']):
+                raise RuntimeError("打开笔记失败")
+        
+        content = feishu_screenshot.get_note_content()
+        self.logger.info(f'笔记长度：{len(content)}， 内容: {content}')
+        return {'content': content}
     
-    def batch_process(self, note_urls, auto_publish=False, use_ai=True):
+    def _stage_generate(self, ctx):
+        """阶段3: 生成小红书文案"""
+        self.logger.info("步骤2: 生成小红书文案...")
+        
+        if self._ai_enabled(ctx):
+            from ai_summary import AISummary
+            ai_summary = AISummary()
+            summary_result = ai_summary.generate_summary(ctx['content'] or "")
+            
+            post_title = summary_result['title']
+            post_content = summary_result['content']
+            post_topics = summary_result['topics']
+            
+            # 可选：进一步优化内容
+            post_content = ai_summary.enhance_content(post_content)
+            
+        else:
+            # 使用简单处理
+            title = ctx['title']
+            post_title = title[:self.config.MAX_TITLE_LENGTH] if len(title) > self.config.MAX_TITLE_LENGTH else title
+            post_content = "分享一篇有用的飞书笔记内容"
+            post_topics = ["#飞书笔记", "#知识分享", "#学习笔记"]
+        
+        self.logger.info(f"文案生成完成")
+        self.logger.info(f"标题: {post_title}")
+        self.logger.info(f"话题: {', '.join(post_topics)}")
+        return {
+            'post_title': post_title,
+            'post_content': post_content,
+            'post_topics': post_topics,
+            'ai_used': self._ai_enabled(ctx),
+        }
+    
+    def _stage_draft(self, ctx):
+        """阶段4: 保存草稿"""
+        note_dir = self.run.note_dir(NoteCheckpoint(ctx['note_url']).key)
+        draft_file = os.path.join(note_dir, f"draft_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        from xiaohongshu_poster import XiaohongshuPoster
+        poster = XiaohongshuPoster()
+        if not poster.save_post_draft(ctx['screenshot_files'], ctx['post_title'], ctx['post_content'], ctx['post_topics'],
+                                      draft_file, source_url=ctx['note_url'], timings=ctx.get('timings')):
+            raise RuntimeError("保存草稿失败")
+        self.run.record_note(ctx['note_url'], draft_file=draft_file, draft_id=poster.last_draft_id)
+        return {'draft_file': draft_file, 'draft_id': poster.last_draft_id}
+    
+    def _stage_publish(self, ctx):
+        """阶段5: 加入发布队列，由 --publish-worker 按限速发布"""
+        from publish_queue import PublishQueue
+        self.logger.info("步骤4: 加入小红书发布队列...")
+        job_id = PublishQueue().enqueue(
+            ctx['screenshot_files'], ctx['post_title'], ctx['post_content'], ctx['post_topics'],
+            note_url=ctx['note_url'], draft_file=ctx['draft_file'], draft_id=ctx.get('draft_id', '')
+        )
+        self.logger.info(f"已加入发布队列，任务ID: {job_id}（运行 python main.py --publish-worker 进行发布）")
+        return {'publish_job_id': job_id}
+    
+    def export_metrics(self, prometheus_file=None):
+        """把本次运行的耗时与计数写入运行目录，并按需导出 Prometheus 文本格式"""
+        try:
+            path = metrics.export_json(os.path.join(self.run.dir, self.config.METRICS_FILE), run_id=self.run.run_id)
+            self.run.update(metrics=path)
+            prometheus_file = prometheus_file or self.config.METRICS_PROMETHEUS_FILE
+            if prometheus_file:
+                metrics.export_prometheus(prometheus_file)
+        except Exception as e:
+            self.logger.warning(f"导出运行指标失败: {str(e)}")
+
+    def enable_profiling(self):
+        """开启性能分析：各阶段的 cProfile 结果与截图阶段的 Chrome trace 写入运行目录下的 profile/"""
+        from profiling import StageProfiler
+        self.profiler = StageProfiler(self.run.path('profile'))
+        self.run.update(profile_dir=self.profiler.output_dir)
+
+    def log_metrics_summary(self):
+        """批量处理结束时输出各阶段耗时汇总"""
+        self.logger.info("各阶段耗时汇总:\n" + metrics.summary_table())
+
+    def finish(self, success):
+        """记录运行结果到清单并退出进程"""
+        self.export_metrics(self.prometheus_file)
+        if self.profiler and self.profiler.stats_files:
+            report = self.profiler.report()
+            self.run.update(profile_report=report)
+            self.logger.info(f"性能分析报告: {report}")
+        self.run.finish(success)
+        self.logger.info(f"运行产物目录: {self.run.dir}")
+        sys.exit(0 if success else 1)
+    
+    def warm_cache(self, urls):
+        """预热共享浏览器缓存，使批量处理的首个笔记也能命中缓存"""
+        from feishu_screenshot import FeishuScreenshot
+        self.logger.info("预热共享浏览器缓存...")
+        stats = FeishuScreenshot(headless=True).warm_cache(urls)
+        if stats:
+            self.logger.info(f"缓存预热完成，累计命中率 {stats['cache_hits'] / max(1, stats['requests']):.0%}")
+        return stats
+    
+    def render_snapshot(self, snapshot_path, aspect_ratio=None, width=None, scale=None):
+        """在无头浏览器中从 MHTML 快照重新渲染截图"""
+        from feishu_screenshot import FeishuScreenshot
+        name = os.path.splitext(os.path.basename(snapshot_path))[0]
+        output_dir = self.run.path(f"rendered_{name}")
+        feishu_screenshot = FeishuScreenshot(
+            aspect_ratio=aspect_ratio, device_scale_factor=scale, viewport_width=width, headless=True
+        )
+        try:
+            screenshot_files, _ = feishu_screenshot.render_snapshot(snapshot_path, output_dir=output_dir)
+        finally:
+            if feishu_screenshot.driver:
+                feishu_screenshot.driver.quit()
+                feishu_screenshot.driver = None
+        if screenshot_files:
+            self.logger.info(f"重新渲染完成，共 {len(screenshot_files)} 张: {output_dir}")
+        else:
+            self.logger.error("重新渲染失败")
+        return screenshot_files
+    
+    def batch_process(self, note_urls, auto_publish=False, use_ai=True, resume=False, pipelined=False):
         """批量处理多个飞书笔记"""
+        if pipelined:
+            return self.pipeline_process(note_urls, auto_publish, use_ai, resume)
         self.logger.info(f"开始批量处理 {len(note_urls)} 个笔记")
         
         success_count = 0
         for i, url in enumerate(note_urls, 1):
             self.logger.info(f"处理第 {i}/{len(note_urls)} 个笔记")
             
-            if self.process_note(url, auto_publish, use_ai):
+            if self.process_note(url, auto_publish, use_ai, resume=resume):
                 success_count += 1
             else:
                 self.logger.warning(f"第 {i} 个笔记处理失败")
             
-            # 添加间隔，避免过于频繁的请求
-            if i < len(note_urls):
-                self.logger.info("等待 30 秒后处理下一个笔记...")
-                import time
-                time.sleep(30)
+            # 添加间隔，避免过于频繁的请求（完全从检查点恢复的笔记没有访问飞书，无需等待）
+            if i < len(note_urls) and {'capture', 'extract'} & set(self.last_stages_run):
+                self.logger.info(f"等待 {self.config.BATCH_INTERVAL} 秒后处理下一个笔记...")
+                time.sleep(self.config.BATCH_INTERVAL)
         
         self.logger.info(f"批量处理完成，成功 {success_count}/{len(note_urls)} 个")
+        self.log_metrics_summary()
         return success_count == len(note_urls)
 
+    def pipeline_process(self, note_urls, auto_publish=False, use_ai=True, resume=False):
+        """流水线批量处理：截图、正文提取、AI生成、草稿各自独立并发，通过有界队列衔接"""
+        self.logger.info(f"开始流水线批量处理 {len(note_urls)} 个笔记")
+        capture_lock = threading.Lock()
+        last_capture = {'at': 0.0}
+        
+        def run_stages(job, names):
+            try:
+                for name in names:
+                    if name in job['stages'] and not self._run_stage(job, name):
+                        self._close_job(job)
+                        return None
+                return job
+            except Exception as e:
+                self.logger.error(f"处理 {job['ctx']['note_url']} 时出错: {str(e)}")
+                self._close_job(job)
+                return None
+        
+        def capture(job):
+            # 截图阶段仍然遵守笔记间隔，避免过于频繁地访问飞书
+            if not (job['reusing'] and job['checkpoint'].is_done('capture')):
+                with capture_lock:
+                    wait = last_capture['at'] + self.config.BATCH_INTERVAL - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                    last_capture['at'] = time.time()
+            self.logger.info(f"[capture] {job['ctx']['note_url']}")
+            return run_stages(job, ['capture'])
+        
+        def extract(job):
+            self.logger.info(f"[extract] {job['ctx']['note_url']}")
+            job = run_stages(job, ['extract'])
+            if job:
+                # 正文提取后不再需要浏览器，尽早释放给截图阶段
+                self._close_job(job)
+            return job
+        
+        def generate(job):
+            self.logger.info(f"[generate] {job['ctx']['note_url']}")
+            return run_stages(job, ['generate'])
+        
+        def draft(job):
+            self.logger.info(f"[draft] {job['ctx']['note_url']}")
+            return run_stages(job, ['draft', 'publish'])
+        
+        pipeline = StagedPipeline([
+            ('capture', capture, self.config.PIPELINE_WORKERS['capture']),
+            ('extract', extract, self.config.PIPELINE_WORKERS['extract']),
+            ('generate', generate, self.config.PIPELINE_WORKERS['generate']),
+            ('draft', draft, self.config.PIPELINE_WORKERS['draft']),
+        ])
+        jobs = (self._new_job(url, auto_publish, use_ai, resume) for url in note_urls)
+        completed, failed = pipeline.run(jobs)
+        for stage, job, error in failed:
+            self.logger.warning(f"笔记处理失败（阶段 {stage}）: {job['ctx']['note_url']}")
+        
+        self.logger.info(f"流水线批量处理完成，成功 {len(completed)}/{len(note_urls)} 个")
+        self.log_metrics_summary()
+        return len(completed) == len(note_urls)
+
 def main():
     parser = argparse.ArgumentParser(description='飞书笔记转小红书图文工具')
     parser.add_argument('note_url', nargs='?', help='飞书笔记URL')
     parser.add_argument('--batch', '-b', help='批量处理文件，每行一个URL')
-    parser.add_argument('--publish', '-p', action='store_true', help='自动发布到小红书（默认只生成草稿）')
+    parser.add_argument('--publish', '-p', action='store_true', help='加入小红书发布队列（默认只生成草稿）')
+    parser.add_argument('--publish-worker', action='store_true', help='启动发布进程，按限速发布队列中的任务')
+    parser.add_argument('--rate', type=float, help='发布进程每小时最多发布篇数（默认见 Config.PUBLISH_POSTS_PER_HOUR）')
+    parser.add_argument('--forever', action='store_true', help='发布进程在队列清空后继续等待新任务')
     parser.add_argument('--no-ai', action='store_true', help='不使用AI生成文案')
+    parser.add_argument('--resume', action='store_true', help='从检查点恢复，跳过已完成的阶段')
+    parser.add_argument('--snapshot', action='store_true', help='截图时同时保存页面 MHTML 快照，供离线重新渲染')
+    parser.add_argument('--render-snapshot', metavar='PATH', help='从本地 MHTML 快照重新渲染截图（无需网络）')
+    parser.add_argument('--ratio', type=float, help='重新渲染时的宽高比 r = 宽/高')
+    parser.add_argument('--width', type=int, help='重新渲染时的视口宽度（CSS像素）')
+    parser.add_argument('--scale', type=float, help='重新渲染时的设备像素比')
+    parser.add_argument('--warm-cache', action='store_true', help='处理前先用第一个笔记预热共享浏览器缓存（见 Config.SHARED_BROWSER_CACHE）')
+    parser.add_argument('--pipeline', action='store_true', help='批量处理时各阶段流水线并发执行（线程数见 Config.PIPELINE_WORKERS）')
+    parser.add_argument('--profile', action='store_true', help='性能分析：记录各阶段 Python 调用耗时与截图阶段的 Chrome trace，并生成热点报告')
+    parser.add_argument('--metrics-prometheus', metavar='PATH', help='结束时把耗时与计数以 Prometheus 文本格式写入该文件')
     parser.add_argument('--config', '-c', help='配置文件路径')
     
     args = parser.parse_args()
+    if args.rate is not None and args.rate <= 0:
+        parser.error('--rate 必须大于 0')
     
     # 初始化工具
-    tool = FeishuToXiaohongshu()
+    tool = FeishuToXiaohongshu(kind='publish-worker' if args.publish_worker else 'run')
+    tool.prometheus_file = args.metrics_prometheus
+    if args.profile:
+        tool.enable_profiling()
+        if args.pipeline:
+            # cProfile 同一时刻只能有一个分析器运行，性能分析时按顺序处理
+            tool.logger.warning("性能分析模式下不使用流水线并发")
+            args.pipeline = False
+    
+    # 发布进程：只消费队列，不需要飞书配置
+    if args.publish_worker:
+        from publish_queue import PublishWorker
+        worker = PublishWorker(posts_per_hour=args.rate)
+        success = worker.run(drain=not args.forever)
+        tool.finish(success)
+    
+    # 从快照重新渲染：本地文件，不需要飞书配置
+    if args.render_snapshot:
+        files = tool.render_snapshot(args.render_snapshot, aspect_ratio=args.ratio, width=args.width, scale=args.scale)
+        tool.finish(bool(files))
+    tool.save_snapshot = tool.save_snapshot or args.snapshot
     
     # 验证配置
     if not tool.validate_config():
-        sys.exit(1)
+        tool.finish(False)
     
     # 处理单个笔记
     if args.note_url:
+        if args.warm_cache:
+            tool.warm_cache([args.note_url])
         success = tool.process_note(
             args.note_url, 
             auto_publish=args.publish, 
-            use_ai=not args.no_ai
+            use_ai=not args.no_ai,
+            resume=args.resume
         )
-        sys.exit(0 if success else 1)
+        tool.finish(success)
     
     # 批量处理
     elif args.batch:
         if not os.path.exists(args.batch):
             tool.logger.error(f"批量处理文件不存在: {args.batch}")
-            sys.exit(1)
+            tool.finish(False)
         
         with open(args.batch, 'r', encoding='utf-8') as f:
             urls = [line.strip() for line in f if line.strip()]
         
+        if args.warm_cache and urls:
+            # 飞书各笔记共用同一套 JS/CSS 包，用第一个笔记预热即可
+            tool.warm_cache(urls[:1])
         success = tool.batch_process(
             urls, 
             auto_publish=args.publish, 
-            use_ai=not args.no_ai
+            use_ai=not args.no_ai,
+            resume=args.resume,
+            pipelined=args.pipeline
         )
-        sys.exit(0 if success else 1)
+        tool.finish(success)
     
     else:
         parser.print_help()
-        sys.exit(1)
+        tool.finish(False)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
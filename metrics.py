@@ -0,0 +1,225 @@
+"""轻量的耗时/计数埋点
+
+    with span('capture.navigate', url=note_url) as s:
+        ...
+        s.count('bytes', len(data))
+
+span 记录耗时、结果（ok / error，或手动设置的其他值）与计数；count() 记录全局计数（如 JS 调用次数）。
+同一进程内最近的 METRICS_MAX_SPANS 条记录可导出为 JSON、Prometheus 文本格式，或汇总为表格；
+Web 界面等常驻进程中更早的记录会被丢弃，内存占用有上限。
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from config import Config
+
+_lock = threading.Lock()
+_local = threading.local()
+_spans = deque(maxlen=Config.METRICS_MAX_SPANS)
+_counters = {}
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.parent = None
+        self.counts = {}
+        self.outcome = 'ok'
+        self.error = None
+        self.started_at = time.time()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    def count(self, key, n=1):
+        """累加本 span 的计数，同时计入全局计数"""
+        self.counts[key] = self.counts.get(key, 0) + n
+        count(key, n)
+
+    def finish(self, outcome=None):
+        """结束并记录；重复调用无效"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if outcome is not None:
+            self.outcome = outcome
+        stack = _stack()
+        if self in stack:
+            stack.remove(self)
+        with _lock:
+            _spans.append(self)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'labels': self.labels,
+            'started_at': self.started_at,
+            'duration': self.duration,
+            'outcome': self.outcome,
+            'error': self.error,
+            'counts': self.counts,
+        }
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def start_span(name, parent=None, detached=False, **labels):
+    """开始一个 span，需要显式调用 finish()；适合不便包进 with 块的代码
+
+    parent 指定父 span（默认为当前线程最内层的 span）。detached=True 时不压入当前线程的 span 栈，
+    用于跨越 yield 的生成器：期间调用方打开的 span 不会被误记为它的子 span，生成器被丢弃时也不会残留在栈中。
+    """
+    record = Span(name, labels)
+    stack = _stack()
+    parent = parent or (stack[-1] if stack else None)
+    record.parent = parent.name if parent else None
+    if not detached:
+        stack.append(record)
+    return record
+
+
+def current_span():
+    """当前线程最内层的 span，没有时返回 None"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, parent=None, **labels):
+    """记录一段代码的耗时；代码块抛出异常时结果记为 error 并继续抛出"""
+    record = start_span(name, parent=parent, **labels)
+    try:
+        yield record
+    except BaseException as e:
+        record.outcome = 'error'
+        record.error = str(e)
+        raise
+    finally:
+        record.finish()
+
+
+def timed(name):
+    """函数装饰器：整个调用记为一个 span，返回假值时结果记为 failed"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = func(*args, **kwargs)
+                if not result and record.outcome == 'ok':
+                    record.outcome = 'failed'
+                return result
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            'spans': [s.to_dict() for s in _spans],
+            'counters': dict(_counters),
+        }
+
+
+def summarize(spans=None):
+    """按 span 名称汇总：次数、总耗时、平均、P95、最大耗时、失败次数与计数合计"""
+    spans = snapshot()['spans'] if spans is None else spans
+    groups = {}
+    for s in spans:
+        groups.setdefault(s['name'], []).append(s)
+    summary = {}
+    for name, items in groups.items():
+        durations = sorted(s['duration'] for s in items)
+        counts = {}
+        for s in items:
+            for key, value in s['counts'].items():
+                counts[key] = counts.get(key, 0) + value
+        summary[name] = {
+            'calls': len(items),
+            'total': sum(durations),
+            'mean': sum(durations) / len(durations),
+            'p95': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            'max': durations[-1],
+            'errors': sum(1 for s in items if s['outcome'] in ('error', 'failed')),
+            'counts': counts,
+        }
+    return summary
+
+
+def summary_table(spans=None):
+    """汇总表（按总耗时降序），用于批量处理结束时输出"""
+    summary = summarize(spans)
+    lines = [f"{'span':<28} {'次数':>6} {'总耗时(s)':>10} {'平均(s)':>9} {'P95(s)':>9} {'最大(s)':>9} {'失败':>5}  计数"]
+    for name, row in sorted(summary.items(), key=lambda item: -item[1]['total']):
+        counts = ', '.join(f"{k}={v}" for k, v in sorted(row['counts'].items()))
+        lines.append(
+            f"{name:<28} {row['calls']:>6} {row['total']:>10.2f} {row['mean']:>9.3f} "
+            f"{row['p95']:>9.3f} {row['max']:>9.3f} {row['errors']:>5}  {counts}"
+        )
+    counters = snapshot()['counters']
+    if counters:
+        lines.append("计数: " + ', '.join(f"{k}={v}" for k, v in sorted(counters.items())))
+    return '\n'.join(lines)
+
+
+def export_json(path, **extra):
+    """导出本进程的全部 span 与计数（以及汇总）到 JSON 文件"""
+    data = snapshot()
+    data['summary'] = summarize(data['spans'])
+    data.update(extra)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def export_prometheus(path, prefix='feishu_to_xhs'):
+    """以 Prometheus 文本格式导出（可供 node_exporter textfile collector 采集）"""
+    data = snapshot()
+    summary = summarize(data['spans'])
+    lines = [
+        f"# HELP {prefix}_span_seconds 各阶段耗时",
+        f"# TYPE {prefix}_span_seconds summary",
+    ]
+    for name, row in sorted(summary.items()):
+        lines.append(f'{prefix}_span_seconds_count{{span="{_label(name)}"}} {row["calls"]}')
+        lines.append(f'{prefix}_span_seconds_sum{{span="{_label(name)}"}} {row["total"]:.6f}')
+    lines += [f"# HELP {prefix}_span_errors_total 各阶段失败次数", f"# TYPE {prefix}_span_errors_total counter"]
+    for name, row in sorted(summary.items()):
+        lines.append(f'{prefix}_span_errors_total{{span="{_label(name)}"}} {row["errors"]}')
+    lines += [f"# HELP {prefix}_events_total 计数（帧、JS 调用、token、字节等）", f"# TYPE {prefix}_events_total counter"]
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'{prefix}_events_total{{name="{_label(name)}"}} {value}')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+    return path
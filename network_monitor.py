@@ -0,0 +1,122 @@
+import json
+import time
+import logging
+
+class NetworkActivityTracker:
+    """基于 DevTools 性能日志（CDP Network 事件）跟踪页面网络活动
+
+    需要在启动 Chrome 时开启 goog:loggingPrefs = {'performance': 'ALL'}。
+    每次 poll() 读取并消费新的日志条目，维护仍在进行中的请求集合。
+    """
+
+    # 长连接类请求不会结束，不参与空闲判断
+    IGNORED_TYPES = ('EventSource', 'WebSocket', 'Ping')
+
+    def __init__(self, driver, long_request_seconds=10.0):
+        self.driver = driver
+        self.long_request_seconds = long_request_seconds
+        self.inflight = {}  # requestId -> (url, 开始时间)
+        self.request_count = 0
+        self.finished_count = 0
+        self.failed_count = 0
+        self.blocked_count = 0  # 被 Network.setBlockedURLs 拦截的请求
+        self.bytes_received = 0  # 已完成请求的传输字节数（encodedDataLength）
+        self.cache_hits = 0  # 直接由磁盘缓存返回的响应
+        self.last_activity = time.monotonic()
+        self.available = True
+        self.trace_events = None  # start_trace() 后收集 Tracing.dataCollected 事件
+        self.logger = logging.getLogger(__name__)
+
+    def _handle(self, method, params):
+        now = time.monotonic()
+        request_id = params.get('requestId')
+        if method == 'Network.requestWillBeSent':
+            url = params.get('request', {}).get('url', '')
+            if url.startswith('data:') or params.get('type') in self.IGNORED_TYPES:
+                return
+            self.inflight[request_id] = (url, now)
+            self.request_count += 1
+            self.last_activity = now
+        elif method == 'Network.loadingFinished':
+            if self.inflight.pop(request_id, None) is not None:
+                self.finished_count += 1
+                self.bytes_received += int(params.get('encodedDataLength') or 0)
+                self.last_activity = now
+        elif method == 'Network.loadingFailed':
+            if self.inflight.pop(request_id, None) is not None:
+                self.failed_count += 1
+                if params.get('blockedReason'):
+                    self.blocked_count += 1
+                self.last_activity = now
+        elif method == 'Network.responseReceived':
+            if params.get('response', {}).get('fromDiskCache'):
+                self.cache_hits += 1
+        elif method == 'Network.dataReceived' and request_id in self.inflight:
+            # 超过长请求阈值的流式/长轮询连接不计入进行中请求，其数据也不应让页面保持“活跃”
+            if now - self.inflight[request_id][1] < self.long_request_seconds:
+                self.last_activity = now
+        elif method == 'Tracing.dataCollected' and self.trace_events is not None:
+            self.trace_events.append(params)
+
+    def poll(self):
+        """读取并处理新的性能日志，返回处理的条目数"""
+        if not self.available:
+            return 0
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            self.available = False
+            self.logger.warning(f"无法读取性能日志，网络空闲检测不可用: {str(e)}")
+            return 0
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except Exception:
+                continue
+            self._handle(message.get('method', ''), message.get('params', {}))
+        return len(entries)
+
+    def start_trace(self):
+        """开始保留 trace 事件（需要启动 Chrome 时在 perfLoggingPrefs 中设置 traceCategories）"""
+        self.trace_events = []
+
+    def stop_trace(self):
+        """读取剩余日志并返回收集到的 trace 事件，之后不再保留"""
+        self.poll()
+        events, self.trace_events = self.trace_events or [], None
+        return events
+
+    def reset(self):
+        """丢弃已有日志、进行中请求和计数（导航到新页面前调用），之后的统计只属于新页面"""
+        self.poll()
+        self.inflight.clear()
+        self.request_count = 0
+        self.finished_count = 0
+        self.failed_count = 0
+        self.blocked_count = 0
+        self.bytes_received = 0
+        self.cache_hits = 0
+        self.last_activity = time.monotonic()
+
+    def pending_requests(self):
+        """仍在进行中、且未超过长请求阈值的请求数"""
+        now = time.monotonic()
+        return sum(1 for _, started in self.inflight.values() if now - started < self.long_request_seconds)
+
+    def wait_for_network_idle(self, quiet_ms=500, timeout=10.0, max_inflight=0):
+        """等待网络空闲：进行中请求数不超过 max_inflight，且 quiet_ms 内没有新的网络活动
+
+        返回 True 表示已空闲，False 表示超时或性能日志不可用。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.poll()
+            if not self.available:
+                return False
+            now = time.monotonic()
+            if self.pending_requests() <= max_inflight and (now - self.last_activity) * 1000 >= quiet_ms:
+                return True
+            if now >= deadline:
+                self.logger.debug(f"等待网络空闲超时，进行中请求: {self.pending_requests()}")
+                return False
+            time.sleep(0.05)
@@ -0,0 +1,76 @@
+import queue
+import logging
+import threading
+from config import Config
+
+class StagedPipeline:
+    """由有界队列串联的多阶段流水线，每个阶段拥有独立的工作线程数
+
+    stages 为 [(阶段名, 处理函数, 线程数)]，处理函数接收上一阶段的输出并返回
+    交给下一阶段的对象；返回 None 或抛出异常表示该条目在此阶段失败，不再向下传递。
+    """
+
+    _STOP = object()
+
+    def __init__(self, stages, queue_size=None):
+        self.config = Config()
+        self.stages = stages
+        self.queue_size = queue_size or self.config.PIPELINE_QUEUE_SIZE
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, items):
+        """执行流水线，返回 (完成的条目, [(阶段名, 条目, 错误)])"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        completed = []
+        failed = []
+        result_lock = threading.Lock()
+        threads = []
+
+        for index, (name, func, workers) in enumerate(self.stages):
+            in_queue = queues[index]
+            out_queue = queues[index + 1] if index + 1 < len(self.stages) else None
+            next_workers = self.stages[index + 1][2] if out_queue is not None else 0
+            # 同一阶段最后一个退出的线程负责通知下一阶段结束
+            remaining = {'count': workers}
+            remaining_lock = threading.Lock()
+
+            def worker(name=name, func=func, in_queue=in_queue, out_queue=out_queue,
+                       next_workers=next_workers, remaining=remaining, remaining_lock=remaining_lock):
+                while True:
+                    item = in_queue.get()
+                    if item is self._STOP:
+                        break
+                    try:
+                        output = func(item)
+                        error = None if output is not None else "阶段返回空结果"
+                    except Exception as e:
+                        output, error = None, str(e)
+                    if error is not None:
+                        self.logger.error(f"流水线阶段 {name} 处理失败: {error}")
+                        with result_lock:
+                            failed.append((name, item, error))
+                    elif out_queue is not None:
+                        out_queue.put(output)
+                    else:
+                        with result_lock:
+                            completed.append(output)
+                with remaining_lock:
+                    remaining['count'] -= 1
+                    last = remaining['count'] == 0
+                if last and out_queue is not None:
+                    for _ in range(next_workers):
+                        out_queue.put(self._STOP)
+
+            for i in range(workers):
+                thread = threading.Thread(target=worker, name=f"pipeline-{name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            queues[0].put(item)
+        for _ in range(self.stages[0][2]):
+            queues[0].put(self._STOP)
+
+        for thread in threads:
+            thread.join()
+        return completed, failed
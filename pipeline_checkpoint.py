@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from config import Config
+
+class NoteCheckpoint:
+    """单个笔记的分阶段检查点清单（manifest.json）"""
+
+    STAGES = ('capture', 'extract', 'generate', 'draft', 'publish')
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, note_url, checkpoint_dir=None):
+        self.config = Config()
+        self.note_url = note_url
+        self.key = hashlib.sha1(note_url.encode('utf-8')).hexdigest()[:16]
+        self.dir = os.path.join(checkpoint_dir or self.config.CHECKPOINT_DIR, self.key)
+        self.path = os.path.join(self.dir, 'manifest.json')
+        self.logger = logging.getLogger(__name__)
+        self.manifest = self._load()
+
+    def _empty_manifest(self):
+        return {'note_url': self.note_url, 'stages': {}}
+
+    def _load(self):
+        """读取清单；文件不存在或损坏时返回空清单"""
+        if not os.path.exists(self.path):
+            return self._empty_manifest()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('note_url') != self.note_url:
+                return self._empty_manifest()
+            manifest.setdefault('stages', {})
+            return manifest
+        except Exception as e:
+            self.logger.warning(f"检查点清单损坏，将重新开始: {self.path} ({str(e)})")
+            return self._empty_manifest()
+
+    def _save(self):
+        """原子写入清单，避免进程中断时留下半个文件"""
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest['updated_at'] = time.time()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, stage):
+        return self.manifest['stages'].get(stage, {}).get('status') == self.STATUS_DONE
+
+    def get(self, stage):
+        """返回已完成阶段保存的输出数据"""
+        return dict(self.manifest['stages'].get(stage, {}).get('data') or {})
+
+    def complete(self, stage, data):
+        """记录阶段完成及其输出"""
+        self.manifest['stages'][stage] = {
+            'status': self.STATUS_DONE,
+            'data': data,
+            'finished_at': time.time(),
+        }
+        self._save()
+
+    def fail(self, stage, error):
+        """记录阶段失败，后续阶段的检查点一并作废"""
+        self.manifest['stages'][stage] = {
+            'status': self.STATUS_FAILED,
+            'error': str(error),
+            'finished_at': time.time(),
+        }
+        for later in self.STAGES[self.STAGES.index(stage) + 1:]:
+            self.manifest['stages'].pop(later, None)
+        self._save()
+
+    def reset(self):
+        """清空所有阶段记录"""
+        self.manifest = self._empty_manifest()
+        if os.path.exists(self.path):
+            self._save()
@@ -0,0 +1,111 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import logging
+from contextlib import contextmanager
+from config import Config
+
+# 按函数所在文件归类 Python 侧耗时：WebDriver 往返（等待 chromedriver/浏览器响应）、主动休眠、其余为 Python 自身开销
+WEBDRIVER_CALL = ('remote_connection.py', '_request')
+SLEEP_CALL = ('~', '<built-in method time.sleep>')
+
+
+class StageProfiler:
+    """--profile 模式：每个阶段一份 cProfile 结果（<阶段>_<笔记>.prof），截图阶段另存 Chrome trace，结束时生成热点报告"""
+
+    def __init__(self, output_dir, top_n=None):
+        self.config = Config()
+        self.output_dir = output_dir
+        self.top_n = top_n or self.config.PROFILE_TOP_N
+        self.stats_files = {}  # 阶段 -> [.prof 路径]
+        self.trace_files = []
+        self.wall = {}  # 阶段 -> 累计墙钟耗时（秒）
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    @contextmanager
+    def profile(self, stage, note_key):
+        """对代码块做 cProfile；同一时刻已有其他分析器运行时（如多线程并发）跳过本次分析"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            self.logger.warning(f"阶段 {stage} 跳过性能分析: {str(e)}")
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(self.output_dir, f"{stage}_{note_key}.prof")
+            profiler.dump_stats(path)
+            self.stats_files.setdefault(stage, []).append(path)
+            self.wall[stage] = self.wall.get(stage, 0.0) + time.perf_counter() - started
+
+    def trace_path(self, note_key):
+        path = os.path.join(self.output_dir, f"capture_{note_key}.trace.json")
+        self.trace_files.append(path)
+        return path
+
+    @staticmethod
+    def _breakdown(stats):
+        """从调用统计中拆出 WebDriver 往返与休眠的累计耗时"""
+        webdriver = sleep = 0.0
+        for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():
+            if filename.endswith(WEBDRIVER_CALL[0]) and function == WEBDRIVER_CALL[1]:
+                webdriver += cumulative
+            elif (filename, function) == SLEEP_CALL:
+                sleep += cumulative
+        return webdriver, sleep
+
+    @staticmethod
+    def trace_summary(path, top_n):
+        """按事件名汇总 Chrome trace 中有持续时间的事件（页面侧耗时），返回 [(名称, 总毫秒, 次数)]"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                events = json.load(f).get('traceEvents', [])
+        except (OSError, ValueError):
+            return []
+        totals = {}
+        for event in events:
+            if event.get('ph') == 'X' and 'dur' in event:
+                total, calls = totals.get(event.get('name', '?'), (0, 0))
+                totals[event.get('name', '?')] = (total + event['dur'], calls + 1)
+        rows = sorted(((name, total / 1000, calls) for name, (total, calls) in totals.items()), key=lambda r: -r[1])
+        return rows[:top_n]
+
+    def report(self):
+        """写出 profile_report.txt：各阶段耗时拆分、Python 热点（按累计与自身耗时）和页面侧 trace 热点，返回报告路径"""
+        out = io.StringIO()
+        out.write("各阶段耗时拆分（秒）\n")
+        out.write(f"{'阶段':<10} {'总计':>8} {'WebDriver往返':>14} {'休眠':>8} {'Python':>8}\n")
+        merged = {}
+        for stage, files in self.stats_files.items():
+            stats = pstats.Stats(*files)
+            merged[stage] = stats
+            webdriver, sleep = self._breakdown(stats)
+            total = self.wall.get(stage, stats.total_tt)
+            out.write(f"{stage:<10} {total:>8.2f} {webdriver:>14.2f} {sleep:>8.2f} {max(0.0, total - webdriver - sleep):>8.2f}\n")
+
+        for stage, stats in merged.items():
+            for sort_key, label in (('cumulative', '累计耗时'), ('tottime', '自身耗时')):
+                out.write(f"\n===== {stage}: 按{label}前 {self.top_n} 个函数 =====\n")
+                stats.stream = out
+                stats.sort_stats(sort_key).print_stats(self.top_n)
+
+        for path in self.trace_files:
+            rows = self.trace_summary(path, self.top_n)
+            if not rows:
+                continue
+            out.write(f"\n===== 页面侧热点 {os.path.basename(path)} =====\n")
+            for name, total_ms, calls in rows:
+                out.write(f"{total_ms:>10.1f} ms {calls:>6} 次  {name}\n")
+
+        path = os.path.join(self.output_dir, 'profile_report.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        return path
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from config import Config
+from process_utils import pid_alive
+
+
+class PublishQueue:
+    """基于 sqlite 的持久化发布任务队列"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path=None):
+        self.config = Config()
+        self.db_path = db_path or self.config.PUBLISH_QUEUE_DB
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        """打开连接并在退出时关闭；常驻的发布进程每次轮询都会连接，不能泄漏文件描述符"""
+        # isolation_level=None：由我们显式控制事务，保证领取任务的原子性
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """建表（幂等）"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS publish_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    note_url TEXT,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    topics TEXT NOT NULL,
+                    artifacts TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at REAL NOT NULL,
+                    started_at REAL,
+                    owner_pid INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(publish_jobs)")}
+            if 'owner_pid' not in columns:
+                # 旧版本创建的队列库没有领取进程列
+                conn.execute("ALTER TABLE publish_jobs ADD COLUMN owner_pid INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_publish_jobs_status ON publish_jobs (status, next_attempt_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS publish_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['topics'] = json.loads(job['topics'])
+        job['artifacts'] = json.loads(job['artifacts'])
+        return job
+
+    def enqueue(self, image_files, title, content, topics, note_url='', draft_file='', draft_id=''):
+        """写入一个待发布任务，返回任务ID"""
+        now = time.time()
+        artifacts = {
+            'image_files': [os.path.abspath(p) for p in image_files],
+            'draft_file': os.path.abspath(draft_file) if draft_file else '',
+            'draft_id': draft_id or '',
+        }
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """INSERT INTO publish_jobs
+                   (note_url, title, content, topics, artifacts, status, attempts, next_attempt_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)""",
+                (note_url, title, content, json.dumps(topics, ensure_ascii=False),
+                 json.dumps(artifacts, ensure_ascii=False), self.STATUS_PENDING, now, now, now)
+            )
+            job_id = cursor.lastrowid
+        self.logger.info(f"发布任务已入队: #{job_id} {title}")
+        return job_id
+
+    def get(self, job_id):
+        """按ID读取任务"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM publish_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def claim_next(self):
+        """原子地领取一个到期的待发布任务，并标记为由当前进程执行中"""
+        now = time.time()
+        with self._connect() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    """SELECT * FROM publish_jobs
+                       WHERE status = ? AND next_attempt_at <= ?
+                       ORDER BY next_attempt_at, id LIMIT 1""",
+                    (self.STATUS_PENDING, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    """UPDATE publish_jobs
+                       SET status = ?, attempts = attempts + 1, started_at = ?, owner_pid = ?, updated_at = ?
+                       WHERE id = ?""",
+                    (self.STATUS_RUNNING, now, os.getpid(), now, row['id'])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row['id'])
+
+    def mark_done(self, job_id):
+        """标记任务发布成功"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE publish_jobs SET status = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (self.STATUS_DONE, now, job_id)
+            )
+
+    def mark_failed(self, job_id, error):
+        """记录一次失败：未超过最大重试次数则按指数退避重新排队，否则标记为失败"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        now = time.time()
+        if job['attempts'] >= self.config.PUBLISH_MAX_ATTEMPTS:
+            status, next_attempt_at = self.STATUS_FAILED, job['next_attempt_at']
+        else:
+            delay = min(self.config.PUBLISH_RETRY_BASE_DELAY * (2 ** (job['attempts'] - 1)),
+                        self.config.PUBLISH_RETRY_MAX_DELAY)
+            status, next_attempt_at = self.STATUS_PENDING, now + delay
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE publish_jobs
+                   SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, str(error), next_attempt_at, now, job_id)
+            )
+        return status
+
+    def recover_stale(self, stale_seconds=None):
+        """把中断的执行中任务放回待发布状态：领取进程已退出，或执行超过 stale_seconds 秒。返回恢复的数量"""
+        stale_seconds = self.config.PUBLISH_STALE_SECONDS if stale_seconds is None else stale_seconds
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid, started_at FROM publish_jobs WHERE status = ?", (self.STATUS_RUNNING,)
+            ).fetchall()
+            stale = [
+                row['id'] for row in rows
+                if (row['started_at'] or 0) <= now - stale_seconds
+                or not row['owner_pid'] or not pid_alive(row['owner_pid'])
+            ]
+            recovered = 0
+            for job_id in stale:
+                # 只恢复仍处于执行中的任务，避免覆盖其他进程刚写入的结果
+                recovered += conn.execute(
+                    """UPDATE publish_jobs
+                       SET status = ?, owner_pid = NULL, next_attempt_at = ?, updated_at = ?
+                       WHERE id = ? AND status = ?""",
+                    (self.STATUS_PENDING, now, now, job_id, self.STATUS_RUNNING)
+                ).rowcount
+        if recovered:
+            self.logger.warning(f"恢复了 {recovered} 个中断的发布任务")
+        return recovered
+
+    def active_files(self):
+        """待发布与执行中任务引用的图片与草稿文件（绝对路径），清理旧运行目录时需保留"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT artifacts FROM publish_jobs WHERE status IN (?, ?)", (self.STATUS_PENDING, self.STATUS_RUNNING)
+            ).fetchall()
+        files = set()
+        for row in rows:
+            artifacts = json.loads(row['artifacts'])
+            files.update(artifacts.get('image_files', []))
+            if artifacts.get('draft_file'):
+                files.add(artifacts['draft_file'])
+        return files
+
+    def next_pending_at(self):
+        """返回最早一个待发布任务的可执行时间；没有待发布任务时返回 None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) AS t FROM publish_jobs WHERE status = ?",
+                (self.STATUS_PENDING,)
+            ).fetchone()
+        return row['t']
+
+    def stats(self):
+        """按状态统计任务数量"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM publish_jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def get_meta(self, key, default=None):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM publish_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO publish_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value))
+            )
+
+
+class PublishWorker:
+    """按限速消费发布队列，失败自动退避重试"""
+
+    def __init__(self, queue=None, posts_per_hour=None):
+        self.config = Config()
+        self.queue = queue or PublishQueue()
+        self.posts_per_hour = float(self.config.PUBLISH_POSTS_PER_HOUR if posts_per_hour is None else posts_per_hour)
+        if self.posts_per_hour <= 0:
+            raise ValueError(f"每小时发布篇数必须大于 0: {posts_per_hour}")
+        self.failed_count = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _wait_for_rate_limit(self):
+        """距上次发布不足 3600/每小时发布数 秒时等待（上次发布时间持久化在队列库中）"""
+        min_interval = 3600.0 / self.posts_per_hour
+        last = float(self.queue.get_meta('last_publish_at', 0) or 0)
+        wait = last + min_interval - time.time()
+        if wait > 0:
+            self.logger.info(f"发布限速：等待 {wait:.0f} 秒")
+            time.sleep(wait)
+
+    def _publish(self, job):
+        """执行单个发布任务"""
+        from xiaohongshu_poster import XiaohongshuPoster
+
+        image_files = job['artifacts'].get('image_files', [])
+        missing = [p for p in image_files if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"图片文件不存在: {', '.join(missing)}")
+        self._check_draft(job, image_files)
+        poster = XiaohongshuPoster()
+        if not poster.create_post(image_files, job['title'], job['content'], job['topics']):
+            raise RuntimeError("create_post 返回失败")
+
+    def _check_draft(self, job, image_files):
+        """与草稿台账中记录的帧哈希比对，图片在入队后被改动时给出警告"""
+        draft_id = job['artifacts'].get('draft_id')
+        if not draft_id:
+            return
+        from draft_ledger import DraftLedger
+        record = DraftLedger().get(draft_id)
+        if record is None:
+            self.logger.warning(f"草稿台账中找不到记录 {draft_id}")
+            return
+        expected = {frame['path']: frame['sha1'] for frame in record.get('frames', [])}
+        changed = [p for p in image_files if p in expected and DraftLedger.frame_info(p)['sha1'] != expected[p]]
+        if changed:
+            self.logger.warning(f"以下图片在生成草稿后被修改: {', '.join(changed)}")
+
+    def run_once(self):
+        """领取并执行一个到期任务；没有可执行任务时返回 False"""
+        job = self.queue.claim_next()
+        if job is None:
+            return False
+        self.logger.info(f"开始发布任务 #{job['id']}（第 {job['attempts']} 次尝试）: {job['title']}")
+        self.queue.set_meta('last_publish_at', time.time())
+        try:
+            self._publish(job)
+            self.queue.mark_done(job['id'])
+            self.logger.info(f"任务 #{job['id']} 发布成功")
+        except Exception as e:
+            status = self.queue.mark_failed(job['id'], e)
+            if status == PublishQueue.STATUS_FAILED:
+                self.failed_count += 1
+                self.logger.error(f"任务 #{job['id']} 发布失败，已达最大重试次数: {str(e)}")
+            else:
+                self.logger.warning(f"任务 #{job['id']} 发布失败，稍后重试: {str(e)}")
+        return True
+
+    def run(self, drain=True):
+        """消费队列；drain=True 时在没有待发布任务后退出，否则持续轮询。每轮轮询都会恢复中断的任务"""
+        self.logger.info(f"发布队列状态: {self.queue.stats()}，限速 {self.posts_per_hour:g} 篇/小时")
+        while True:
+            self.queue.recover_stale()
+            next_at = self.queue.next_pending_at()
+            if next_at is None:
+                if drain:
+                    break
+                time.sleep(self.config.PUBLISH_POLL_INTERVAL)
+                continue
+            if next_at > time.time():
+                time.sleep(min(next_at - time.time(), self.config.PUBLISH_POLL_INTERVAL))
+                continue
+            self._wait_for_rate_limit()
+            self.run_once()
+        self.logger.info(f"发布队列已清空: {self.queue.stats()}")
+        return self.failed_count == 0
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from datetime import datetime
+from config import Config
+from process_utils import pid_alive
+
+
+def new_run_id():
+    """按时间排序、并发运行也不会重复的运行ID"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class RunArtifacts:
+    """一次运行的产物目录：截图、草稿、日志都写在 RUNS_DIR/<运行ID>/ 下，并维护 manifest.json"""
+
+    STATUS_RUNNING = 'running'
+
+    def __init__(self, kind='run', runs_dir=None):
+        self.config = Config()
+        self.run_id = new_run_id()
+        self.dir = os.path.join(runs_dir or self.config.RUNS_DIR, self.run_id)
+        self.manifest_path = os.path.join(self.dir, 'manifest.json')
+        self.log_file = os.path.join(self.dir, 'run.log')
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest = {
+            'run_id': self.run_id,
+            'kind': kind,
+            'pid': os.getpid(),
+            'status': self.STATUS_RUNNING,
+            'started_at': time.time(),
+            'notes': {},
+        }
+        self._save()
+
+    def _save(self):
+        self.manifest['updated_at'] = time.time()
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def path(self, *parts):
+        """运行目录下的子目录（自动创建）"""
+        path = os.path.join(self.dir, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def note_dir(self, note_key):
+        return self.path('notes', note_key)
+
+    def record_note(self, note_url, **fields):
+        """在清单中记录某个笔记的产物（截图、草稿等），多线程安全"""
+        with self._lock:
+            self.manifest['notes'].setdefault(note_url, {}).update(fields)
+            self._save()
+
+    def update(self, **fields):
+        with self._lock:
+            self.manifest.update(fields)
+            self._save()
+
+    def finish(self, success):
+        self.update(status='done' if success else 'failed', finished_at=time.time())
+
+
+class RetentionManager:
+    """按最长保留时间与磁盘配额清理旧产物
+
+    清理范围：运行目录（RUNS_DIR/<运行ID>）、截图目录下的条目（Web 界面按任务、FeishuScreenshot 默认按次创建）、
+    输出目录下的 draft_*.txt 草稿，以及过期的阶段检查点。正在运行的目录、发布队列中未完成任务引用的文件、
+    可恢复的检查点引用的文件都不会被清理。
+    """
+
+    def __init__(self, runs_dir=None, max_age_days=None, quota_mb=None, screenshot_dir=None, output_dir=None):
+        self.config = Config()
+        self.runs_dir = runs_dir or self.config.RUNS_DIR
+        self.screenshot_dir = screenshot_dir or self.config.SCREENSHOT_DIR
+        self.output_dir = output_dir or self.config.OUTPUT_DIR
+        self.max_age = (self.config.RUN_MAX_AGE_DAYS if max_age_days is None else max_age_days) * 86400
+        self.quota = (self.config.RUN_DISK_QUOTA_MB if quota_mb is None else quota_mb) * 1024 * 1024
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _usage(path):
+        """返回 (总字节数, 最近修改时间)；path 可以是文件或目录"""
+        if not os.path.isdir(path):
+            try:
+                return os.path.getsize(path), os.path.getmtime(path)
+            except OSError:
+                return 0, 0.0
+        total, newest = 0, os.path.getmtime(path)
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                total += stat.st_size
+                newest = max(newest, stat.st_mtime)
+        return total, newest
+
+    def _runs(self):
+        """返回 [(开始时间, 运行目录, 大小, 是否仍在运行)]"""
+        runs = []
+        if not os.path.isdir(self.runs_dir):
+            return runs
+        for name in os.listdir(self.runs_dir):
+            path = os.path.join(self.runs_dir, name)
+            if not os.path.isdir(path):
+                continue
+            size, started_at = self._usage(path)
+            active = False
+            try:
+                with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                started_at = manifest.get('started_at', started_at)
+                active = manifest.get('status') == RunArtifacts.STATUS_RUNNING and pid_alive(manifest.get('pid', 0))
+            except (OSError, ValueError):
+                pass
+            runs.append((started_at, path, size, active))
+        return runs
+
+    def _loose_entries(self):
+        """截图目录下的条目与输出目录下的草稿文件，按最近修改时间计算年龄"""
+        paths = []
+        if os.path.isdir(self.screenshot_dir):
+            paths += [os.path.join(self.screenshot_dir, name) for name in os.listdir(self.screenshot_dir)]
+        if os.path.isdir(self.output_dir):
+            paths += [
+                os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)
+                if name.startswith('draft_') and name.endswith('.txt')
+            ]
+        entries = []
+        for path in paths:
+            size, modified_at = self._usage(path)
+            entries.append((modified_at, path, size, False))
+        return entries
+
+    def _referenced_paths(self, now):
+        """发布队列中未完成任务与可恢复检查点引用的文件（绝对路径）；读取失败时返回 None"""
+        from pipeline_checkpoint import NoteCheckpoint
+        paths = set()
+        try:
+            if os.path.exists(self.config.PUBLISH_QUEUE_DB):
+                from publish_queue import PublishQueue
+                paths.update(PublishQueue().active_files())
+        except Exception as e:
+            self.logger.warning(f"读取发布队列失败: {str(e)}")
+            return None
+
+        def collect(value):
+            if isinstance(value, str):
+                paths.add(os.path.abspath(value))
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    collect(item)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    collect(item)
+
+        for manifest in self._checkpoints():
+            stages = manifest.get('stages', {})
+            # 草稿阶段已完成的笔记不再需要恢复，其截图由发布队列按需保留
+            if now - manifest['updated_at'] > self.max_age or \
+                    stages.get('draft', {}).get('status') == NoteCheckpoint.STATUS_DONE:
+                continue
+            for stage in stages.values():
+                collect(stage.get('data'))
+        return paths
+
+    def _checkpoints(self):
+        checkpoint_dir = self.config.CHECKPOINT_DIR
+        if not os.path.isdir(checkpoint_dir):
+            return
+        for name in os.listdir(checkpoint_dir):
+            path = os.path.join(checkpoint_dir, name, 'manifest.json')
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                manifest.setdefault('updated_at', os.path.getmtime(path))
+            except (OSError, ValueError):
+                continue
+            manifest['dir'] = os.path.join(checkpoint_dir, name)
+            yield manifest
+
+    @staticmethod
+    def _contains_any(path, referenced):
+        prefix = os.path.abspath(path)
+        return any(ref == prefix or ref.startswith(prefix + os.sep) for ref in referenced)
+
+    def enforce(self, keep=()):
+        """删除过期条目，再从最旧的开始删除直到总占用不超过配额；keep 中的运行ID（或截图目录名）始终保留。返回删除的路径"""
+        now = time.time()
+        self._purge_checkpoints(now)
+        referenced = self._referenced_paths(now)
+        if referenced is None:
+            self.logger.warning("无法确定仍被引用的产物，本次跳过清理")
+            return []
+        entries = sorted(self._runs() + self._loose_entries())
+        total = sum(size for _, _, size, _ in entries)
+        removed = []
+        for started_at, path, size, active in entries:
+            if active or os.path.basename(path) in keep or self._contains_any(path, referenced):
+                continue
+            if now - started_at > self.max_age or total > self.quota:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                total -= size
+                removed.append(path)
+        self._purge_legacy_logs(now)
+        if removed:
+            self.logger.info(f"已清理 {len(removed)} 个旧的产物，当前占用 {total / 1024 / 1024:.0f} MB")
+        return removed
+
+    def _purge_checkpoints(self, now):
+        """清理超过保留时间没有更新的阶段检查点"""
+        for manifest in self._checkpoints():
+            if now - manifest['updated_at'] > self.max_age:
+                shutil.rmtree(manifest['dir'], ignore_errors=True)
+
+    def _purge_legacy_logs(self, now):
+        """清理旧版本按次写在 LOG_DIR 下的日志"""
+        log_dir = self.config.LOG_DIR
+        if not os.path.isdir(log_dir):
+            return
+        for name in os.listdir(log_dir):
+            path = os.path.join(log_dir, name)
+            if name.endswith('.log') and os.path.isfile(path) and now - os.path.getmtime(path) > self.max_age:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
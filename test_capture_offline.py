@@ -0,0 +1,190 @@
+"""FeishuScreenshot 的离线测试：用假 WebDriver 模拟带滚动容器的长文档，验证分页截图并限定每帧往返次数与休眠"""
+
+import json
+import time
+import threading
+import pytest
+
+pytest.importorskip('selenium')
+pytest.importorskip('PIL')
+
+from selenium.webdriver.common.by import By
+import metrics
+from feishu_screenshot import FeishuScreenshot
+from network_monitor import NetworkActivityTracker
+
+VIEWPORT = (800, 1000)
+# 每帧的 WebDriver 往返上限：滚动、等待绘制、网络空闲检查、高度复查、截图、读取滚动位置、调试信息
+FRAME_ROUND_TRIPS = 8
+
+
+class FeishuPage:
+    """模拟飞书文档：正文在滚动容器内，由等高段落组成，脚本按片段应答"""
+
+    def __init__(self, driver, total_height=5000, block_height=180, gap=20, title='测试\u200b笔记  标题'):
+        self.driver = driver
+        self.total_height = total_height
+        self.scroll_top = 0
+        self.overlays_restored = 0
+        self.blocks = [[y, min(y + block_height, total_height)] for y in range(0, total_height, block_height + gap)]
+        width, height = VIEWPORT
+        driver.window_size = {'width': width, 'height': height}
+        driver.add(By.CLASS_NAME, 'wiki-content', text='正文')
+        driver.add(By.CLASS_NAME, 'wiki-title', text=title)
+        driver.on_script('document.readyState', 'complete')
+        driver.on_script('return window.innerHeight;', height)
+        driver.on_script('return window.innerWidth;', width)
+        driver.on_script('方法3', total_height)
+        driver.on_script('方法1', total_height)
+        driver.on_script('查找飞书的主要滚动容器', {
+            'selector': 'div[class*="content"]', 'scrollHeight': total_height, 'clientHeight': height,
+        })
+        driver.on_script('var overlays = 0', {
+            'content_top': 0, 'view_top': 0, 'view_bottom': height, 'viewport_height': height, 'overlays': 0,
+        })
+        driver.on_script('var blocks = []', self.blocks)
+        driver.on_script('if (!element) return -1', self.scroll_container_to)
+        driver.on_script('windowScroll', {'windowScroll': 0, 'bodyScroll': 0, 'documentElementScroll': 0, 'containers': []})
+        driver.on_script('data-fs-overlay-visibility', self.restore_overlays)
+        driver.on_script('return arguments[0].innerText;', '第一段正文\n第二段正文，足够长的内容')
+        driver.on_async_script('scrollStep', {'steps': 5, 'pending': 0, 'resources': 0, 'timed_out': False, 'elapsed': 10})
+        driver.on_async_script('requestAnimationFrame(finish)', True)
+
+    def scroll_container_to(self, position):
+        if position is not None:
+            self.scroll_top = max(0, min(position, self.total_height - VIEWPORT[1]))
+        return self.scroll_top
+
+    def restore_overlays(self, hidden):
+        if not hidden:
+            self.overlays_restored += 1
+
+
+@pytest.fixture
+def shot(driver):
+    shot = FeishuScreenshot()
+    driver.implicitly_wait(shot.config.BROWSER_TIMEOUT)
+    shot.driver = driver
+    shot.network = NetworkActivityTracker(driver, shot.config.NETWORK_LONG_REQUEST_SECONDS)
+    return shot
+
+
+def test_title_lookup_skips_implicit_wait(shot, driver, clock):
+    driver.add(By.XPATH, '//h1', text='飞书\u200b  周报')
+    assert shot.get_note_title() == '飞书 周报'
+    assert clock.now == 0
+    assert driver.implicit_waited == 0
+
+
+def test_note_content_waits_once(shot, driver, clock):
+    FeishuPage(driver)
+    shot._primed = True
+    start = driver.mark()
+    content = shot.get_note_content(close=False)
+    assert content.startswith('第一段正文')
+    # 不存在的选择器不再各等 2 秒
+    assert clock.now == 0
+    assert driver.since(start) <= 24
+
+
+def test_navigate_waits_for_network_idle(shot, driver, clock):
+    FeishuPage(driver)
+    assert shot.navigate_to_note('https://example.feishu.cn/wiki/abc')
+    assert clock.now == pytest.approx(shot.config.NETWORK_IDLE_QUIET_MS / 1000, abs=0.1)
+
+
+def test_navigate_falls_back_to_fixed_wait_without_performance_log(shot, driver, clock):
+    FeishuPage(driver)
+    driver.log_available = False
+    assert shot.navigate_to_note('https://example.feishu.cn/wiki/abc')
+    assert clock.sleeps == [1]
+
+
+def network_event(method, **params):
+    return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+
+def test_network_stats_are_per_page(shot, driver, clock):
+    """复用同一个浏览器打开多个页面时，统计不累计之前页面的请求"""
+    FeishuPage(driver)
+    for page in ('a', 'b'):
+        assert shot.navigate_to_note(f'https://example.feishu.cn/wiki/{page}')
+        driver.performance_log = [
+            network_event('Network.requestWillBeSent', requestId=page, request={'url': f'https://cdn/{page}.png'}),
+            network_event('Network.responseReceived', requestId=page, response={'fromDiskCache': True}),
+            network_event('Network.loadingFinished', requestId=page, encodedDataLength=1000),
+        ]
+        stats = shot.network_stats()
+        assert (stats['requests'], stats['cache_hits'], stats['bytes']) == (1, 1, 1000)
+
+
+def test_long_request_data_does_not_delay_idle(shot, driver, clock, monkeypatch):
+    """超过长请求阈值的流式连接持续收到数据，也不妨碍判定网络空闲"""
+    tracker = shot.network
+    driver.performance_log = [network_event('Network.requestWillBeSent', requestId='stream', request={'url': 'https://x/poll'})]
+    tracker.poll()
+    clock.advance(shot.config.NETWORK_LONG_REQUEST_SECONDS + 1)
+
+    def sleep_with_stream(seconds):
+        driver.performance_log.append(network_event('Network.dataReceived', requestId='stream', dataLength=10))
+        clock.sleep(seconds)
+
+    monkeypatch.setattr(time, 'sleep', sleep_with_stream)
+    driver.performance_log.append(network_event('Network.dataReceived', requestId='stream', dataLength=10))
+    started = clock.now
+    assert tracker.wait_for_network_idle(quiet_ms=500, timeout=5)
+    assert clock.now - started < 1
+
+
+def test_long_note_frames_cover_page_within_budget(shot, driver, clock, tmp_path):
+    page = FeishuPage(driver)
+    trips, slept = [], []
+    frames = []
+    for frame in shot.iter_screenshots('https://example.feishu.cn/wiki/abc', output_dir=str(tmp_path)):
+        frames.append(frame)
+        trips.append(driver.round_trips)
+        slept.append(clock.slept)
+
+    assert shot.last_error is None
+    assert shot.title == '测试笔记 标题'
+    assert len(frames) == len(driver.screenshots) > 1
+    # 按块分页：各帧首尾相接覆盖全文，不重叠
+    assert frames[0]['offset'] == 0
+    for previous, current in zip(frames, frames[1:]):
+        assert current['offset'] == previous['offset'] + previous['height']
+    assert frames[-1]['offset'] + frames[-1]['height'] == page.total_height
+    # 预热后逐帧截图不再休眠，往返次数不随帧数膨胀
+    assert slept[-1] == slept[0]
+    assert max(b - a for a, b in zip(trips, trips[1:])) <= FRAME_ROUND_TRIPS
+    assert page.overlays_restored == 1
+
+
+def test_cancel_stops_before_next_frame(shot, driver, clock, tmp_path):
+    page = FeishuPage(driver)
+    cancel = threading.Event()
+    frames = []
+    for frame in shot.iter_screenshots('https://example.feishu.cn/wiki/abc', output_dir=str(tmp_path), cancel=cancel):
+        frames.append(frame)
+        cancel.set()
+    assert len(frames) == 1
+    assert shot.cancelled
+    assert page.overlays_restored == 1
+
+
+def test_capture_span_does_not_leak_across_yield(shot, driver, clock, tmp_path):
+    """调用方在帧之间打开的 span 不挂在 capture 下；提前丢弃生成器后线程的 span 栈恢复原状"""
+    FeishuPage(driver)
+    metrics.reset()
+    frames = shot.iter_screenshots('https://example.feishu.cn/wiki/abc', output_dir=str(tmp_path))
+    next(frames)
+    assert metrics.current_span() is None
+    with metrics.span('caller.work'):
+        # 调用方在自己的 span 内继续取帧，帧内步骤仍归到 capture 下
+        next(frames)
+    frames.close()
+    assert metrics.current_span() is None
+    spans = {s['name']: s for s in metrics.snapshot()['spans']}
+    assert spans['caller.work']['parent'] is None
+    assert spans['capture.frame']['parent'] == 'capture'
+    assert spans['capture.mask']['parent'] == 'capture'
+    assert spans['capture']['outcome'] == 'ok'
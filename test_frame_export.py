@@ -0,0 +1,61 @@
+"""分页计算的单元测试：plan_pages 与 block_break_points 只依赖几何数据，不需要浏览器"""
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from frame_export import block_break_points, plan_pages
+
+
+def assert_contiguous(pages, total_height):
+    assert pages[0][0] == 0
+    assert pages[-1][1] == total_height
+    for (_, end), (start, _) in zip(pages, pages[1:]):
+        assert start == end
+
+
+def test_short_content_is_one_page():
+    assert plan_pages(500, 1000, []) == [(0, 500)]
+
+
+def test_pages_end_on_last_break_within_page():
+    pages = plan_pages(2500, 1000, [300, 900, 1100, 1800, 2100], min_fill=0.5)
+    assert pages == [(0, 900), (900, 1800), (1800, 2500)]
+
+
+def test_hard_cut_without_usable_break():
+    # 页内唯一的断点低于最小填充比例，宁可硬切也不产生过短的页
+    pages = plan_pages(2500, 1000, [200, 1150], min_fill=0.5)
+    assert pages[0] == (0, 1000)
+    assert_contiguous(pages, 2500)
+    assert all(end - start <= 1000 for start, end in pages)
+
+
+def test_break_exactly_at_page_height():
+    assert plan_pages(1500, 1000, [1000], min_fill=0.5) == [(0, 1000), (1000, 1500)]
+
+
+def test_block_edges_are_break_points():
+    blocks = [[0, 180], [200, 380], [400, 580]]
+    assert block_break_points(blocks, 1000) == [0, 180, 200, 380, 400, 580]
+
+
+def test_edges_inside_other_blocks_are_excluded():
+    # 表格内部的段落边界不能作为断点，相邻块首尾相接处仍可分页
+    blocks = [[100, 600], [150, 300], [300, 450], [600, 700]]
+    assert block_break_points(blocks, 1000) == [100, 600, 700]
+
+
+def test_blocks_taller_than_page_do_not_exclude():
+    blocks = [[0, 3000], [100, 200]]
+    assert block_break_points(blocks, 1000) == [0, 100, 200, 3000]
+
+
+def test_plan_on_block_breaks_never_splits_small_blocks():
+    blocks = [[y, y + 180] for y in range(0, 5000, 200)]
+    breaks = block_break_points(blocks, 1000)
+    pages = plan_pages(5000, 1000, breaks, min_fill=0.5)
+    assert_contiguous(pages, 5000)
+    for start, end in pages:
+        for top, bottom in blocks:
+            assert not (top < end < bottom), f"页尾 {end} 切断了块 [{top}, {bottom}]"
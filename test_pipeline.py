@@ -0,0 +1,77 @@
+"""StagedPipeline 的单元测试：只用普通函数作为阶段，不需要浏览器"""
+
+import threading
+import time
+
+from pipeline import StagedPipeline
+
+
+def test_items_pass_through_all_stages():
+    pipeline = StagedPipeline([
+        ('double', lambda x: x * 2, 2),
+        ('inc', lambda x: x + 1, 3),
+    ], queue_size=2)
+    completed, failed = pipeline.run(range(20))
+    assert sorted(completed) == [x * 2 + 1 for x in range(20)]
+    assert failed == []
+
+
+def test_failures_are_reported_with_stage_name():
+    def check(x):
+        if x == 3:
+            raise ValueError("坏条目")
+        return x
+
+    pipeline = StagedPipeline([
+        ('check', check, 1),
+        ('skip_even', lambda x: x if x % 2 else None, 2),
+        ('done', lambda x: x, 1),
+    ], queue_size=1)
+    completed, failed = pipeline.run(range(6))
+    assert sorted(completed) == [1, 5]
+    assert sorted(failed) == [
+        ('check', 3, "坏条目"),
+        ('skip_even', 0, "阶段返回空结果"),
+        ('skip_even', 2, "阶段返回空结果"),
+        ('skip_even', 4, "阶段返回空结果"),
+    ]
+
+
+def test_queue_bounds_items_waiting_for_slow_stage():
+    # 下游较慢时上游在有界队列上阻塞，等待中的条目不超过队列长度加上游线程数
+    lock = threading.Lock()
+    state = {'waiting': 0, 'max_waiting': 0}
+
+    def produce(x):
+        with lock:
+            state['waiting'] += 1
+            state['max_waiting'] = max(state['max_waiting'], state['waiting'])
+        return x
+
+    def consume(x):
+        with lock:
+            state['waiting'] -= 1
+        time.sleep(0.005)
+        return x
+
+    pipeline = StagedPipeline([('produce', produce, 1), ('consume', consume, 1)], queue_size=2)
+    completed, failed = pipeline.run(range(30))
+    assert sorted(completed) == list(range(30))
+    assert failed == []
+    assert state['max_waiting'] <= 2 + 1
+
+
+def test_stage_workers_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_peers(x):
+        barrier.wait()
+        return x
+
+    completed, failed = StagedPipeline([('parallel', wait_for_peers, 3)], queue_size=1).run(range(3))
+    assert sorted(completed) == [0, 1, 2]
+    assert failed == []
+
+
+def test_empty_input():
+    assert StagedPipeline([('a', lambda x: x, 2), ('b', lambda x: x, 2)]).run([]) == ([], [])
@@ -0,0 +1,73 @@
+"""NoteCheckpoint 的单元测试：中断后从已完成的阶段继续，只使用临时目录"""
+
+import json
+import os
+
+from pipeline_checkpoint import NoteCheckpoint
+
+URL = 'https://example.feishu.cn/docx/abc'
+
+
+def test_completed_stages_survive_reload(tmp_path):
+    checkpoint = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    checkpoint.complete('capture', {'image_files': ['a.png', 'b.png'], 'title': '标题'})
+    checkpoint.complete('extract', {'content': '正文'})
+
+    resumed = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    assert resumed.is_done('capture') and resumed.is_done('extract')
+    assert not resumed.is_done('generate')
+    assert resumed.get('capture') == {'image_files': ['a.png', 'b.png'], 'title': '标题'}
+    assert resumed.get('generate') == {}
+    assert not os.path.exists(resumed.path + '.tmp')
+
+
+def test_get_returns_copy(tmp_path):
+    checkpoint = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    checkpoint.complete('extract', {'content': '正文'})
+    checkpoint.get('extract')['content'] = '被修改'
+    assert checkpoint.get('extract') == {'content': '正文'}
+
+
+def test_fail_discards_later_stages(tmp_path):
+    checkpoint = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    for stage in ('capture', 'extract', 'generate', 'draft'):
+        checkpoint.complete(stage, {'stage': stage})
+    checkpoint.fail('extract', RuntimeError("正文为空"))
+
+    resumed = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    assert resumed.is_done('capture')
+    assert not resumed.is_done('extract')
+    assert resumed.manifest['stages']['extract'] == {
+        'status': NoteCheckpoint.STATUS_FAILED,
+        'error': "正文为空",
+        'finished_at': resumed.manifest['stages']['extract']['finished_at'],
+    }
+    assert 'generate' not in resumed.manifest['stages']
+    assert 'draft' not in resumed.manifest['stages']
+
+
+def test_reset_clears_saved_stages(tmp_path):
+    checkpoint = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    checkpoint.complete('capture', {'image_files': []})
+    checkpoint.reset()
+    assert not NoteCheckpoint(URL, checkpoint_dir=str(tmp_path)).is_done('capture')
+
+
+def test_each_note_has_its_own_checkpoint(tmp_path):
+    NoteCheckpoint(URL, checkpoint_dir=str(tmp_path)).complete('capture', {'title': 'A'})
+    other = NoteCheckpoint(URL + '2', checkpoint_dir=str(tmp_path))
+    assert other.key != NoteCheckpoint(URL, checkpoint_dir=str(tmp_path)).key
+    assert not other.is_done('capture')
+
+
+def test_mismatched_or_corrupt_manifest_starts_over(tmp_path):
+    checkpoint = NoteCheckpoint(URL, checkpoint_dir=str(tmp_path))
+    checkpoint.complete('capture', {'title': 'A'})
+
+    with open(checkpoint.path, 'w', encoding='utf-8') as f:
+        json.dump({'note_url': 'https://other', 'stages': {'capture': {'status': 'done'}}}, f)
+    assert NoteCheckpoint(URL, checkpoint_dir=str(tmp_path)).manifest == {'note_url': URL, 'stages': {}}
+
+    with open(checkpoint.path, 'w', encoding='utf-8') as f:
+        f.write('{"note_url": ')
+    assert NoteCheckpoint(URL, checkpoint_dir=str(tmp_path)).manifest == {'note_url': URL, 'stages': {}}
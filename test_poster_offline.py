@@ -0,0 +1,166 @@
+"""XiaohongshuPoster 的离线测试：用假 WebDriver 验证选择器回退逻辑，并限定模拟休眠时长与往返次数"""
+
+import pytest
+
+pytest.importorskip('selenium')
+
+from selenium.webdriver.common.by import By
+from fake_webdriver import FakeElement
+from xiaohongshu_poster import XiaohongshuPoster
+
+UPLOAD_STATE = 'function visible(el)'
+
+
+@pytest.fixture
+def poster(driver):
+    poster = XiaohongshuPoster()
+    # 与 setup_driver 一致：打开隐式等待，找不到元素的选择器会真实地付出等待时间
+    driver.implicitly_wait(poster.config.BROWSER_TIMEOUT)
+    poster.driver = driver
+    return poster
+
+
+def write_images(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"screenshot_{i:03d}.png"
+        path.write_bytes(b'png')
+        paths.append(str(path))
+    return paths
+
+
+class UploadPage:
+    """模拟上传区域：提交的图片在 delay 秒后出现缩略图"""
+
+    def __init__(self, driver, delay=1.0, failed=False):
+        self.driver = driver
+        self.delay = delay
+        self.failed = failed
+        self.submitted = []  # [(提交时间, 图片数)]
+        driver.on_script(UPLOAD_STATE, self.state)
+
+    def on_keys(self, element, value):
+        self.submitted.append((self.driver.clock.now, len(value.split('\n'))))
+
+    def state(self, root=None):
+        now = self.driver.clock.now
+        done = sum(n for at, n in self.submitted if now >= at + self.delay)
+        uploading = sum(n for at, n in self.submitted if now < at + self.delay)
+        return {'thumbs': done, 'uploading': uploading, 'failed': int(self.failed)}
+
+
+def test_login_detected_by_first_indicator(poster, driver, clock):
+    driver.add(By.CLASS_NAME, 'user-avatar')
+    start = driver.mark()
+    assert poster._check_login_status()
+    assert clock.now == 0
+    assert driver.since(start) <= 4
+
+
+def test_logged_out_check_skips_implicit_wait(poster, driver, clock):
+    start = driver.mark()
+    assert not poster._check_login_status()
+    # 20 个选择器都不存在，也不应各等一个隐式等待时长
+    assert clock.now == 0
+    assert driver.implicit_waited == 0
+    assert driver.since(start) <= 25
+
+
+def test_login_polls_until_manual_login(poster, driver, clock):
+    driver.add(By.XPATH, "//button[contains(text(), '登录')]", tag='button', text='登录')
+    driver.add(By.CLASS_NAME, 'user-avatar', appears_at=20.0)
+    assert poster.login_xiaohongshu()
+    assert clock.sleeps[:2] == [5, 3]
+    assert set(clock.sleeps[2:]) == {2}
+    assert clock.now <= 20 + 2
+
+
+def test_navigate_to_create_post_clicks_first_match(poster, driver, clock):
+    button = driver.add(By.XPATH, "//button[contains(text(), '发布')]", tag='button', text='发布')
+    start = driver.mark()
+    assert poster.navigate_to_create_post()
+    assert button.clicks == 1
+    assert clock.now == clock.slept == 4
+    assert driver.since(start) <= 12
+
+
+def test_navigate_falls_back_to_script_lookup_without_waiting(poster, driver, clock):
+    button = FakeElement(text='发布')
+    driver.on_script('查找所有可能包含', button)
+    assert poster.navigate_to_create_post()
+    assert button.clicks == 1
+    # 11 个 XPath 选择器全部落空，不应产生隐式等待
+    assert clock.now == clock.slept == 4
+
+
+def test_click_upload_content_primary_tab(poster, driver, clock):
+    tab = driver.add(By.CSS_SELECTOR, 'div.tab:nth-child(2)', text='上传图文')
+    start = driver.mark()
+    assert poster.click_upload_content()
+    assert tab.clicks == 1
+    assert clock.slept == 1
+    assert driver.since(start) <= 5
+
+
+def test_click_upload_content_text_fallback_budget(poster, driver, clock):
+    tab = driver.add(By.XPATH, "//*[text()='上传图文' or contains(text(),'上传图文')]", text='上传图文')
+    assert poster.click_upload_content()
+    assert tab.clicks == 1
+    # 首选选择器最多等 10 秒，之后的回退不再额外等待
+    assert clock.now <= 10 + 0.2 + 1
+    assert driver.implicit_waited == 0
+
+
+def test_upload_images_submits_multiple_files_at_once(poster, driver, clock, tmp_path):
+    page = UploadPage(driver, delay=1.0)
+    file_input = driver.add(By.CSS_SELECTOR, '.upload-wrapper > div:nth-child(1) > input:nth-child(1)',
+                            tag='input', attributes={'multiple': 'true'}, on_keys=page.on_keys)
+    images = write_images(tmp_path, 3)
+    start = driver.mark()
+    assert poster.upload_images(images)
+    assert file_input.keys == ['\n'.join(images)]
+    assert set(clock.sleeps) == {poster.config.UPLOAD_POLL_INTERVAL}
+    assert clock.now <= page.delay + poster.config.UPLOAD_POLL_INTERVAL
+    polls = len(clock.sleeps) + 2
+    # 定位 input、定位上传区域、读取 multiple、提交，其余为状态轮询
+    assert driver.since(start) <= 7 + polls
+
+
+def test_upload_images_one_by_one_without_multiple(poster, driver, clock, tmp_path):
+    page = UploadPage(driver, delay=0.5)
+    file_input = driver.add(By.CSS_SELECTOR, '.upload-wrapper > div:nth-child(1) > input:nth-child(1)',
+                            tag='input', on_keys=page.on_keys)
+    images = write_images(tmp_path, 3)
+    assert poster.upload_images(images)
+    assert file_input.keys == images
+    # 每张图片最多多等一个轮询间隔
+    assert clock.now <= 3 * (page.delay + poster.config.UPLOAD_POLL_INTERVAL)
+
+
+def test_upload_failure_stops_without_polling(poster, driver, clock, tmp_path):
+    page = UploadPage(driver, failed=True)
+    driver.add(By.CSS_SELECTOR, '.upload-wrapper > div:nth-child(1) > input:nth-child(1)',
+               tag='input', attributes={'multiple': 'true'}, on_keys=page.on_keys)
+    assert not poster.upload_images(write_images(tmp_path, 2))
+    assert clock.slept == 0
+
+
+def test_publish_post_waits_for_redirect(poster, driver, clock):
+    driver.set_page(url='https://creator.xiaohongshu.com/publish/publish')
+    button = FakeElement(tag='button', text='发布',
+                         on_click=lambda el: driver.set_page(url='https://creator.xiaohongshu.com/publish/success'))
+    driver.on_script('button.css-k3hpu2', button)
+    start = driver.mark()
+    assert poster.publish_post()
+    assert button.clicks == 1
+    # 跳转后立即确认成功，不再固定休眠
+    assert clock.slept == 0
+    assert driver.since(start) <= 4
+
+
+def test_publish_post_fails_without_confirmation(poster, driver, clock):
+    button = FakeElement(tag='button', text='发布')
+    driver.on_script('button.css-k3hpu2', button)
+    assert not poster.publish_post()
+    assert button.clicks == 1
+    assert clock.now <= poster.config.PUBLISH_RESULT_TIMEOUT + poster.config.UPLOAD_POLL_INTERVAL
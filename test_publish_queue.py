@@ -0,0 +1,110 @@
+"""PublishQueue 的单元测试：失败退避与中断任务恢复，只使用临时目录中的 sqlite 文件"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from config import Config
+from publish_queue import PublishQueue
+
+
+@pytest.fixture
+def publish_queue(tmp_path):
+    return PublishQueue(db_path=str(tmp_path / 'queue.db'))
+
+
+def set_owner(publish_queue, job_id, pid):
+    conn = sqlite3.connect(publish_queue.db_path)
+    with conn:
+        conn.execute("UPDATE publish_jobs SET owner_pid = ? WHERE id = ?", (pid, job_id))
+    conn.close()
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+def test_mark_failed_backs_off_exponentially_then_fails(publish_queue, clock):
+    job_id = publish_queue.enqueue(['a.png'], '标题', '正文', ['话题'])
+    delays = []
+    for _ in range(Config.PUBLISH_MAX_ATTEMPTS - 1):
+        job = publish_queue.claim_next()
+        assert job['id'] == job_id
+        assert publish_queue.mark_failed(job_id, "网络错误") == PublishQueue.STATUS_PENDING
+        job = publish_queue.get(job_id)
+        delays.append(job['next_attempt_at'] - clock.time())
+        # 退避期内不会被再次领取
+        assert publish_queue.claim_next() is None
+        clock.advance(delays[-1])
+
+    expected = [min(Config.PUBLISH_RETRY_BASE_DELAY * 2 ** i, Config.PUBLISH_RETRY_MAX_DELAY)
+                for i in range(Config.PUBLISH_MAX_ATTEMPTS - 1)]
+    assert delays == pytest.approx(expected)
+
+    publish_queue.claim_next()
+    assert publish_queue.mark_failed(job_id, "仍然失败") == PublishQueue.STATUS_FAILED
+    job = publish_queue.get(job_id)
+    assert job['status'] == PublishQueue.STATUS_FAILED
+    assert job['attempts'] == Config.PUBLISH_MAX_ATTEMPTS
+    assert job['last_error'] == "仍然失败"
+    clock.advance(Config.PUBLISH_RETRY_MAX_DELAY)
+    assert publish_queue.claim_next() is None
+
+
+def test_backoff_is_capped(publish_queue, clock, monkeypatch):
+    monkeypatch.setattr(Config, 'PUBLISH_MAX_ATTEMPTS', 10)
+    job_id = publish_queue.enqueue(['a.png'], '标题', '正文', [])
+    for _ in range(7):
+        publish_queue.claim_next()
+        assert publish_queue.mark_failed(job_id, "失败") == PublishQueue.STATUS_PENDING
+        delay = publish_queue.get(job_id)['next_attempt_at'] - clock.time()
+        clock.advance(delay)
+    assert delay == pytest.approx(Config.PUBLISH_RETRY_MAX_DELAY)
+
+
+def test_mark_failed_unknown_job(publish_queue):
+    assert publish_queue.mark_failed(12345, "失败") is None
+
+
+def test_recover_stale_requeues_job_of_dead_process(publish_queue, clock):
+    job_id = publish_queue.enqueue(['a.png'], '标题', '正文', [])
+    publish_queue.claim_next()
+    set_owner(publish_queue, job_id, dead_pid())
+
+    assert publish_queue.recover_stale() == 1
+    job = publish_queue.get(job_id)
+    assert job['status'] == PublishQueue.STATUS_PENDING
+    assert job['owner_pid'] is None
+    assert publish_queue.claim_next()['id'] == job_id
+
+
+def test_recover_stale_keeps_running_job_of_live_process(publish_queue, clock):
+    job_id = publish_queue.enqueue(['a.png'], '标题', '正文', [])
+    job = publish_queue.claim_next()
+    assert job['owner_pid'] == os.getpid()
+
+    assert publish_queue.recover_stale() == 0
+    assert publish_queue.get(job_id)['status'] == PublishQueue.STATUS_RUNNING
+
+
+def test_recover_stale_requeues_job_running_too_long(publish_queue, clock):
+    job_id = publish_queue.enqueue(['a.png'], '标题', '正文', [])
+    publish_queue.claim_next()
+    clock.advance(Config.PUBLISH_STALE_SECONDS + 1)
+
+    assert publish_queue.recover_stale() == 1
+    assert publish_queue.get(job_id)['status'] == PublishQueue.STATUS_PENDING
+
+
+def test_active_files_only_cover_unfinished_jobs(publish_queue, tmp_path):
+    done_id = publish_queue.enqueue([str(tmp_path / 'done.png')], '已发布', '正文', [])
+    publish_queue.claim_next()
+    publish_queue.mark_done(done_id)
+    publish_queue.enqueue([str(tmp_path / 'pending.png')], '待发布', '正文', [], draft_file=str(tmp_path / 'draft.txt'))
+
+    assert publish_queue.active_files() == {str(tmp_path / 'pending.png'), str(tmp_path / 'draft.txt')}
@@ -0,0 +1,128 @@
+"""RetentionManager 的单元测试：过期与配额清理、仍被引用的产物不被删除，只使用临时目录"""
+
+import json
+import os
+import time
+
+import pytest
+
+from pipeline_checkpoint import NoteCheckpoint
+from publish_queue import PublishQueue
+from run_artifacts import RetentionManager, RunArtifacts
+
+DAY = 86400
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # 队列库、检查点等路径在配置中是相对路径
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_run(name, age_days, status='done', pid=0, size=10):
+    path = os.path.join('runs', name)
+    os.makedirs(path)
+    with open(os.path.join(path, 'frame.png'), 'wb') as f:
+        f.write(b'x' * size)
+    with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'run_id': name, 'status': status, 'pid': pid, 'started_at': time.time() - age_days * DAY}, f)
+    return path
+
+
+def make_entry(path, age_days, size=10):
+    """截图目录下的子目录（path 以 / 结尾）或单个文件，按修改时间计算年龄"""
+    mtime = time.time() - age_days * DAY
+    if path.endswith('/'):
+        os.makedirs(path)
+        path = path.rstrip('/')
+        make_entry(os.path.join(path, 'frame.png'), age_days, size)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def enforce(keep=(), **kwargs):
+    kwargs.setdefault('max_age_days', 7)
+    kwargs.setdefault('quota_mb', 100)
+    return RetentionManager(**kwargs).enforce(keep=keep)
+
+
+def test_expired_runs_are_removed():
+    old = make_run('old', 10)
+    recent = make_run('recent', 1)
+    assert enforce() == [old]
+    assert not os.path.exists(old) and os.path.exists(recent)
+
+
+def test_running_run_is_kept_only_while_process_alive():
+    alive = make_run('alive', 10, status=RunArtifacts.STATUS_RUNNING, pid=os.getpid())
+    crashed = make_run('crashed', 10, status=RunArtifacts.STATUS_RUNNING, pid=0)
+    assert enforce() == [crashed]
+    assert os.path.exists(alive)
+
+
+def test_quota_removes_oldest_first():
+    runs = [make_run(f'run{i}', 3 - i, size=4000) for i in range(3)]
+    removed = enforce(quota_mb=9000 / 1024 / 1024)
+    assert removed == runs[:1]
+    assert all(os.path.exists(path) for path in runs[1:])
+
+
+def test_keep_matches_entry_name():
+    old_run = make_run('job1', 10)
+    old_shots = make_entry('screenshots/job2/', 10)
+    assert enforce(keep={'job1', 'job2'}) == []
+    assert os.path.exists(old_run) and os.path.exists(old_shots)
+
+
+def test_loose_screenshots_and_drafts_are_removed():
+    shots = make_entry('screenshots/20240101_000000/', 10)
+    draft = make_entry('output/draft_1_job.txt', 10)
+    ledger = make_entry('output/drafts.jsonl', 10)
+    fresh = make_entry('output/draft_2_job.txt', 1)
+    assert sorted(enforce()) == sorted([shots, draft])
+    assert os.path.exists(ledger) and os.path.exists(fresh)
+
+
+def test_files_of_unfinished_publish_jobs_are_kept():
+    shots = make_entry('screenshots/job/', 10)
+    draft = make_entry('output/draft_1_job.txt', 10)
+    publish_queue = PublishQueue()
+    job_id = publish_queue.enqueue([os.path.join(shots, 'frame.png')], '标题', '正文', [], draft_file=draft)
+
+    assert enforce() == []
+    publish_queue.claim_next()
+    publish_queue.mark_done(job_id)
+    assert sorted(enforce()) == sorted([shots, draft])
+
+
+def test_unreadable_queue_skips_cleanup():
+    old = make_run('old', 10)
+    make_entry('output/publish_queue.db', 0)
+    assert enforce() == []
+    assert os.path.exists(old)
+
+
+def test_files_of_resumable_checkpoints_are_kept():
+    shots = make_entry('screenshots/note/', 10)
+    checkpoint = NoteCheckpoint('https://example.feishu.cn/docx/abc')
+    checkpoint.complete('capture', {'image_files': [os.path.join(shots, 'frame.png')]})
+
+    assert enforce() == []
+    checkpoint.complete('draft', {'draft_file': ''})
+    assert enforce() == [shots]
+
+
+def test_expired_checkpoints_are_purged_and_no_longer_protect():
+    shots = make_entry('screenshots/note/', 10)
+    checkpoint = NoteCheckpoint('https://example.feishu.cn/docx/abc')
+    checkpoint.complete('capture', {'image_files': [os.path.join(shots, 'frame.png')]})
+    with open(checkpoint.path, 'w', encoding='utf-8') as f:
+        json.dump(dict(checkpoint.manifest, updated_at=time.time() - 10 * DAY), f)
+
+    assert enforce() == [shots]
+    assert not os.path.exists(checkpoint.dir)
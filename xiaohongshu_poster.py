@@ -1,20 +1,22 @@
 import os
 import time
 import logging
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
 from config import Config
+import metrics
+from draft_ledger import DraftLedger
+from driver_factory import chrome_options as base_chrome_options, create_chrome_driver, implicit_wait_disabled
 
 class XiaohongshuPoster:
     def __init__(self):
         self.driver = None
         self.config = Config()
+        self._expected_thumbs = 0
+        self._upload_root = None  # 上传区域元素，上传状态只在其中统计
+        self.last_draft_id = None  # 最近一次保存的草稿台账记录ID
         self.setup_logging()
         
     def setup_logging(self):
@@ -26,28 +28,13 @@ class XiaohongshuPoster:
         
     def setup_driver(self):
         """设置Chrome浏览器驱动"""
-        chrome_options = Options()
-        if self.config.BROWSER_HEADLESS:
-            chrome_options.add_argument('--headless')
-        
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        # 使用ChromeDriverManager，让webdriver-manager自动处理架构
-        try:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e:
-            self.logger.error(f"ChromeDriver初始化失败: {str(e)}")
-            # 尝试使用系统PATH中的ChromeDriver
-            self.driver = webdriver.Chrome(options=chrome_options)
+        chrome_options = base_chrome_options(self.config.BROWSER_HEADLESS)
+        # ChromeDriver 路径只解析一次并缓存在磁盘上，启动时不再访问网络
+        self.driver = create_chrome_driver(chrome_options)
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         self.driver.implicitly_wait(self.config.BROWSER_TIMEOUT)
         
+    @metrics.timed('publish.login')
     def login_xiaohongshu(self):
         """登录小红书"""
         try:
@@ -134,16 +121,17 @@ class XiaohongshuPoster:
                 (By.XPATH, "//div[contains(@class, 'toolbar')]//img[contains(@class, 'avatar')]"),
             ]
             
-            for selector_type, selector in login_indicators:
-                try:
-                    element = self.driver.find_element(selector_type, selector)
-                    if element.is_displayed():
-                        self.logger.info(f"检测到登录状态，使用选择器: {selector}")
-                        return True
-                except Exception as e:
-                    # 记录详细的错误信息用于调试
-                    self.logger.debug(f"选择器 {selector} 失败: {str(e)}")
-                    continue
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                for selector_type, selector in login_indicators:
+                    try:
+                        element = self.driver.find_element(selector_type, selector)
+                        if element.is_displayed():
+                            self.logger.info(f"检测到登录状态，使用选择器: {selector}")
+                            return True
+                    except Exception as e:
+                        # 记录详细的错误信息用于调试
+                        self.logger.debug(f"选择器 {selector} 失败: {str(e)}")
+                        continue
             
             # 检查URL是否包含用户信息
             current_url = self.driver.current_url
@@ -213,26 +201,27 @@ class XiaohongshuPoster:
             publish_button = None
             
             # 尝试找到发布按钮
-            for selector_type, selector in publish_selectors:
-                try:
-                    self.logger.info(f"尝试查找发布按钮: {selector}")
-                    elements = self.driver.find_elements(selector_type, selector)
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                for selector_type, selector in publish_selectors:
+                    try:
+                        self.logger.info(f"尝试查找发布按钮: {selector}")
+                        elements = self.driver.find_elements(selector_type, selector)
                     
-                    for element in elements:
-                        if element.is_displayed() and element.is_enabled():
-                            # 检查元素是否包含发布相关文本
-                            element_text = element.text.strip().lower()
-                            if '发布' in element_text or 'post' in element_text or 'publish' in element_text:
-                                publish_button = element
-                                self.logger.info(f"找到发布按钮: {element_text}")
-                                break
+                        for element in elements:
+                            if element.is_displayed() and element.is_enabled():
+                                # 检查元素是否包含发布相关文本
+                                element_text = element.text.strip().lower()
+                                if '发布' in element_text or 'post' in element_text or 'publish' in element_text:
+                                    publish_button = element
+                                    self.logger.info(f"找到发布按钮: {element_text}")
+                                    break
                     
-                    if publish_button:
-                        break
+                        if publish_button:
+                            break
                         
-                except Exception as e:
-                    self.logger.debug(f"选择器 {selector} 失败: {str(e)}")
-                    continue
+                    except Exception as e:
+                        self.logger.debug(f"选择器 {selector} 失败: {str(e)}")
+                        continue
             
             if not publish_button:
                 # 如果没找到发布按钮，尝试使用JavaScript查找
@@ -312,89 +301,196 @@ class XiaohongshuPoster:
     def click_upload_content(self):
         """点击上传图文按钮"""
         try:
-            self.logger.info("尝试点击 上传图文 标签")
-            # 首选：参考社区代码的 CSS 选择器
-            try:
-                upload_button = WebDriverWait(self.driver, 10, 0.2).until(
-                    lambda x: x.find_element(By.CSS_SELECTOR, "div.tab:nth-child(2)")
-                )
-                upload_button.click()
-                time.sleep(1)
-                return True
-            except Exception:
-                pass
-            # 备用 CSS（更窄范围）
-            for css_selector in [
-                "div.tab-item:nth-child(2)",
-                ".tab-item:nth-child(2)",
-            ]:
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                self.logger.info("尝试点击 上传图文 标签")
+                # 首选：参考社区代码的 CSS 选择器
                 try:
-                    elem = self.driver.find_element(By.CSS_SELECTOR, css_selector)
-                    if elem.is_displayed() and elem.is_enabled():
-                        elem.click()
-                        time.sleep(1)
-                        return True
+                    upload_button = WebDriverWait(self.driver, 10, 0.2).until(
+                        lambda x: x.find_element(By.CSS_SELECTOR, "div.tab:nth-child(2)")
+                    )
+                    upload_button.click()
+                    time.sleep(1)
+                    return True
                 except Exception:
-                    continue
-            # 最后回退：基于文本的 XPath
-            try:
-                xpath_btn = WebDriverWait(self.driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, "//*[text()='上传图文' or contains(text(),'上传图文')]"))
-                )
-                xpath_btn.click()
-                time.sleep(1)
-                return True
-            except Exception:
-                self.logger.error("未找到上传图文标签")
-                return False
+                    pass
+                # 备用 CSS（更窄范围）
+                for css_selector in [
+                    "div.tab-item:nth-child(2)",
+                    ".tab-item:nth-child(2)",
+                ]:
+                    try:
+                        elem = self.driver.find_element(By.CSS_SELECTOR, css_selector)
+                        if elem.is_displayed() and elem.is_enabled():
+                            elem.click()
+                            time.sleep(1)
+                            return True
+                    except Exception:
+                        continue
+                # 最后回退：基于文本的 XPath
+                try:
+                    xpath_btn = WebDriverWait(self.driver, 5).until(
+                        EC.element_to_be_clickable((By.XPATH, "//*[text()='上传图文' or contains(text(),'上传图文')]"))
+                    )
+                    xpath_btn.click()
+                    time.sleep(1)
+                    return True
+                except Exception:
+                    self.logger.error("未找到上传图文标签")
+                    return False
         except Exception as e:
             self.logger.error(f"点击上传图文失败: {str(e)}")
             return False
 
+    @metrics.timed('publish.upload')
     def upload_images(self, image_files):
         """上传图片"""
+        record = metrics.current_span()
+        record.count('images', len(image_files))
+        record.count('upload_bytes', sum(os.path.getsize(p) for p in image_files if os.path.exists(p)))
         try:
             # 直接定位文件选择 input（参考社区代码）
-            file_input = None
-            for css in [
-                ".upload-wrapper > div:nth-child(1) > input:nth-child(1)",
-                ".upload-wrapper input[type='file']",
-                "input[type='file']",
-            ]:
-                try:
-                    elem = self.driver.find_element(By.CSS_SELECTOR, css)
-                    if elem and elem.is_displayed():
-                        file_input = elem
-                        self.logger.info(f"使用CSS找到文件上传输入框: {css}")
-                        break
-                except Exception:
-                    continue
-            if not file_input:
-                try:
-                    file_input = WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, "//input[@type='file']"))
-                    )
-                    self.logger.info("使用XPath找到文件上传输入框")
-                except Exception as e2:
-                    self.logger.error(f"未找到文件上传输入框: {str(e2)}")
-                    return False
+            with implicit_wait_disabled(self.driver, self.config.BROWSER_TIMEOUT):
+                file_input = None
+                for css in [
+                    ".upload-wrapper > div:nth-child(1) > input:nth-child(1)",
+                    ".upload-wrapper input[type='file']",
+                    "input[type='file']",
+                ]:
+                    try:
+                        elem = self.driver.find_element(By.CSS_SELECTOR, css)
+                        if elem and elem.is_displayed():
+                            file_input = elem
+                            self.logger.info(f"使用CSS找到文件上传输入框: {css}")
+                            break
+                    except Exception:
+                        continue
+                if not file_input:
+                    try:
+                        file_input = WebDriverWait(self.driver, 10).until(
+                            EC.presence_of_element_located((By.XPATH, "//input[@type='file']"))
+                        )
+                        self.logger.info("使用XPath找到文件上传输入框")
+                    except Exception as e2:
+                        self.logger.error(f"未找到文件上传输入框: {str(e2)}")
+                        return False
 
-            # 依次上传图片
+            # 过滤不存在的文件，统一转为绝对路径
+            upload_paths = []
             for image_file in image_files:
                 if os.path.exists(image_file):
-                    file_input.send_keys(os.path.abspath(image_file))
-                    self.logger.info(f"已上传图片: {image_file}")
-                    time.sleep(2)
+                    upload_paths.append(os.path.abspath(image_file))
                 else:
                     self.logger.warning(f"图片文件不存在: {image_file}")
-            # 简单等待上传结束
-            time.sleep(5)
+            if not upload_paths:
+                self.logger.error("没有可上传的图片")
+                return False
+
+            self._upload_root = self._find_upload_root(file_input)
+            baseline = self._get_upload_state()['thumbs']
+            self._expected_thumbs = baseline + len(upload_paths)
+
+            # input 支持 multiple 时一次性提交全部文件，否则逐张提交并等待缩略图出现
+            if len(upload_paths) > 1 and file_input.get_attribute('multiple') is not None:
+                file_input.send_keys("\n".join(upload_paths))
+                self.logger.info(f"已一次性提交 {len(upload_paths)} 张图片")
+            else:
+                for i, path in enumerate(upload_paths, 1):
+                    file_input.send_keys(path)
+                    self.logger.info(f"已提交图片: {path}")
+                    if i < len(upload_paths) and not self._wait_for_uploads(baseline + i):
+                        return False
+
+            if not self._wait_for_uploads(self._expected_thumbs):
+                return False
             self.logger.info("图片上传完成")
             return True
         except Exception as e:
             self.logger.error(f"图片上传失败: {str(e)}")
             return False
 
+    # 从文件 input 向上取最外层 class 含 upload 的祖先作为上传区域；input 不在此类容器中时取其父元素
+    UPLOAD_ROOT_SCRIPT = """
+        var input = arguments[0] || document.querySelector('input[type="file"]');
+        if (!input) return null;
+        var root = input.parentElement;
+        for (var node = input.parentElement; node && node !== document.body; node = node.parentElement) {
+            if (typeof node.className === 'string' && node.className.indexOf('upload') !== -1) root = node;
+        }
+        return root;
+    """
+
+    def _find_upload_root(self, file_input):
+        try:
+            return self.driver.execute_script(self.UPLOAD_ROOT_SCRIPT, file_input)
+        except Exception as e:
+            self.logger.debug(f"定位上传区域失败: {str(e)}")
+            return None
+
+    def _get_upload_state(self):
+        """读取上传区域内的上传状态：缩略图数量、进行中数量、失败数量
+
+        只统计上传区域内的元素，失败文字也只从缩略图项中读取，页面其他位置的进度条或提示不会干扰判断。
+        """
+        try:
+            state = self.driver.execute_script("""
+                function visible(el) {
+                    return el.offsetWidth > 0 && el.offsetHeight > 0;
+                }
+                var root = arguments[0];
+                if (!root || !root.isConnected) {
+                    root = (function () {""" + self.UPLOAD_ROOT_SCRIPT + """})();
+                }
+                if (!root) return {thumbs: 0, uploading: 0, failed: 0};
+                function collect(selectors) {
+                    var seen = new Set();
+                    for (var i = 0; i < selectors.length; i++) {
+                        var nodes = root.querySelectorAll(selectors[i]);
+                        for (var j = 0; j < nodes.length; j++) {
+                            if (visible(nodes[j])) seen.add(nodes[j]);
+                        }
+                    }
+                    return Array.from(seen);
+                }
+                // 只取最外层的缩略图项，嵌套匹配的子元素不重复计数
+                var items = collect(['.img-list .img-container', '.img-container', '[class*="img-preview"]', '[class*="image-item"]', '[class*="upload-item"]']);
+                items = items.filter(function (el) {
+                    return !items.some(function (other) { return other !== el && other.contains(el); });
+                });
+                var uploading = 0, failed = 0;
+                items.forEach(function (item) {
+                    if (item.querySelector('[class*="uploading"], [class*="progress"], [class*="loading"]') ||
+                        /uploading|loading/.test(item.className)) uploading++;
+                    if (item.querySelector('[class*="fail"], [class*="error"]') || /fail|error/.test(item.className) ||
+                        (item.innerText || '').indexOf('上传失败') !== -1) failed++;
+                });
+                return {thumbs: items.length - uploading - failed, uploading: uploading, failed: failed};
+            """, self._upload_root)
+            return state or {'thumbs': 0, 'uploading': 0, 'failed': 0}
+        except Exception as e:
+            if self._upload_root is not None:
+                # 上传区域元素已失效（页面重新渲染），改为按 input 重新定位
+                self._upload_root = None
+                return self._get_upload_state()
+            self.logger.debug(f"读取上传状态失败: {str(e)}")
+            return {'thumbs': 0, 'uploading': 0, 'failed': 0}
+
+    def _wait_for_uploads(self, expected_thumbs, timeout=None):
+        """轮询上传进度与缩略图，直到全部完成、出现失败或超时"""
+        timeout = timeout if timeout is not None else self.config.UPLOAD_TIMEOUT
+        deadline = time.time() + timeout
+        state = self._get_upload_state()
+        while True:
+            if state['failed']:
+                self.logger.error(f"检测到图片上传失败: {state}")
+                return False
+            if state['thumbs'] >= expected_thumbs and not state['uploading']:
+                return True
+            if time.time() >= deadline:
+                self.logger.error(f"等待图片上传超时（{timeout}s），当前状态: {state}，期望缩略图: {expected_thumbs}")
+                return False
+            time.sleep(self.config.UPLOAD_POLL_INTERVAL)
+            state = self._get_upload_state()
+
     def input_title(self, title):
         """输入标题"""
         try:
@@ -440,7 +536,9 @@ class XiaohongshuPoster:
         """发布帖子"""
         try:
             self.logger.info("等待资源上传...")
-            time.sleep(5)
+            if self._expected_thumbs and not self._wait_for_uploads(self._expected_thumbs):
+                return False
+            previous_url = self.driver.current_url
             # 首选：CSS + JS 点击（社区代码）
             try:
                 btn = self.driver.execute_script(
@@ -456,13 +554,38 @@ class XiaohongshuPoster:
                     EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'发布')]"))
                 )
                 btn.click()
-            time.sleep(5)
+            if not self._wait_for_publish_result(previous_url):
+                return False
             self.logger.info("帖子发布成功")
             return True
         except Exception as e:
             self.logger.error(f"发布失败: {str(e)}")
             return False
+
+    def _wait_for_publish_result(self, previous_url, timeout=None):
+        """点击发布后轮询，直到页面跳转离开发布页或出现“发布成功”提示；超时视为发布结果未知，返回 False"""
+        timeout = timeout if timeout is not None else self.config.PUBLISH_RESULT_TIMEOUT
+        deadline = time.time() + timeout
+        while True:
+            try:
+                if self.driver.current_url != previous_url:
+                    return True
+                if self.driver.execute_script("""
+                    var nodes = document.querySelectorAll('[class*="toast"], [class*="success"], [class*="message"]');
+                    for (var i = 0; i < nodes.length; i++) {
+                        if ((nodes[i].innerText || '').indexOf('发布成功') !== -1) return true;
+                    }
+                    return false;
+                """):
+                    return True
+            except Exception as e:
+                self.logger.debug(f"读取发布结果失败: {str(e)}")
+            if time.time() >= deadline:
+                self.logger.error(f"点击发布后 {timeout}s 内未检测到页面跳转或发布成功提示")
+                return False
+            time.sleep(self.config.UPLOAD_POLL_INTERVAL)
     
+    @metrics.timed('publish.create_post')
     def create_post(self, image_files, title, content, topics):
         """创建并发布小红书帖子"""
         try:
@@ -507,8 +630,9 @@ class XiaohongshuPoster:
             if self.driver:
                 self.driver.quit()
     
-    def save_post_draft(self, image_files, title, content, topics, output_file):
-        """保存帖子草稿到文件"""
+    @metrics.timed('publish.save_draft')
+    def save_post_draft(self, image_files, title, content, topics, output_file, source_url='', timings=None):
+        """保存帖子草稿到文件，并在 JSONL 草稿台账中追加一条结构化记录（记录ID存入 self.last_draft_id）"""
         try:
             # 组合完整内容
             full_content = f"""
@@ -529,6 +653,11 @@ class XiaohongshuPoster:
                 f.write(full_content)
             
             self.logger.info(f"帖子草稿已保存到: {output_file}")
+            record = DraftLedger().append(
+                title, content, topics, image_files,
+                source_url=source_url, timings=timings, draft_file=output_file
+            )
+            self.last_draft_id = record['id']
             return True
             
         except Exception as e: